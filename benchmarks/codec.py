@@ -0,0 +1,98 @@
+"""
+Serialization micro-benchmark for the payloads the agents store.
+
+For each artifact schema, a schema-valid payload (`stub_model.example_payload`,
+lists of --items entries) is encoded and decoded with:
+
+- json: the standard library, as the callbacks used before `codec`.
+- codec: `codec.dumps` / `codec.loads` (orjson when installed).
+- validate: `Schema.model_validate_json` vs the shared `codec.validate_json` adapter.
+- packed: `codec.pack` / `codec.unpack`, the binary storage encoding.
+
+Reports bytes per payload and microseconds per encode/decode.
+
+Usage:
+    python -m benchmarks.codec [--items 8] [--number 2000] [--json codec.json]
+"""
+import argparse
+import importlib
+import json
+import timeit
+
+# (artifact, module, schema name)
+SCHEMAS = [
+    ("questions_set", "teacher_assistant_agent.sub_agents.screener_questions_agent.agent", "QuestionSet"),
+    ("psych_profile", "teacher_assistant_agent.sub_agents.screener_evaluation_agent.agent", "PsychProfileResult"),
+    ("lesson_plan", "teacher_assistant_agent.sub_agents.lesson_planner_agent.agent", "LessonPlan"),
+    ("worksheet", "teacher_assistant_agent.sub_agents.differentiated_worksheet_agent.agent", "DifferentiatedWorksheet"),
+    ("evaluation", "teacher_assistant_agent.sub_agents.worksheet_evaluator_agent.agent", "WorksheetEvaluation"),
+    ("reinforcement", "teacher_assistant_agent.sub_agents.reinforcement_agent.agent", "PersonalizedReinforcement"),
+    ("progress_report", "teacher_assistant_agent.sub_agents.progress_tracker_agent.agent", "StudentProgressReport"),
+    ("medical_flags", "teacher_assistant_agent.sub_agents.medical_flag_agent.agent", "MedicalFlagReport"),
+]
+
+
+def _microseconds(function, number):
+    return round(min(timeit.repeat(function, number=number, repeat=3)) / number * 1e6, 2)
+
+
+def measure(schema, payload, number):
+    from teacher_assistant_agent import codec
+
+    text = json.dumps(payload)
+    fast_text = codec.dumps(payload)
+    blob = codec.pack(schema, payload)
+    codec.validate_json(schema, fast_text)  # build the adapter before timing
+    return {
+        "json_bytes": len(text.encode("utf-8")),
+        "codec_bytes": len(fast_text.encode("utf-8")),
+        "packed_bytes": len(blob),
+        "json_dumps_us": _microseconds(lambda: json.dumps(payload), number),
+        "json_loads_us": _microseconds(lambda: json.loads(text), number),
+        "codec_dumps_us": _microseconds(lambda: codec.dumps(payload), number),
+        "codec_loads_us": _microseconds(lambda: codec.loads(fast_text), number),
+        "model_validate_json_us": _microseconds(lambda: schema.model_validate_json(text), number),
+        "codec_validate_json_us": _microseconds(lambda: codec.validate_json(schema, fast_text), number),
+        "pack_us": _microseconds(lambda: codec.pack(schema, payload), number),
+        "unpack_us": _microseconds(lambda: codec.unpack(blob), number),
+    }
+
+
+def run(items=8, number=2000):
+    from teacher_assistant_agent import codec
+    from teacher_assistant_agent.stub_model import example_payload
+
+    results = {"config": {"items": items, "number": number, "orjson": codec.orjson is not None}, "payloads": {}}
+    for name, module, attribute in SCHEMAS:
+        schema = getattr(importlib.import_module(module), attribute)
+        results["payloads"][name] = measure(schema, example_payload(schema, 1, items), number)
+    return results
+
+
+def _print(results):
+    columns = (
+        "json_bytes", "packed_bytes", "json_dumps_us", "codec_dumps_us", "json_loads_us", "codec_loads_us",
+        "model_validate_json_us", "codec_validate_json_us", "pack_us", "unpack_us",
+    )
+    print(f"{'payload':<16}" + "".join(f"{column.replace('_json', '').replace('model_', ''):>18}" for column in columns))
+    for name, row in results["payloads"].items():
+        print(f"{name:<16}" + "".join(f"{row[column]:>18}" for column in columns))
+    print(f"orjson: {'yes' if results['config']['orjson'] else 'no'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=8, help="Entries per list in each payload.")
+    parser.add_argument("--number", type=int, default=2000, help="Operations per timing run.")
+    parser.add_argument("--json", help="Write results to this file as JSON.")
+    args = parser.parse_args()
+
+    results = run(args.items, args.number)
+    _print(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
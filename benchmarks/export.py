@@ -0,0 +1,171 @@
+"""
+Columnar export and school-wide aggregation, fully offline.
+
+Stores --students worksheet evaluations and progress reports in the in-memory
+backend through `state.record_artifact`, then measures:
+
+- full: `export.export_collections` writing every document to Parquet.
+- incremental: the next export after --update-rate of the students got a new
+  progress report.
+- aggregation: the share of progress reports per `overall_progress` and the
+  number of concepts per `current_understanding`, once by walking the stored
+  dicts and once with `pyarrow` over the exported tables.
+
+Usage:
+    python -m benchmarks.export [--students 5000] [--update-rate 0.05] [--json export.json]
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+_LEVELS = ["Excellent", "Good", "Moderate", "Needs Improvement"]
+_UNDERSTANDING = ["Improved", "Same", "Needs Attention"]
+
+
+def _report(i, rng):
+    return {
+        "student_id": f"S{i}", "class_name": f"Class {6 + i % 5}", "subject_name": "Science",
+        "report_date": "2026-10-01", "chapter_name": f"Chapter {i % 12}",
+        "overall_progress": rng.choice(_LEVELS),
+        "strengths": ["Reflection"], "persistent_weaknesses": ["Refraction", "Lenses"],
+        "concept_progress": [
+            {"concept": f"Concept {c}", "initial_status": "Weak", "post_reinforcement_status": "Better",
+             "current_understanding": rng.choice(_UNDERSTANDING)}
+            for c in range(4)
+        ],
+        "recommendations": ["Practice ray diagrams"], "parent_summary": "Steady progress this month.",
+    }
+
+
+def _evaluation(i, rng):
+    return {
+        "student_id": f"S{i}", "class_name": f"Class {6 + i % 5}", "subject_name": "Science",
+        "chapter_name": f"Chapter {i % 12}", "evaluation_date": "2026-10-01",
+        "summary": {
+            "overall_understanding": rng.choice(["Good", "Average", "Needs Improvement"]),
+            "conceptual_strengths": ["Reflection"], "conceptual_weaknesses": ["Lenses"],
+            "chapter_coverage": "Partially covered", "suggested_retest_areas": None,
+        },
+        "answer_feedback": [
+            {"question": f"Q{q}", "question_type": "MCQ", "is_correct": rng.random() < 0.7, "feedback": "-"}
+            for q in range(5)
+        ],
+    }
+
+
+def _store(key, collection, data, schema):
+    from teacher_assistant_agent.history import versioned
+    from teacher_assistant_agent.state import record_artifact
+
+    document, stored = versioned(collection, data)
+    record_artifact({}, key, document, stored, schema=schema)
+
+
+def _aggregate_dicts():
+    from teacher_assistant_agent import codec
+    from teacher_assistant_agent.storage import get_storage
+
+    progress, concepts = Counter(), Counter()
+    for _, data in get_storage().stream("student_progress_reports"):
+        data = codec.decode_document(data)
+        progress[data.get("overall_progress")] += 1
+        for concept in data.get("concept_progress") or []:
+            concepts[concept.get("current_understanding")] += 1
+    return progress, concepts
+
+
+def _aggregate_columns(out_dir):
+    from teacher_assistant_agent.export import read_table
+
+    reports = read_table(out_dir, "student_progress_reports", latest=False)
+    concepts = read_table(out_dir, "student_progress_reports__concept_progress", latest=False)
+
+    def counts(table, column):
+        grouped = table.group_by(column).aggregate([(column, "count")]).to_pydict()
+        return Counter(dict(zip(grouped[column], grouped[f"{column}_count"])))
+
+    return counts(reports, "overall_progress"), counts(concepts, "current_understanding")
+
+
+def run(students=5000, update_rate=0.05, page_size=500):
+    from teacher_assistant_agent.export import export_collections
+    from teacher_assistant_agent.sub_agents.progress_tracker_agent.agent import StudentProgressReport
+    from teacher_assistant_agent.sub_agents.worksheet_evaluator_agent.agent import WorksheetEvaluation
+
+    rng = random.Random(7)
+    for i in range(students):
+        _store("worksheet_evaluation", "worksheet_evaluations", _evaluation(i, rng), WorksheetEvaluation)
+        _store("student_progress_report", "student_progress_reports", _report(i, rng), StudentProgressReport)
+    out_dir = tempfile.mkdtemp(prefix="export-benchmark-")
+    collections = ["worksheet_evaluations", "student_progress_reports"]
+    results = {"config": {"students": students, "update_rate": update_rate, "page_size": page_size}}
+    try:
+        start = time.perf_counter()
+        full = export_collections(out_dir, collections, page_size=page_size)
+        results["full"] = {
+            "seconds": round(time.perf_counter() - start, 3),
+            "documents": sum(result["documents"] for result in full.values()),
+            "rows": {table: count for result in full.values() for table, count in result["rows"].items()},
+            "bytes": sum(os.path.getsize(path) for result in full.values() for path in result["files"]),
+        }
+
+        for i in rng.sample(range(students), int(students * update_rate)):
+            _store("student_progress_report", "student_progress_reports", _report(i, rng), StudentProgressReport)
+        start = time.perf_counter()
+        incremental = export_collections(out_dir, collections, page_size=page_size)
+        results["incremental"] = {
+            "seconds": round(time.perf_counter() - start, 3),
+            "documents": sum(result["documents"] for result in incremental.values()),
+        }
+
+        start = time.perf_counter()
+        by_dicts = _aggregate_dicts()
+        dict_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        by_columns = _aggregate_columns(out_dir)
+        column_seconds = time.perf_counter() - start
+        results["aggregation"] = {
+            "dicts_seconds": round(dict_seconds, 4),
+            "columns_seconds": round(column_seconds, 4),
+            "speedup": round(dict_seconds / column_seconds, 1) if column_seconds else None,
+            "same_result": by_dicts == by_columns,
+        }
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--update-rate", type=float, default=0.05, help="Share of students with a new report.")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--json", help="Write results to this file as JSON.")
+    parser.add_argument("--verbose", action="store_true", help="Show the agents' own log output.")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.ERROR)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull) if not args.verbose else contextlib.nullcontext():
+        results = run(args.students, args.update_rate, args.page_size)
+    full, incremental, aggregation = results["full"], results["incremental"], results["aggregation"]
+    print(f"full export         {full['documents']:>7} documents  {full['seconds']:>8} s  {full['bytes']:>10} bytes  rows {full['rows']}")
+    print(f"incremental export  {incremental['documents']:>7} documents  {incremental['seconds']:>8} s")
+    print(f"aggregation         dicts {aggregation['dicts_seconds']} s  columns {aggregation['columns_seconds']} s  "
+          f"({aggregation['speedup']}x, same result: {aggregation['same_result']})")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+End-to-end flow benchmark for the agent tree, fully offline.
+
+Every teacher request goes through the real `root_agent` and its sub-agents'
+callbacks. Gemini is replaced by `stub_model.StubLlm` (canned schema-valid
+payloads, optional simulated latency) and Firestore by `FakeFirestoreClient`
+behind the usual `FirestoreStorage` batched writer, so the numbers are what this
+project adds on top of the model and the network.
+
+Each flow reports throughput, p50/p95/p99 latency per request and peak traced
+memory. Save results with --json and pass an earlier file to --compare to see
+the change per flow.
+
+Usage:
+    python -m benchmarks.flows [--iterations 50] [--concurrency 4] [--model-latency-ms 0]
+                               [--flow lesson_planning] [--json flows.json] [--compare base.json] [--verbose]
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+import uuid
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+_EVALUATION = {
+    "student_id": "S{i}", "class_name": "Class 5", "subject_name": "Mathematics", "chapter_name": "Fractions",
+    "evaluation_date": "2024-07-26",
+    "summary": {
+        "overall_understanding": "Partial", "conceptual_strengths": ["Equivalent fractions"],
+        "conceptual_weaknesses": ["Adding unlike fractions"], "chapter_coverage": "Most of the chapter",
+        "suggested_retest_areas": ["Adding unlike fractions"],
+    },
+    "answer_feedback": [
+        {"question": "1/2 + 1/3 = ?", "question_type": "FILL_BLANK", "is_correct": False, "feedback": "Use a common denominator."},
+    ],
+}
+
+# flow name -> (sub-agent the request must reach, request template; "{i}" is the iteration).
+FLOWS = {
+    "screening": (
+        "screener_questions_agent",
+        "Generate psychological screening questions for class {grade}",
+    ),
+    "screening_evaluation": (
+        "screener_evaluation_agent",
+        json.dumps({
+            "student_id": "S{i}", "class_name": "Class 6",
+            "answers": [
+                {"question": "How often do you feel nervous in a classroom?", "answer": "Sometimes"},
+                {"question": "Do you finish tasks you start?", "answer": "Mostly"},
+            ],
+        }),
+    ),
+    "lesson_planning": (
+        "lesson_planner_agent",
+        "Create a lesson plan for class 5 science, chapter Plants {i}, 40 minutes per day for 3 days",
+    ),
+    "worksheet_generation": (
+        "differentiated_worksheet_agent",
+        "Generate a personalized worksheet for student S{i}, Class 5 Mathematics, chapter Fractions, based on this screening: "
+        + json.dumps({
+            "screening_results": {"confidence": "low", "anxiety": "high", "focus": "medium", "resilience": "medium"},
+            "suggested_followups": ["Start with visual questions"], "evaluation_date": "2024-07-20",
+        }),
+    ),
+    "worksheet_evaluation": (
+        "worksheet_evaluator_agent",
+        json.dumps({
+            "student_id": "S{i}", "class_name": "Class 5", "subject_name": "Mathematics", "chapter_name": "Fractions",
+            "evaluation_date": "2024-07-26",
+            "answers": [
+                {"question": "1/2 + 1/4 = ?", "question_type": "MCQ", "student_answer": "3/4", "expected_answer": "3/4"},
+                {"question": "1/2 + 1/3 = __", "question_type": "FILL_BLANK", "student_answer": "2/5", "expected_answer": "5/6"},
+                {"question": "Why do we need a common denominator?", "question_type": "QA", "student_answer": "To add the parts", "expected_answer": ""},
+            ],
+        }),
+    ),
+    "reinforcement": (
+        "reinforcement_agent",
+        "Create a reinforcement session for this evaluation: " + json.dumps(_EVALUATION),
+    ),
+    "progress": (
+        "progress_tracker_agent",
+        "Generate a progress report for student S{i} in Mathematics, chapter Fractions",
+    ),
+    "medical_flags": (
+        "medical_flag_agent",
+        "Check this progress report for medical or developmental flags: " + json.dumps({
+            "student_id": "S{i}", "class_name": "Class 5", "subject_name": "Mathematics", "chapter_name": "Fractions",
+            "report_date": "2024-08-01", "overall_progress": "Needs Attention",
+            "parent_summary": "Struggles to focus and is easily distracted during multi-step problems.",
+        }),
+    ),
+}
+
+
+def _request(template, i):
+    return template.replace("{i}", str(i)).replace("{grade}", str(i % 12 + 1))
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class FlowRunner:
+    """Runs teacher requests through `root_agent`, one fresh session per request."""
+
+    def __init__(self):
+        from google.adk.runners import InMemoryRunner
+
+        from teacher_assistant_agent.agent import root_agent
+
+        self.runner = InMemoryRunner(agent=root_agent, app_name="benchmark")
+
+    async def request(self, text):
+        """
+        Returns:
+            tuple: (latency in seconds, set of agents that produced a final response).
+        """
+        from google.genai import types
+
+        sessions = self.runner.session_service
+        session = await sessions.create_session(app_name="benchmark", user_id="teacher", session_id=uuid.uuid4().hex)
+        start = time.perf_counter()
+        authors = set()
+        async for event in self.runner.run_async(
+            user_id="teacher", session_id=session.id,
+            new_message=types.Content(role="user", parts=[types.Part(text=text)]),
+        ):
+            if event.is_final_response():
+                authors.add(event.author)
+        elapsed = time.perf_counter() - start
+        await sessions.delete_session(app_name="benchmark", user_id="teacher", session_id=session.id)
+        return elapsed, authors
+
+    async def run_flow(self, name, iterations, concurrency, offset=0):
+        expected, template = FLOWS[name]
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, misrouted = [], 0
+
+        async def one(i):
+            nonlocal misrouted
+            async with semaphore:
+                elapsed, authors = await self.request(_request(template, offset + i))
+            latencies.append(elapsed)
+            if expected not in authors:
+                misrouted += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(iterations)))
+        return latencies, time.perf_counter() - start, misrouted
+
+
+async def _measure_memory(runner, name, iterations, concurrency, offset):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        await runner.run_flow(name, iterations, concurrency, offset)
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, retained
+
+
+async def run(flows=None, iterations=50, concurrency=4, warmup=3, memory_iterations=5, model_latency_ms=0.0):
+    from teacher_assistant_agent import stub_model
+    from teacher_assistant_agent.fake_firestore import FakeFirestoreClient
+    from teacher_assistant_agent.metrics import percentile
+    from teacher_assistant_agent.storage import FirestoreStorage, set_storage
+
+    stub_model.install(latency_seconds=model_latency_ms / 1000)
+    client = FakeFirestoreClient()
+    storage = set_storage(FirestoreStorage(client=client))
+    runner = FlowRunner()
+
+    results = {
+        "commit": _git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "config": {
+            "iterations": iterations, "concurrency": concurrency, "warmup": warmup,
+            "memory_iterations": memory_iterations, "model_latency_ms": model_latency_ms,
+        },
+        "flows": {},
+    }
+    offset = 0
+    for name in flows or FLOWS:
+        # Warm-up builds the sub-agent and fills module-level caches before timing.
+        await runner.run_flow(name, warmup, 1, offset)
+        offset += warmup
+        model_calls = stub_model.StubLlm.calls
+        latencies, wall, misrouted = await runner.run_flow(name, iterations, concurrency, offset)
+        model_calls = stub_model.StubLlm.calls - model_calls
+        offset += iterations
+        storage.flush(30)
+        peak, retained = await _measure_memory(runner, name, memory_iterations, concurrency, offset)
+        offset += memory_iterations
+        results["flows"][name] = {
+            "requests": iterations,
+            "misrouted": misrouted,
+            "model_calls_per_request": round(model_calls / iterations, 2),
+            "throughput_rps": round(iterations / wall, 2),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            "max_ms": round(max(latencies) * 1000, 3),
+            "peak_memory_kib": round(peak / 1024, 1),
+            "retained_memory_kib": round(retained / 1024, 1),
+        }
+    storage.flush(30)
+    results["storage"] = {"commits": len(client.commits), "writes": sum(len(commit) for commit in client.commits)}
+    return results
+
+
+def _print(results, baseline=None):
+    columns = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "peak_memory_kib")
+    print(f"{'flow':<22}" + "".join(f"{column:>17}" for column in columns) + f"{'misrouted':>11}")
+    for name, flow in results["flows"].items():
+        cells = []
+        for column in columns:
+            cell = f"{flow[column]:.2f}"
+            previous = (baseline or {}).get("flows", {}).get(name, {}).get(column)
+            if previous:
+                cell += f" ({(flow[column] - previous) / previous * 100:+.0f}%)"
+            cells.append(f"{cell:>17}")
+        print(f"{name:<22}" + "".join(cells) + f"{flow['misrouted']:>11}")
+    print(f"storage: {results['storage']['writes']} writes in {results['storage']['commits']} commits")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50, help="Timed requests per flow.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight at once.")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--memory-iterations", type=int, default=5, help="Requests traced for peak memory.")
+    parser.add_argument("--model-latency-ms", type=float, default=0.0, help="Simulated latency per model call.")
+    parser.add_argument("--flow", action="append", choices=list(FLOWS), help="Run only this flow (repeatable).")
+    parser.add_argument("--json", help="Write results to this file as JSON.")
+    parser.add_argument("--compare", help="Earlier --json output to compare against.")
+    parser.add_argument("--verbose", action="store_true", help="Show the agents' own log output.")
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull) if not args.verbose else contextlib.nullcontext():
+        results = asyncio.run(run(
+            args.flow, args.iterations, args.concurrency, args.warmup, args.memory_iterations, args.model_latency_ms,
+        ))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    _print(results, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Time to first day for streamed lesson plans, fully offline.
+
+Runs `lesson_planner_agent` with `stub_model.StubLlm` (multi-day plans, the
+simulated latency spread over the streamed chunks) and compares:
+
+- full: `invoke.run_agent`, which returns once the whole `LessonPlan` is done.
+- first_day / last_day: `streaming.stream_lesson_plan`, time until the first
+  and the last `DailyPlan` is yielded.
+
+Usage:
+    python -m benchmarks.lesson_stream [--iterations 20] [--days 10] [--model-latency-ms 2000] [--json stream.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+
+def _summary(values):
+    return {
+        "p50_ms": round(statistics.median(values) * 1000, 1),
+        "mean_ms": round(statistics.fmean(values) * 1000, 1),
+        "max_ms": round(max(values) * 1000, 1),
+    }
+
+
+async def run(iterations=20, days=10, model_latency_ms=2000.0):
+    from teacher_assistant_agent import stub_model
+    from teacher_assistant_agent.invoke import run_agent
+    from teacher_assistant_agent.sub_agents.lesson_planner_agent.agent import lesson_planner_agent
+    from teacher_assistant_agent.sub_agents.lesson_planner_agent.cache import lesson_plan_cache
+    from teacher_assistant_agent.sub_agents.lesson_planner_agent.streaming import stream_lesson_plan
+
+    stub_model.install(latency_seconds=model_latency_ms / 1000, list_items=days)
+    lesson_plan_cache.memory.maxsize = 0  # every request must reach the model
+
+    full, first, last, counts = [], [], [], []
+    for i in range(iterations):
+        message = f"Create a lesson plan for class 5 science, chapter Plants {i}, 40 minutes per day"
+        start = time.perf_counter()
+        await run_agent(lesson_planner_agent, message)
+        full.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        received = 0
+        async for _ in stream_lesson_plan(message):
+            received += 1
+            if received == 1:
+                first.append(time.perf_counter() - start)
+        last.append(time.perf_counter() - start)
+        counts.append(received)
+
+    return {
+        "config": {"iterations": iterations, "days": days, "model_latency_ms": model_latency_ms},
+        "days_streamed": min(counts),
+        "full": _summary(full),
+        "first_day": _summary(first),
+        "last_day": _summary(last),
+        "first_day_fraction": round(statistics.median(first) / statistics.median(full), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--days", type=int, default=10, help="Days in each generated plan.")
+    parser.add_argument("--model-latency-ms", type=float, default=2000.0, help="Simulated generation time per plan.")
+    parser.add_argument("--json", help="Write results to this file as JSON.")
+    parser.add_argument("--verbose", action="store_true", help="Show the agents' own log output.")
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull) if not args.verbose else contextlib.nullcontext():
+        results = asyncio.run(run(args.iterations, args.days, args.model_latency_ms))
+    for name in ("full", "first_day", "last_day"):
+        print(f"{name:<10} " + "  ".join(f"{key} {value:>9}" for key, value in results[name].items()))
+    print(f"days per plan: {results['days_streamed']}, first day at {results['first_day_fraction']:.0%} of the full-plan latency")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Resilient model calls under injected faults, fully offline.
+
+Runs `screener_evaluation_agent` through `invoke.run_agent` with
+`stub_model.StubLlm` and compares its bare model with `resilience.ResilientLlm`
+in three scenarios:
+
+- errors: --error-rate of calls fail with a 503; success rate without and with retries.
+- tail: --slow-rate of calls take --slow-latency-ms; latency without and with
+  hedging at the p95 delay, and the extra model calls hedging costs.
+- outage: the primary model is unavailable; success rate and latency with the
+  circuit breaker and a fallback model.
+- invalid: --invalid-rate of responses are cut off mid-JSON; success rate and
+  model calls with local repair and one re-prompt.
+
+Usage:
+    python -m benchmarks.resilience [--iterations 200] [--model-latency-ms 20] [--error-rate 0.2]
+                                    [--slow-rate 0.03] [--slow-latency-ms 1000] [--invalid-rate 0.3]
+                                    [--json resilience.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import time
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+_REQUEST = json.dumps({
+    "student_id": "S{i}", "class_name": "Class 6",
+    "answers": [{"question": "How often do you feel nervous in a classroom?", "answer": "Sometimes"}],
+})
+
+
+async def _measure(agent, iterations):
+    from teacher_assistant_agent import stub_model
+    from teacher_assistant_agent.invoke import run_agent
+    from teacher_assistant_agent.metrics import percentile
+
+    latencies, failures = [], 0
+    calls = stub_model.StubLlm.calls
+    for i in range(iterations):
+        start = time.perf_counter()
+        try:
+            run = await run_agent(agent, _REQUEST.replace("{i}", str(i)))
+            failures += not run.text
+        except Exception:
+            failures += 1
+        latencies.append(time.perf_counter() - start)
+    return {
+        "success_rate": round(1 - failures / iterations, 3),
+        "model_calls_per_request": round((stub_model.StubLlm.calls - calls) / iterations, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1),
+    }
+
+
+async def run(iterations=200, model_latency_ms=20.0, error_rate=0.2, slow_rate=0.03, slow_latency_ms=1000.0,
+              invalid_rate=0.3):
+    from teacher_assistant_agent import resilience, stub_model
+    from teacher_assistant_agent.resilience import ResilientLlm
+    from teacher_assistant_agent.sub_agents.screener_evaluation_agent.agent import screener_evaluation_agent as agent
+
+    primary = agent.model if isinstance(agent.model, str) else agent.model.model
+    latency = model_latency_ms / 1000
+    resilience.MODEL_BACKOFF_BASE_SECONDS = latency
+    results = {"config": {
+        "iterations": iterations, "model_latency_ms": model_latency_ms, "error_rate": error_rate,
+        "slow_rate": slow_rate, "slow_latency_ms": slow_latency_ms, "invalid_rate": invalid_rate,
+    }}
+
+    async def scenario(faults, **settings):
+        stub_model.install(latency_seconds=latency, **{
+            "error_rate": 0.0, "slow_rate": 0.0, "slow_latency_seconds": slow_latency_ms / 1000,
+            "unavailable_models": None, "model_profiles": {}, **faults,
+        })
+        agent.model = ResilientLlm(model=primary, agent_name=agent.name, **settings) if settings else primary
+        return await _measure(agent, iterations)
+
+    results["errors"] = {
+        "bare": await scenario({"error_rate": error_rate}),
+        "retries": await scenario({"error_rate": error_rate}, retries=2),
+    }
+    results["tail"] = {
+        "bare": await scenario({"slow_rate": slow_rate}),
+        "hedged": await scenario({"slow_rate": slow_rate}, retries=0, hedge_percentile=95),
+    }
+    results["outage"] = {
+        "bare": await scenario({"unavailable_models": primary}),
+        "fallback": await scenario({"unavailable_models": primary}, retries=2, fallback="gemini-1.5-flash-8b"),
+    }
+    invalid = {"model_profiles": {".*": {"invalid_rate": invalid_rate}}}
+    results["invalid"] = {
+        "bare": await scenario(invalid),
+        "repaired": await scenario(invalid, retries=0, reprompts=1),
+    }
+    agent.model = primary
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200, help="Requests per scenario.")
+    parser.add_argument("--model-latency-ms", type=float, default=20.0, help="Simulated latency per model call.")
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--slow-latency-ms", type=float, default=1000.0)
+    parser.add_argument("--invalid-rate", type=float, default=0.3)
+    parser.add_argument("--json", help="Write results to this file as JSON.")
+    parser.add_argument("--verbose", action="store_true", help="Show the agents' own log output.")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.ERROR)  # ADK logs every injected failure with a traceback
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull) if not args.verbose else contextlib.nullcontext():
+        results = asyncio.run(run(args.iterations, args.model_latency_ms, args.error_rate,
+                                  args.slow_rate, args.slow_latency_ms, args.invalid_rate))
+    columns = ("success_rate", "model_calls_per_request", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+    print(f"{'scenario':<20}" + "".join(f"{column.replace('model_calls_per_request', 'calls/request'):>15}" for column in columns))
+    for scenario in ("errors", "tail", "outage", "invalid"):
+        for variant, row in results[scenario].items():
+            print(f"{scenario + ' ' + variant:<20}" + "".join(f"{row[column]:>15}" for column in columns))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Startup benchmark for the agent tree.
+
+Each measurement runs in a fresh interpreter so module caches from one
+sub-agent do not hide the import cost of another. The ADK agent and event
+modules are imported before the clock starts, so the numbers are what this
+project adds on top of ADK itself.
+
+Usage:
+    python -m benchmarks.startup [--repeat 3] [--json startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+_ROOT_SCRIPT = """
+import json, time
+from google.adk.agents import Agent, BaseAgent
+from google.adk.events import Event
+start = time.perf_counter()
+from teacher_assistant_agent.agent import root_agent
+print(json.dumps({"import_ms": (time.perf_counter() - start) * 1000}))
+"""
+
+_SUB_AGENT_SCRIPT = """
+import importlib, json, sys, time
+from google.adk.agents import Agent, BaseAgent
+from google.adk.events import Event
+from teacher_assistant_agent.registry import get_spec
+spec = get_spec(sys.argv[1])
+start = time.perf_counter()
+module = importlib.import_module(spec.module)
+import_ms = (time.perf_counter() - start) * 1000
+agent = getattr(module, spec.attribute)
+fields = {
+    name: getattr(agent, name)
+    for name in agent.model_fields_set
+    if name not in ("parent_agent", "sub_agents")
+}
+start = time.perf_counter()
+type(agent)(**fields)
+construct_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({"import_ms": import_ms, "construct_ms": construct_ms}))
+"""
+
+
+def _run(script, *args):
+    env = dict(os.environ)
+    # Measure code paths only; never touch a real backend from the benchmark.
+    env.setdefault("STORAGE_BACKEND", "memory")
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", script, *args],
+        capture_output=True, text=True, check=True, env=env,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _median(samples, key):
+    return round(statistics.median(sample[key] for sample in samples), 2)
+
+
+def run(repeat=3):
+    from teacher_assistant_agent.registry import SUB_AGENTS
+
+    root = [_run(_ROOT_SCRIPT) for _ in range(repeat)]
+    results = {"root_import_ms": _median(root, "import_ms"), "sub_agents": {}}
+    for spec in SUB_AGENTS:
+        samples = [_run(_SUB_AGENT_SCRIPT, spec.name) for _ in range(repeat)]
+        results["sub_agents"][spec.name] = {
+            "import_ms": _median(samples, "import_ms"),
+            "construct_ms": _median(samples, "construct_ms"),
+        }
+    results["eager_total_ms"] = round(
+        results["root_import_ms"]
+        + sum(agent["import_ms"] for agent in results["sub_agents"].values()),
+        2,
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Write results to this file as JSON.")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    print(f"root agent import (lazy): {results['root_import_ms']:.2f} ms")
+    print(f"{'sub-agent':<32}{'import ms':>12}{'construct ms':>15}")
+    for name, timings in results["sub_agents"].items():
+        print(f"{name:<32}{timings['import_ms']:>12.2f}{timings['construct_ms']:>15.2f}")
+    print(f"eager total (root + every sub-agent): {results['eager_total_ms']:.2f} ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
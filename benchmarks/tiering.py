@@ -0,0 +1,123 @@
+"""
+Model tiering against simulated tiers, fully offline.
+
+Runs `screener_evaluation_agent` through `invoke.run_agent` with
+`stub_model.StubLlm` simulating three tiers of different speed and quality
+(a fraction of each tier's responses is cut off mid-JSON):
+
+    gemini-1.5-flash-8b   --cheap-latency-ms,  --cheap-invalid-rate
+    gemini-1.5-flash      --mid-latency-ms,    --mid-invalid-rate
+    gemini-2.0-flash      --strong-latency-ms, always valid
+
+and compares the agent pinned to its hard-coded model with `ResilientLlm`
+choosing among the tiers. Prints valid responses, latency and estimated cost
+per request, and the `tiering.format_report()` table of the tiered run.
+
+Usage:
+    python -m benchmarks.tiering [--iterations 300] [--json tiering.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import time
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+TIERS = ["gemini-1.5-flash-8b", "gemini-1.5-flash", "gemini-2.0-flash"]
+_REQUEST = json.dumps({
+    "student_id": "S{i}", "class_name": "Class 6",
+    "answers": [{"question": "How often do you feel nervous in a classroom?", "answer": "Sometimes"}],
+})
+
+
+async def _measure(agent, schema, iterations):
+    from teacher_assistant_agent import codec, tiering
+    from teacher_assistant_agent.invoke import run_agent
+    from teacher_assistant_agent.metrics import percentile
+
+    latencies, valid = [], 0
+    for i in range(iterations):
+        start = time.perf_counter()
+        run = await run_agent(agent, _REQUEST.replace("{i}", str(i)))
+        latencies.append(time.perf_counter() - start)
+        try:
+            codec.validate_json(schema, run.text)
+            valid += 1
+        except ValueError:
+            pass
+    report = tiering.report().get(agent.name, {})
+    return {
+        "valid_rate": round(valid / iterations, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "cost_per_request_usd": round(sum(row["cost_usd"] for row in report.values()) / iterations, 8),
+        "calls_per_tier": {model: row["calls"] for model, row in report.items()},
+    }
+
+
+async def run(iterations=300, cheap_latency_ms=10.0, cheap_invalid_rate=0.3, mid_latency_ms=20.0,
+              mid_invalid_rate=0.02, strong_latency_ms=40.0):
+    from teacher_assistant_agent import stub_model, tiering
+    from teacher_assistant_agent.resilience import ResilientLlm
+    from teacher_assistant_agent.sub_agents.screener_evaluation_agent.agent import (
+        PsychProfileResult, screener_evaluation_agent as agent,
+    )
+
+    primary = agent.model if isinstance(agent.model, str) else agent.model.model
+    profiles = {
+        TIERS[0]: {"latency_seconds": cheap_latency_ms / 1000, "invalid_rate": cheap_invalid_rate},
+        TIERS[1]: {"latency_seconds": mid_latency_ms / 1000, "invalid_rate": mid_invalid_rate},
+        TIERS[2]: {"latency_seconds": strong_latency_ms / 1000, "invalid_rate": 0.0},
+    }
+    results = {"config": {"iterations": iterations, "tiers": TIERS, "profiles": profiles}}
+
+    stub_model.install(model_profiles=profiles)
+    agent.model = ResilientLlm(model=primary, agent_name=agent.name)
+    results["pinned"] = await _measure(agent, PsychProfileResult, iterations)
+
+    stub_model.install(model_profiles=profiles)
+    agent.model = ResilientLlm(
+        model=primary, agent_name=agent.name, tiers=TIERS,
+        target_latency_seconds=2 * mid_latency_ms / 1000, target_success_rate=0.9,
+    )
+    results["tiered"] = await _measure(agent, PsychProfileResult, iterations)
+    results["tiers"] = tiering.report().get(agent.name, {})
+    agent.model = primary
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=300, help="Requests per run.")
+    parser.add_argument("--cheap-latency-ms", type=float, default=10.0)
+    parser.add_argument("--cheap-invalid-rate", type=float, default=0.3)
+    parser.add_argument("--mid-latency-ms", type=float, default=20.0)
+    parser.add_argument("--mid-invalid-rate", type=float, default=0.02)
+    parser.add_argument("--strong-latency-ms", type=float, default=40.0)
+    parser.add_argument("--json", help="Write results to this file as JSON.")
+    parser.add_argument("--verbose", action="store_true", help="Show the agents' own log output.")
+    args = parser.parse_args()
+
+    from teacher_assistant_agent import tiering
+
+    if not args.verbose:
+        logging.disable(logging.ERROR)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull) if not args.verbose else contextlib.nullcontext():
+        results = asyncio.run(run(args.iterations, args.cheap_latency_ms, args.cheap_invalid_rate,
+                                  args.mid_latency_ms, args.mid_invalid_rate, args.strong_latency_ms))
+    for name in ("pinned", "tiered"):
+        row = results[name]
+        print(f"{name:<8} valid {row['valid_rate']:<7} p50 {row['p50_ms']:>7} ms  p95 {row['p95_ms']:>7} ms  "
+              f"cost/request ${row['cost_per_request_usd']:.8f}  calls {row['calls_per_tier']}")
+    print()
+    print(tiering.format_report({"screener_evaluation_agent": results["tiers"]}))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
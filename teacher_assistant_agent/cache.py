@@ -0,0 +1,157 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from teacher_assistant_agent.storage import get_storage
+
+
+def cache_key(params: dict) -> str:
+    """Stable document id for a dict of normalized request parameters."""
+    payload = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class LRUCache:
+    """
+    Thread-safe in-process cache with least-recently-used and time-to-live eviction.
+
+    Args:
+        maxsize (int): Maximum number of entries; 0 disables the cache.
+        ttl_seconds (float): Entry lifetime; 0 or less keeps entries until evicted.
+    """
+
+    def __init__(self, maxsize=256, ttl_seconds=0):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def expired(self, stored_at, now):
+        return self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.expired(entry[0], now):
+                del self._entries[key]
+                self._counters["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[1]
+
+    def put(self, key, value, stored_at=None):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (stored_at or time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return entry[1] if entry else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hit_rate": self._counters["hits"] / lookups if lookups else 0.0,
+            }
+
+
+class ResponseCache:
+    """
+    Two-tier cache for generated artifacts: an `LRUCache` in front of a storage
+    collection, so entries survive restarts and are shared between instances.
+
+    Args:
+        collection (str): Storage collection for the persistent tier.
+        maxsize (int): In-process entries; 0 disables the whole cache.
+        ttl_seconds (float): Lifetime of an entry in both tiers.
+    """
+
+    def __init__(self, collection, maxsize=256, ttl_seconds=0):
+        self.collection = collection
+        self.memory = LRUCache(maxsize, ttl_seconds)
+        self._lock = threading.Lock()
+        self._counters = {"persistent_hits": 0, "persistent_misses": 0, "stores": 0, "invalidations": 0}
+
+    @property
+    def enabled(self):
+        return self.memory.maxsize > 0
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(self, params: dict) -> Optional[dict]:
+        """Return the cached value for `params`, or None."""
+        if not self.enabled:
+            return None
+        key = cache_key(params)
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        try:
+            document = get_storage().get(self.collection, key)
+        except Exception as e:
+            print(f"Error reading {self.collection} cache: {e}")
+            document = None
+        if not document or document.get("params") != params or self.memory.expired(document.get("stored_at", 0), time.time()):
+            self._count("persistent_misses")
+            return None
+        self._count("persistent_hits")
+        self.memory.put(key, document["value"], stored_at=document.get("stored_at"))
+        return document["value"]
+
+    def put(self, params: dict, value: dict):
+        if not self.enabled:
+            return
+        key = cache_key(params)
+        stored_at = time.time()
+        self.memory.put(key, value, stored_at=stored_at)
+        get_storage().set(self.collection, key, {"params": params, "value": value, "stored_at": stored_at})
+        self._count("stores")
+
+    def invalidate(self, params: dict):
+        key = cache_key(params)
+        self.memory.pop(key)
+        get_storage().set(self.collection, key, {})
+        self._count("invalidations")
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        memory = self.memory.stats()
+        lookups = memory["hits"] + memory["misses"]
+        hits = memory["hits"] + counters["persistent_hits"]
+        return {
+            "collection": self.collection,
+            "memory": memory,
+            **counters,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,274 @@
+"""
+Shared serialization for state, storage and model payloads.
+
+- `dumps` / `loads`: compact JSON, using orjson when it is installed and the
+  standard library otherwise.
+- `adapter(schema)`: one precompiled Pydantic `TypeAdapter` per schema, used by
+  `validate` / `validate_json` / `dump_json` instead of rebuilding validators.
+- `pack` / `unpack`: an optional compact binary encoding for large payloads. A
+  schema's fields are written positionally (no repeated keys), zlib-compressed,
+  behind a header naming the schema and a fingerprint of its fields, so a
+  payload is never decoded against a schema that has changed.
+"""
+import base64
+import hashlib
+import importlib
+import json
+import struct
+import typing
+import zlib
+from datetime import date, datetime, time
+from functools import lru_cache
+from types import UnionType
+from typing import Any, Optional, Union
+
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+MAGIC = b"SSB"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct(">3sBB4s")  # magic, format version, schema name length, fingerprint
+
+# Marker for bytes inside JSON documents (e.g. packed payloads in SQLite rows).
+_BYTES_KEY = "$bytes"
+
+# Schemas `unpack` may import by name; payloads never name code outside this package.
+_SCHEMA_PACKAGE = "teacher_assistant_agent."
+_schemas: dict[str, type[BaseModel]] = {}
+
+
+class CodecError(ValueError):
+    """A payload could not be decoded."""
+
+
+def _default(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (bytes, bytearray)):
+        return {_BYTES_KEY: base64.b64encode(bytes(value)).decode("ascii")}
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()  # RFC 3339, as orjson writes them
+    return str(value)
+
+
+def _restore_bytes(value):
+    if isinstance(value, dict):
+        if len(value) == 1 and _BYTES_KEY in value:
+            return base64.b64decode(value[_BYTES_KEY])
+        return {key: _restore_bytes(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_restore_bytes(item) for item in value]
+    return value
+
+
+def dumps(value, sort_keys=False) -> str:
+    """Compact JSON text for `value` (models, bytes and sets included)."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(value, default=_default, option=option).decode("utf-8")
+    return json.dumps(value, default=_default, sort_keys=sort_keys, separators=(",", ":"), ensure_ascii=False)
+
+
+def loads(data: Union[str, bytes]):
+    """Parse JSON text produced by `dumps` (or any JSON)."""
+    value = orjson.loads(data) if orjson is not None else json.loads(data)
+    if _BYTES_KEY in (data if isinstance(data, str) else data.decode("utf-8", "ignore")):
+        value = _restore_bytes(value)
+    return value
+
+
+@lru_cache(maxsize=None)
+def adapter(schema) -> TypeAdapter:
+    """The shared `TypeAdapter` for `schema`, built once."""
+    return TypeAdapter(schema)
+
+
+def validate(schema, data):
+    """Validate a dict (or model) against `schema` and return the model."""
+    return adapter(schema).validate_python(data)
+
+
+def validate_json(schema, text: Union[str, bytes]):
+    """Parse and validate JSON text in one pass."""
+    return adapter(schema).validate_json(text)
+
+
+def dump_json(schema, value) -> str:
+    """JSON text for a model or dict of `schema`, serialized by pydantic-core."""
+    return adapter(schema).dump_json(value).decode("utf-8")
+
+
+def dump(schema, value) -> dict:
+    """Validated JSON-compatible dict for `value`."""
+    type_adapter = adapter(schema)
+    if not isinstance(value, BaseModel):
+        value = type_adapter.validate_python(value)
+    return type_adapter.dump_python(value, mode="json")
+
+
+# --- binary encoding -------------------------------------------------------
+
+
+def _schema_name(schema: type[BaseModel]) -> str:
+    name = f"{schema.__module__}:{schema.__qualname__}"
+    _schemas[name] = schema
+    return name
+
+
+def _resolve_schema(name: str) -> type[BaseModel]:
+    schema = _schemas.get(name)
+    if schema is None and name.startswith(_SCHEMA_PACKAGE):
+        # Sub-agent modules load lazily; import the one that defines the schema.
+        module, _, qualname = name.partition(":")
+        try:
+            schema = getattr(importlib.import_module(module), qualname)
+        except (ImportError, AttributeError):
+            schema = None
+    if not (isinstance(schema, type) and issubclass(schema, BaseModel)):
+        raise CodecError(f"Unknown schema {name!r}.")
+    _schemas[name] = schema
+    return schema
+
+
+def _model_of(annotation) -> Optional[type[BaseModel]]:
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    if typing.get_origin(annotation) in (Union, UnionType):
+        models = [arg for arg in typing.get_args(annotation) if _model_of(arg)]
+        return _model_of(models[0]) if len(models) == 1 else None
+    return None
+
+
+def _item_model(annotation) -> Optional[type[BaseModel]]:
+    """The model inside `List[Model]` / `Optional[List[Model]]`, if any."""
+    origin = typing.get_origin(annotation)
+    if origin in (Union, UnionType):
+        inner = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        return _item_model(inner[0]) if len(inner) == 1 else None
+    if origin in (list, tuple, set):
+        args = typing.get_args(annotation)
+        return _model_of(args[0]) if args else None
+    return None
+
+
+@lru_cache(maxsize=None)
+def fingerprint(schema: type[BaseModel]) -> bytes:
+    """4 bytes identifying the field layout of `schema` and its nested models."""
+    def layout(model):
+        parts = []
+        for name, field in model.model_fields.items():
+            nested = _model_of(field.annotation) or _item_model(field.annotation)
+            parts.append(f"{name}:{layout(nested) if nested else field.annotation}")
+        return "(" + ",".join(parts) + ")"
+    return hashlib.sha256(layout(schema).encode("utf-8")).digest()[:4]
+
+
+def _to_rows(schema, data):
+    if data is None:
+        return None
+    row = []
+    for name, field in schema.model_fields.items():
+        value = data.get(name)
+        model = _model_of(field.annotation)
+        item_model = _item_model(field.annotation)
+        if model is not None and isinstance(value, dict):
+            value = _to_rows(model, value)
+        elif item_model is not None and isinstance(value, list):
+            value = [_to_rows(item_model, item) if isinstance(item, dict) else item for item in value]
+        row.append(value)
+    return row
+
+
+def _from_rows(schema, row):
+    if row is None:
+        return None
+    data = {}
+    for (name, field), value in zip(schema.model_fields.items(), row):
+        model = _model_of(field.annotation)
+        item_model = _item_model(field.annotation)
+        if model is not None and isinstance(value, list):
+            value = _from_rows(model, value)
+        elif item_model is not None and isinstance(value, list):
+            value = [_from_rows(item_model, item) if isinstance(item, list) else item for item in value]
+        data[name] = value
+    return data
+
+
+def pack(schema: type[BaseModel], data) -> bytes:
+    """
+    Binary encoding of a `schema` payload.
+
+    Only the schema's fields are kept.
+    """
+    if isinstance(data, BaseModel):
+        data = data.model_dump(mode="json")
+    name = _schema_name(schema).encode("utf-8")
+    body = zlib.compress(dumps(_to_rows(schema, data)).encode("utf-8"), 6)
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, len(name), fingerprint(schema)) + name + body
+
+
+def is_packed(value) -> bool:
+    return isinstance(value, (bytes, bytearray)) and bytes(value[:3]) == MAGIC
+
+
+def unpack(blob: bytes) -> dict:
+    """
+    Decode a `pack` payload back into a dict.
+
+    Raises:
+        CodecError: If the blob is malformed, its schema cannot be found or
+            the schema's fields changed since it was written.
+    """
+    blob = bytes(blob)
+    if len(blob) < _HEADER.size or not is_packed(blob):
+        raise CodecError("Not a packed payload.")
+    _, version, name_length, stored_fingerprint = _HEADER.unpack_from(blob)
+    if version != FORMAT_VERSION:
+        raise CodecError(f"Unsupported payload format version {version}.")
+    name = blob[_HEADER.size:_HEADER.size + name_length].decode("utf-8")
+    schema = _resolve_schema(name)
+    if fingerprint(schema) != stored_fingerprint:
+        raise CodecError(f"Payload was written with a different version of {schema.__name__}.")
+    try:
+        rows = loads(zlib.decompress(blob[_HEADER.size + name_length:]))
+    except (zlib.error, ValueError) as e:
+        raise CodecError(f"Corrupt {name} payload: {e}") from e
+    return _from_rows(schema, rows)
+
+
+def encode_document(schema: Optional[type[BaseModel]], data: dict, threshold: int) -> dict:
+    """
+    Storage form of `data`: unchanged, or, when `schema` is given and its JSON is
+    at least `threshold` bytes, packed into a `_packed` field. Top-level fields
+    other than lists of objects stay readable so queries and projections work.
+    """
+    if schema is None or threshold <= 0:
+        return data
+    if len(dumps(data)) < threshold:
+        return data
+    kept = {
+        key: value for key, value in data.items()
+        if not (isinstance(value, list) and any(isinstance(item, dict) for item in value))
+    }
+    return {**kept, "_packed": pack(schema, data)}
+
+
+def decode_document(document: Optional[dict]) -> Optional[dict]:
+    """Inverse of `encode_document`; plain documents are returned as they are."""
+    if not document or "_packed" not in document:
+        return document
+    kept = {key: value for key, value in document.items() if key != "_packed"}
+    return {**kept, **unpack(document["_packed"])}
+
+
+def size(value: Any) -> int:
+    """Bytes of `value` as stored: packed blobs as is, anything else as compact JSON."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return len(dumps(value).encode("utf-8"))
@@ -0,0 +1,457 @@
+"""
+Columnar export of stored artifacts for school-level analysis.
+
+`export_collections(out_dir)` reads the screening profiles, worksheet
+evaluations, progress reports and medical flag reports from the storage
+backend in pages of EXPORT_PAGE_SIZE documents and writes them as typed Parquet
+(or Arrow IPC) files, one table per collection:
+
+- nested models are flattened into columns, e.g. `screening_results_anxiety`
+  or `summary_overall_understanding`;
+- lists of strings become list columns and `Literal` fields are
+  dictionary-encoded;
+- lists of models (`concept_progress`, `answer_feedback`) go to child tables
+  such as `student_progress_reports__concept_progress`, one row per item with
+  the parent's `document_id`, `updated_at` and the item's `position`.
+
+Every table starts with `document_id` and `updated_at`, the time
+`state.record_artifact` stored the document. Each run writes new
+`<table>/part-<run>.parquet` files and remembers, per collection, the newest
+`updated_at` it exported (`_export_state.json` in `out_dir`); the next run only
+queries documents updated after it. Screening profiles and medical flag
+reports are overwritten per student, so a table can hold several versions of
+a document: `read_table(out_dir, table)` keeps the latest one.
+`full=True` (`--full`) replaces the tables with a complete export.
+
+Requires `pyarrow`.
+
+Usage:
+    python -m teacher_assistant_agent.export exports/ [--full] [--format parquet]
+"""
+import argparse
+import glob
+import importlib
+import json
+import os
+import time
+import typing
+from dataclasses import dataclass
+from datetime import date, datetime
+from types import UnionType
+from typing import Callable, Literal, Optional, Union
+
+from pydantic import BaseModel
+
+from teacher_assistant_agent import codec
+from teacher_assistant_agent.history import VERSIONED_COLLECTIONS
+from teacher_assistant_agent.storage import get_storage
+
+try:
+    import pyarrow as pa
+except ImportError:  # only needed for exports
+    pa = None
+
+EXPORT_PAGE_SIZE = int(os.environ.get("EXPORT_PAGE_SIZE", 500))
+STATE_FILE = "_export_state.json"
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# Exported collection -> schema of its documents.
+EXPORT_SCHEMAS = {
+    "screening_profile": "teacher_assistant_agent.sub_agents.screener_evaluation_agent.agent:PsychProfileResult",
+    "worksheet_evaluations": "teacher_assistant_agent.sub_agents.worksheet_evaluator_agent.agent:WorksheetEvaluation",
+    "student_progress_reports": "teacher_assistant_agent.sub_agents.progress_tracker_agent.agent:StudentProgressReport",
+    "medical_flag_reports": "teacher_assistant_agent.sub_agents.medical_flag_agent.agent:MedicalFlagReport",
+}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Exports need pyarrow: pip install pyarrow")
+
+
+def _schema(collection) -> type[BaseModel]:
+    module, _, name = EXPORT_SCHEMAS[collection].partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+# --- value conversion ---------------------------------------------------------
+
+
+def _text(value):
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        return codec.dumps(value)
+    return str(value)
+
+
+def _int(value):
+    return int(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _float(value):
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _bool(value):
+    return value if isinstance(value, bool) else None
+
+
+def _json(value):
+    return None if value is None else codec.dumps(value)
+
+
+def _timestamp(value):
+    try:
+        return datetime.fromisoformat(value) if isinstance(value, str) else None
+    except ValueError:
+        return None
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value) if isinstance(value, str) else None
+    except ValueError:
+        return None
+
+
+def _list(convert):
+    return lambda value: [convert(item) for item in value] if isinstance(value, list) else None
+
+
+def _arrow_type(annotation, in_list=False):
+    """(Arrow type, converter) for a field that is not a model or a list of models."""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin in (Union, UnionType):
+        options = [arg for arg in args if arg is not type(None)]
+        if len(options) == 1:
+            return _arrow_type(options[0], in_list)
+    if origin is Literal and all(isinstance(arg, str) for arg in args):
+        return (pa.string() if in_list else pa.dictionary(pa.int32(), pa.string())), _text
+    if origin in (list, tuple, set) and args and not in_list:
+        item_type, convert = _arrow_type(args[0], in_list=True)
+        return pa.list_(item_type), _list(convert)
+    if annotation is bool:
+        return pa.bool_(), _bool
+    if annotation is int:
+        return pa.int64(), _int
+    if annotation is float:
+        return pa.float64(), _float
+    if annotation is str:
+        return pa.string(), _text
+    return pa.string(), _json
+
+
+# --- table layout -------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+    path: tuple  # keys leading to the value in the document (or list item)
+    type: object  # pyarrow.DataType
+    convert: Callable
+
+
+@dataclass(frozen=True)
+class Table:
+    name: str
+    columns: list
+    path: tuple = ()  # for child tables, the list of models the rows come from
+
+    def schema(self):
+        return pa.schema([(column.name, column.type) for column in self.columns])
+
+
+def _fields(schema, path=()):
+    """Flattened columns of `schema`, and the paths of its lists of models."""
+    columns, lists = [], []
+    for name, field in schema.model_fields.items():
+        model = codec._model_of(field.annotation)
+        item_model = codec._item_model(field.annotation)
+        if model is not None:
+            nested, nested_lists = _fields(model, path + (name,))
+            columns += nested
+            lists += nested_lists
+        elif item_model is not None:
+            lists.append((path + (name,), item_model))
+        else:
+            arrow_type, convert = _arrow_type(field.annotation)
+            columns.append(Column("_".join(path + (name,)), path + (name,), arrow_type, convert))
+    return columns, lists
+
+
+def tables(collection) -> list[Table]:
+    """The parent table of `collection` followed by its child tables."""
+    _require_pyarrow()
+    keys = [
+        Column("document_id", ("document_id",), pa.string(), _text),
+        Column("updated_at", ("updated_at",), pa.timestamp("us"), _timestamp),
+    ]
+    if collection in VERSIONED_COLLECTIONS:
+        keys += [
+            Column("subject_key", ("subject_key",), pa.string(), _text),
+            Column("chapter_key", ("chapter_key",), pa.string(), _text),
+            Column("record_date", ("record_date",), pa.date32(), _date),
+        ]
+    columns, lists = _fields(_schema(collection))
+    result = [Table(collection, keys + columns)]
+    for path, item_model in lists:
+        item_columns, _ = _fields(item_model)  # deeper lists of models are not split out
+        position = Column("position", ("position",), pa.int32(), _int)
+        result.append(Table(f"{collection}__{'_'.join(path)}", keys[:2] + [position] + item_columns, path))
+    return result
+
+
+def _value(data, path):
+    for name in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(name)
+    return data
+
+
+def _rows(table: Table, document, data) -> list[dict]:
+    if not table.path:
+        return [dict(data, document_id=document)]
+    items = _value(data, table.path)
+    return [
+        dict(item, document_id=document, updated_at=data.get("updated_at"), position=position)
+        for position, item in enumerate(items if isinstance(items, list) else [])
+        if isinstance(item, dict)
+    ]
+
+
+def _record_batch(table: Table, rows):
+    return pa.Table.from_pydict(
+        {column.name: [column.convert(_value(row, column.path)) for row in rows] for column in table.columns},
+        schema=table.schema(),
+    )
+
+
+# --- reading and writing ------------------------------------------------------
+
+
+def pages(collection, since: Optional[str] = None, page_size: int = EXPORT_PAGE_SIZE, storage=None):
+    """
+    Yield lists of at most `page_size` `(document_id, data)` tuples.
+
+    Without `since` every document is streamed, including ones stored before
+    documents had an `updated_at`. With `since`, only documents updated after
+    it are queried, ordered by `updated_at` and paged on it.
+    """
+    storage = storage or get_storage()
+    if since is None:
+        page = []
+        for document, data in storage.stream(collection):
+            page.append((document, codec.decode_document(data)))
+            if len(page) >= page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+        return
+    op, limit, at_cursor = ">", page_size, set()
+    while True:
+        rows = storage.query(collection, filters=[("updated_at", op, since)], order_by="updated_at", limit=limit)
+        page = [
+            (document, codec.decode_document(data)) for document, data in rows
+            if not (data["updated_at"] == since and document in at_cursor)
+        ]
+        if page:
+            yield page
+        if len(rows) < limit:
+            return
+        last = rows[-1][1]["updated_at"]
+        if last == since:
+            limit *= 2  # more than a page of documents share one timestamp
+        else:
+            since, limit, at_cursor = last, page_size, set()
+        at_cursor.update(document for document, data in rows if data["updated_at"] == since)
+        op = ">="
+
+
+class _Writer:
+    """One output file, opened on the first batch."""
+
+    def __init__(self, path, schema, format):
+        self.path = path
+        self.schema = schema
+        self.format = format
+        self.rows = 0
+        self._writer = None
+
+    def write(self, batch):
+        if not batch.num_rows:
+            return
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            if self.format == "parquet":
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(self.path, self.schema, compression="zstd")
+            else:
+                self._writer = pa.ipc.new_file(self.path, self.schema)
+        self._writer.write_table(batch)
+        self.rows += batch.num_rows
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _load_state(out_dir) -> dict:
+    try:
+        with open(os.path.join(out_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_state(out_dir, state):
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _parts(out_dir, table):
+    return sorted(
+        path for extension in FORMATS.values()
+        for path in glob.glob(os.path.join(out_dir, table, f"part-*{extension}"))
+    )
+
+
+def export_collection(collection, out_dir, since=None, page_size=EXPORT_PAGE_SIZE, format="parquet",
+                      run_id=None, storage=None) -> dict:
+    """
+    Export the documents of `collection` updated after `since` (all if None).
+
+    Returns:
+        dict: documents exported, rows per table, files written and the
+        newest `updated_at` seen (or `since` if there was none).
+    """
+    _require_pyarrow()
+    run_id = run_id or datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    layout = tables(collection)
+    writers = [
+        _Writer(os.path.join(out_dir, table.name, f"part-{run_id}{FORMATS[format]}"), table.schema(), format)
+        for table in layout
+    ]
+    documents, newest = 0, since
+    try:
+        for page in pages(collection, since, page_size, storage):
+            documents += len(page)
+            for table, writer in zip(layout, writers):
+                writer.write(_record_batch(table, [row for document, data in page for row in _rows(table, document, data)]))
+            stamps = [data["updated_at"] for _, data in page if isinstance(data.get("updated_at"), str)]
+            if stamps and (newest is None or max(stamps) > newest):
+                newest = max(stamps)
+    finally:
+        for writer in writers:
+            writer.close()
+    return {
+        "documents": documents,
+        "rows": {table.name: writer.rows for table, writer in zip(layout, writers)},
+        "files": [writer.path for writer in writers if writer.rows],
+        "updated_at": newest,
+    }
+
+
+def export_collections(out_dir, collections=None, full=False, page_size=EXPORT_PAGE_SIZE, format="parquet",
+                       storage=None) -> dict:
+    """
+    Export `collections` (default: all of EXPORT_SCHEMAS) to `out_dir`.
+
+    Incremental unless `full` is set or a collection was never exported to
+    `out_dir`. A full export deletes the collection's earlier part files once
+    the new ones are written.
+
+    Returns:
+        dict: `export_collection` results by collection.
+    """
+    _require_pyarrow()
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format {format!r}; expected one of {sorted(FORMATS)}")
+    storage = storage or get_storage()
+    storage.flush()
+    os.makedirs(out_dir, exist_ok=True)
+    state = _load_state(out_dir)
+    watermarks = state.setdefault("updated_at", {})
+    run_id = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    results = {}
+    for collection in collections or EXPORT_SCHEMAS:
+        if collection not in EXPORT_SCHEMAS:
+            raise ValueError(f"No export schema for collection {collection!r}")
+        since = None if full else watermarks.get(collection)
+        earlier = {table.name: _parts(out_dir, table.name) for table in tables(collection)} if since is None else {}
+        start = time.perf_counter()
+        result = export_collection(collection, out_dir, since, page_size, format, run_id, storage)
+        result["seconds"] = round(time.perf_counter() - start, 3)
+        for paths in earlier.values():
+            for path in paths:
+                os.remove(path)
+        if result["updated_at"]:
+            watermarks[collection] = result["updated_at"]
+        _save_state(out_dir, state)
+        results[collection] = result
+    return results
+
+
+def read_table(out_dir, table, latest=True):
+    """
+    All exported parts of `table` as one `pyarrow.Table`.
+
+    Args:
+        latest (bool): Keep only the newest version of each document (by
+            `document_id` and `updated_at`), as incremental exports append
+            documents that were overwritten. Child tables (`<collection>__<field>`)
+            keep every item of that version.
+    """
+    _require_pyarrow()
+    import pyarrow.dataset as ds
+
+    parts = _parts(out_dir, table)
+    if not parts:
+        raise FileNotFoundError(f"No exported parts for {table!r} in {out_dir}")
+    data = pa.concat_tables(
+        ds.dataset(path, format="ipc" if path.endswith(".arrow") else "parquet").to_table() for path in parts
+    ).unify_dictionaries()  # each page encodes its own dictionary
+    if not latest or not data.num_rows:
+        return data
+    import pyarrow.compute as pc
+
+    # Newest version first within each document; documents stored before
+    # `updated_at` existed sort last.
+    data = data.take(pc.sort_indices(data, sort_keys=[("document_id", "ascending", "at_end"),
+                                                      ("updated_at", "descending", "at_end")]))
+    ids = data["document_id"]
+    first = pc.not_equal(ids.slice(1), ids.slice(0, len(ids) - 1)).fill_null(True)
+    first = pa.concat_arrays([pa.array([True]), *first.chunks])
+    if "__" not in table:
+        return data.filter(first)
+    stamps = data["updated_at"]
+    # A child table has several rows per version; keep all rows carrying
+    # their document's newest `updated_at`.
+    newest = stamps.filter(first).take(pc.subtract(pc.cumulative_sum(first.cast(pa.int64())), 1))
+    same = pc.equal(stamps, newest).fill_null(False)
+    return data.filter(pc.or_(same, pc.and_(stamps.is_null(), newest.is_null())))
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Export stored artifacts to columnar files.")
+    parser.add_argument("out_dir", help="Directory for the tables and the export state.")
+    parser.add_argument("--collections", nargs="+", choices=sorted(EXPORT_SCHEMAS), help="Default: all.")
+    parser.add_argument("--full", action="store_true", help="Re-export everything instead of new updates only.")
+    parser.add_argument("--page-size", type=int, default=EXPORT_PAGE_SIZE)
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    args = parser.parse_args()
+    results = export_collections(args.out_dir, args.collections, args.full, args.page_size, args.format)
+    for collection, result in results.items():
+        rows = ", ".join(f"{table} {count}" for table, count in result["rows"].items())
+        print(f"{collection}: {result['documents']} documents in {result['seconds']}s ({rows}); "
+              f"updated through {result['updated_at'] or '-'}")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,176 @@
+import copy
+import threading
+import time
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, document_id, data):
+        self.id = document_id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+
+class FakeDocumentReference:
+    def __init__(self, client, collection, document_id):
+        self._client = client
+        self.collection_name = collection
+        self.id = str(document_id)
+
+    def set(self, data):
+        self._client._write(self.collection_name, self.id, data)
+
+    def get(self, transaction=None):
+        with self._client._lock:
+            data = self._client.collections.get(self.collection_name, {}).get(self.id)
+        return FakeDocumentSnapshot(self.id, copy.deepcopy(data))
+
+
+class FakeQuery:
+    """
+    Immutable query over one collection: `where(filter=FieldFilter(...))`,
+    `order_by`, `select`, `limit` and `stream`, with Firestore's semantics that
+    documents missing a filtered or ordered field are left out.
+    """
+
+    def __init__(self, client, collection, filters=(), orders=(), fields=None, limit=None):
+        self._client = client
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._fields = fields
+        self._limit = limit
+
+    def _copy(self, **changes):
+        values = {"filters": self._filters, "orders": self._orders, "fields": self._fields, "limit": self._limit}
+        values.update(changes)
+        return FakeQuery(self._client, self._collection, **values)
+
+    def where(self, filter):
+        return self._copy(filters=self._filters + ((filter.field_path, filter.op_string, filter.value),))
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._copy(orders=self._orders + ((field_path, direction == "DESCENDING"),))
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def stream(self):
+        from teacher_assistant_agent.storage import InMemoryStorage
+
+        with self._client._lock:
+            docs = copy.deepcopy(self._client.collections.get(self._collection, {}))
+        storage = InMemoryStorage()
+        storage.collections[self._collection] = docs
+        order_by, descending = self._orders[0] if self._orders else (None, False)
+        for document_id, data in storage.query(
+            self._collection, self._filters, order_by, descending, self._limit, self._fields
+        ):
+            yield FakeDocumentSnapshot(document_id, data)
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, client, name):
+        super().__init__(client, name)
+        self.id = name
+
+    def document(self, document_id):
+        return FakeDocumentReference(self._client, self.id, document_id)
+
+
+class FakeWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, data):
+        self._writes.append((reference.collection_name, reference.id, data))
+
+    def commit(self):
+        self._client._commit(self._writes)
+
+
+class FakeTransaction:
+    """
+    Runs under `firestore.transactional`: holds the client's transaction lock
+    from `_begin` to `_commit`/`_rollback`, so transactions never interleave.
+    """
+
+    _read_only = False
+    _max_attempts = 5
+
+    def __init__(self, client):
+        self._client = client
+        self._id = None
+        self._writes = []
+
+    def set(self, reference, data):
+        self._writes.append((reference.collection_name, reference.id, data))
+
+    def _clean_up(self):
+        self._writes = []
+
+    def _begin(self, retry_id=None):
+        self._client._transaction_lock.acquire()
+        self._id = b"fake-transaction"
+
+    def _commit(self):
+        try:
+            self._client._commit(self._writes)
+        finally:
+            self._finish()
+        return []
+
+    def _rollback(self):
+        if self._id is not None:
+            self._finish()
+
+    def _finish(self):
+        self._id = None
+        self._writes = []
+        self._client._transaction_lock.release()
+
+
+class FakeFirestoreClient:
+    """
+    In-memory stand-in for `firestore.client()`.
+
+    Supports the subset used by this project: `collection().document().set()/get()`,
+    `collection().stream()`, single-order queries, `batch()` and `transaction()`.
+    Every commit is recorded in `commits` so callers can check how writes were grouped.
+    """
+
+    def __init__(self, commit_delay_seconds=0.0):
+        self.collections = {}
+        self.commits = []
+        self.commit_delay_seconds = commit_delay_seconds
+        self._lock = threading.Lock()
+        self._transaction_lock = threading.Lock()
+
+    def collection(self, name):
+        return FakeCollectionReference(self, name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+    def _write(self, collection, document_id, data):
+        self._commit([(collection, document_id, data)])
+
+    def _commit(self, writes):
+        if self.commit_delay_seconds:
+            time.sleep(self.commit_delay_seconds)
+        with self._lock:
+            for collection, document_id, data in writes:
+                self.collections.setdefault(collection, {})[document_id] = copy.deepcopy(data)
+            self.commits.append([(collection, document_id) for collection, document_id, _ in writes])
@@ -1,12 +1,226 @@
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import firestore
-import os
-# Use a service account.
-current_dir = os.path.dirname(os.path.abspath(__file__))
-service_account_path = os.path.join(current_dir, 'firebaseServiceAccount.json')
-cred = credentials.Certificate(service_account_path)
-
-app = firebase_admin.initialize_app(cred)
-
-db = firestore.client()
\ No newline at end of file
+import copy
+import os
+import threading
+import time
+from collections import deque
+
+from teacher_assistant_agent.metrics import percentile, storage_commit_latency
+
+# Use a service account.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+service_account_path = os.environ.get(
+    "FIREBASE_SERVICE_ACCOUNT", os.path.join(current_dir, 'firebaseServiceAccount.json')
+)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the Firestore client, initializing the Firebase app on first use.
+
+    firebase_admin is imported here rather than at module level so that importing
+    the agent tree does not pay Firebase startup cost or require the
+    service-account file unless the Firestore backend is actually used.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import firebase_admin
+                from firebase_admin import credentials
+                from firebase_admin import firestore
+
+                cred = credentials.Certificate(service_account_path)
+                firebase_admin.initialize_app(cred)
+                _client = firestore.client()
+    return _client
+
+
+def __getattr__(name):
+    # Keeps `from teacher_assistant_agent.firestore import db` working without
+    # initializing Firebase at import time.
+    if name == "db":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Firestore rejects a WriteBatch with more than 500 operations.
+MAX_BATCH_SIZE = 500
+
+
+class BatchedWriter:
+    """
+    Write pipeline shared by all after_agent_callbacks.
+
+    `set()` only queues the document and returns immediately. A background
+    worker coalesces queued writes (the last write to a document wins) and
+    commits them with one WriteBatch per `max_batch_size` documents, so the
+    Firestore round-trip is no longer part of the agent turn.
+
+    Args:
+        client: A Firestore client, or anything exposing `collection()` and
+            `batch()` such as `fake_firestore.FakeFirestoreClient`.
+        max_batch_size (int): Maximum number of documents per commit.
+        linger_seconds (float): How long the worker waits for more writes
+            before committing a partially filled batch.
+        max_retries (int): Commit attempts before a batch is dropped.
+    """
+
+    def __init__(self, client, max_batch_size=MAX_BATCH_SIZE, linger_seconds=0.05, max_retries=3):
+        self.client = client
+        self.max_batch_size = min(max_batch_size, MAX_BATCH_SIZE)
+        self.linger_seconds = linger_seconds
+        self.max_retries = max_retries
+
+        self._pending = {}  # (collection, document) -> data, in arrival order
+        self._in_flight_batch = {}
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._flush_waiters = 0
+        self._closed = False
+        self._worker = None
+
+        self._commit_latencies_ms = deque(maxlen=1000)
+        self._counters = {
+            "writes_enqueued": 0,
+            "writes_coalesced": 0,
+            "writes_committed": 0,
+            "writes_failed": 0,
+            "commits": 0,
+            "commit_errors": 0,
+        }
+
+    def set(self, collection, document, data):
+        """Queue a copy of `data` to be stored at `collection/document`."""
+        # Copied so later changes to the caller's dict do not alter the pending write.
+        data = copy.deepcopy(data)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BatchedWriter is closed")
+            key = (collection, str(document))
+            if key in self._pending:
+                # Re-insert so the document keeps its latest position in the queue.
+                del self._pending[key]
+                self._counters["writes_coalesced"] += 1
+            self._pending[key] = data
+            self._counters["writes_enqueued"] += 1
+            self._ensure_worker()
+            self._cond.notify_all()
+
+    def pending(self, collection, document):
+        """Return the queued or uncommitted data for a document, or None, so reads can see their own writes."""
+        key = (collection, str(document))
+        with self._cond:
+            if key in self._pending:
+                return self._pending[key]
+            return self._in_flight_batch.get(key)
+
+    def flush(self, timeout=None):
+        """
+        Block until every write queued so far has been committed (or dropped).
+
+        Returns:
+            bool: False if `timeout` expired before the queue drained.
+        """
+        with self._cond:
+            self._flush_waiters += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(
+                    lambda: not self._pending and not self._in_flight, timeout
+                )
+            finally:
+                self._flush_waiters -= 1
+
+    def close(self, timeout=None):
+        """Drain the queue and stop the background worker. Used as the shutdown hook."""
+        drained = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+        return drained
+
+    def stats(self):
+        """Return queue depth, write counters and commit latency in milliseconds."""
+        with self._cond:
+            last_latency = self._commit_latencies_ms[-1] if self._commit_latencies_ms else None
+            latencies = sorted(self._commit_latencies_ms)
+            stats = dict(self._counters)
+            stats["queue_depth"] = len(self._pending) + self._in_flight
+        stats["commit_latency_ms"] = {
+            "last": last_latency,
+            "avg": sum(latencies) / len(latencies) if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "max": latencies[-1] if latencies else None,
+        }
+        return stats
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(
+                target=self._run, name="firestore-batched-writer", daemon=True
+            )
+            self._worker.start()
+
+    def _next_batch(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self._closed)
+            if not self._pending:
+                return None
+            # Linger briefly so writes from concurrent turns share a commit.
+            if len(self._pending) < self.max_batch_size and not self._flush_waiters:
+                self._cond.wait_for(
+                    lambda: len(self._pending) >= self.max_batch_size
+                    or self._flush_waiters
+                    or self._closed,
+                    self.linger_seconds,
+                )
+            keys = list(self._pending)[:self.max_batch_size]
+            batch = [(key, self._pending.pop(key)) for key in keys]
+            self._in_flight_batch = dict(batch)
+            self._in_flight = len(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            committed = self._commit(batch)
+            with self._cond:
+                self._in_flight = 0
+                self._in_flight_batch = {}
+                if committed:
+                    self._counters["writes_committed"] += len(batch)
+                else:
+                    self._counters["writes_failed"] += len(batch)
+                self._cond.notify_all()
+
+    def _commit(self, batch):
+        for attempt in range(1, self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                write_batch = self.client.batch()
+                for (collection, document), data in batch:
+                    write_batch.set(self.client.collection(collection).document(document), data)
+                write_batch.commit()
+            except Exception as e:
+                with self._cond:
+                    self._counters["commit_errors"] += 1
+                print(f"Error committing Firestore batch (attempt {attempt}/{self.max_retries}): {e}")
+                time.sleep(min(0.1 * 2 ** attempt, 2.0))
+                continue
+            latency = time.perf_counter() - start
+            storage_commit_latency.observe(latency)
+            with self._cond:
+                self._counters["commits"] += 1
+                self._commit_latencies_ms.append(latency * 1000)
+            return True
+        print(f"Dropping {len(batch)} Firestore writes after {self.max_retries} failed commits.")
+        return False
@@ -0,0 +1,281 @@
+"""
+Versioned documents for per-student history.
+
+Evaluations, reinforcement sessions, progress reports and lesson plans are
+stored one document per version, keyed by owner/subject/chapter/date, instead
+of one document per student or chapter that every new write replaced. Each
+document also carries normalized `subject_key`, `chapter_key` and
+`record_date` fields, which the history queries filter and sort on (see
+`storage.COMPOSITE_INDEXES` and firestore.indexes.json).
+"""
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.tools.tool_context import ToolContext
+
+from teacher_assistant_agent import codec
+from teacher_assistant_agent.model_io import latest_user_text, parse_json_object, replace_user_text
+from teacher_assistant_agent.storage import get_storage
+
+# How many recent evaluations and reinforcement sessions a history summary includes.
+STUDENT_HISTORY_LIMIT = int(os.environ.get("STUDENT_HISTORY_LIMIT", 5))
+
+
+@dataclass(frozen=True)
+class VersionedCollection:
+    owner_field: str  # first part of the document id
+    date_field: Optional[str]  # payload date; None uses the write date
+    lookup_field: str  # indexed field matching the ids documents had before versioning
+
+
+VERSIONED_COLLECTIONS = {
+    "worksheet_evaluations": VersionedCollection("student_id", "evaluation_date", "student_id"),
+    "personalized_reinforcement": VersionedCollection("student_id", "reinforcement_date", "student_id"),
+    "student_progress_reports": VersionedCollection("student_id", "report_date", "student_id"),
+    "lesson_plans": VersionedCollection("class_name", None, "chapter_key"),
+}
+
+# Fields a history fetch returns unless the caller asks for others.
+EVALUATION_FIELDS = (
+    "record_date", "subject_name", "chapter_name",
+    "summary.overall_understanding", "summary.conceptual_strengths",
+    "summary.conceptual_weaknesses", "summary.suggested_retest_areas",
+)
+REINFORCEMENT_FIELDS = ("record_date", "subject_name", "chapter_name", "weak_areas")
+
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+# Ids like "c1s1", or "student 42" / "student_id: s-07".
+_STUDENT_ID = re.compile(r"\b(c\d+s\d+)\b|\bstudent(?:[ _]id)?\s*[:#]?\s*([A-Za-z]*\d[\w-]*)", re.IGNORECASE)
+_CHAPTER = re.compile(r"\bchapter\s*[:\-]?\s*[\"']?([^\"',.;\n]+)", re.IGNORECASE)
+
+# Keys showing the teacher already pasted an evaluation or history.
+_HISTORY_KEYS = {"summary", "answer_feedback", "evaluations", "evaluation_history", "reinforcements", "reinforcement_history"}
+
+
+def normalize(value) -> str:
+    return re.sub(r"[^\w]+", "-", str(value or "").lower()).strip("-")
+
+
+def versioned(collection: str, data: dict) -> tuple[str, dict]:
+    """
+    Document id and indexed payload for a new version of `data`.
+
+    The id is `<owner>__<subject>__<chapter>__<date>__<ms timestamp>`, so repeated
+    writes on the same day are kept as separate versions.
+
+    Returns:
+        tuple: (document id, copy of `data` with the index fields added).
+    """
+    spec = VERSIONED_COLLECTIONS[collection]
+    date = str(data.get(spec.date_field) or "") if spec.date_field else ""
+    match = _DATE.search(date)
+    record_date = match.group(0) if match else datetime.now().strftime("%Y-%m-%d")
+    indexed = dict(
+        data,
+        subject_key=normalize(data.get("subject_name")),
+        chapter_key=normalize(data.get("chapter_name")),
+        record_date=record_date,
+        recorded_at=datetime.now().isoformat(timespec="seconds"),
+    )
+    document = "__".join([
+        normalize(data.get(spec.owner_field)) or "unknown",
+        indexed["subject_key"] or "any",
+        indexed["chapter_key"] or "any",
+        record_date,
+        str(int(time.time() * 1000)),
+    ])
+    return document, indexed
+
+
+def history(
+    collection: str,
+    student_id: str,
+    subject_name: Optional[str] = None,
+    chapter_name: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    fields=None,
+    limit: Optional[int] = None,
+) -> list[dict]:
+    """
+    A student's documents in `collection`, newest first.
+
+    Args:
+        subject_name, chapter_name (str): Narrow to one subject / chapter.
+        start_date, end_date (str): Inclusive YYYY-MM-DD bounds on `record_date`.
+        fields: Dotted field paths to fetch; None returns whole documents.
+        limit (int): Maximum number of documents.
+
+    Returns:
+        list[dict]: The (projected) documents, each with its `id`.
+    """
+    filters = [("student_id", "==", str(student_id))]
+    if subject_name:
+        filters.append(("subject_key", "==", normalize(subject_name)))
+    if chapter_name:
+        filters.append(("chapter_key", "==", normalize(chapter_name)))
+    if start_date:
+        filters.append(("record_date", ">=", start_date))
+    if end_date:
+        filters.append(("record_date", "<=", end_date))
+    rows = get_storage().query(
+        collection, filters, order_by="record_date", descending=True, limit=limit, fields=fields
+    )
+    return [{"id": document, **codec.decode_document(data)} for document, data in rows]
+
+
+def evaluation_history(student_id, subject_name=None, chapter_name=None, start_date=None, end_date=None,
+                       fields=EVALUATION_FIELDS, limit=None) -> list[dict]:
+    """Worksheet evaluation summaries of a student, newest first. See `history`."""
+    return history("worksheet_evaluations", student_id, subject_name, chapter_name, start_date, end_date, fields, limit)
+
+
+def reinforcement_history(student_id, subject_name=None, chapter_name=None, start_date=None, end_date=None,
+                          fields=REINFORCEMENT_FIELDS, limit=None) -> list[dict]:
+    """Reinforcement sessions of a student, newest first. See `history`."""
+    return history("personalized_reinforcement", student_id, subject_name, chapter_name, start_date, end_date, fields, limit)
+
+
+def latest(collection: str, legacy_id: str) -> Optional[tuple[str, dict]]:
+    """
+    Most recent `(document id, data)` for an id from before versioning, e.g. a
+    student id in `worksheet_evaluations` or a chapter name in `lesson_plans`.
+    """
+    field = VERSIONED_COLLECTIONS[collection].lookup_field
+    value = normalize(legacy_id) if field.endswith("_key") else str(legacy_id)
+    rows = get_storage().query(collection, [(field, "==", value)], order_by="record_date", descending=True, limit=1)
+    return (rows[0][0], codec.decode_document(rows[0][1])) if rows else None
+
+
+def request_target(text: str) -> tuple[str, str, str]:
+    """`(student_id, subject_name, chapter_name)` named in a request, from its JSON or its wording."""
+    payload = parse_json_object(text) or {}
+    student_id = str(payload.get("student_id") or "")
+    if not student_id:
+        match = _STUDENT_ID.search(text)
+        student_id = (match.group(1) or match.group(2)) if match else ""
+    chapter_name = payload.get("chapter_name") or ""
+    if not chapter_name and not payload:
+        match = _CHAPTER.search(text)
+        chapter_name = match.group(1).strip() if match else ""
+    return student_id, payload.get("subject_name") or "", chapter_name
+
+
+def _cached_history(state, collection, student_id, subject_name, chapter_name):
+    """`history()` with the request's read cache in `state["temp:history_reads"]`."""
+    key = "|".join([collection, str(student_id), normalize(subject_name), normalize(chapter_name)])
+    reads = dict(state.get("temp:history_reads") or {}) if state is not None else {}
+    if key not in reads:
+        fields = EVALUATION_FIELDS if collection == "worksheet_evaluations" else REINFORCEMENT_FIELDS
+        reads[key] = history(collection, student_id, subject_name, chapter_name, fields=fields, limit=STUDENT_HISTORY_LIMIT)
+        if state is not None:
+            state["temp:history_reads"] = reads
+    return reads[key]
+
+
+def student_history(student_id: str, subject_name: str = "", chapter_name: str = "", state=None) -> dict:
+    """
+    Compact evaluation and reinforcement history of a student, oldest first.
+
+    Only the summary fields are read from storage; answers, feedback and
+    reinforcement questions never leave it.
+
+    Args:
+        state: Session state holding the per-request read cache (optional).
+
+    Returns:
+        dict: Recent evaluations and reinforcement sessions plus which
+            concepts improved and which are still weak.
+    """
+    evaluations = list(reversed(_cached_history(state, "worksheet_evaluations", student_id, subject_name, chapter_name)))
+    reinforcements = list(reversed(_cached_history(state, "personalized_reinforcement", student_id, subject_name, chapter_name)))
+
+    summary = {"evaluations": len(evaluations), "reinforcements": len(reinforcements)}
+    if evaluations:
+        latest_summary = evaluations[-1].get("summary") or {}
+        earlier_weak = {
+            normalize(concept)
+            for evaluation in evaluations[:-1]
+            for concept in (evaluation.get("summary") or {}).get("conceptual_weaknesses") or []
+        }
+        summary.update({
+            "latest_understanding": latest_summary.get("overall_understanding"),
+            "improved": [c for c in latest_summary.get("conceptual_strengths") or [] if normalize(c) in earlier_weak],
+            "still_weak": latest_summary.get("conceptual_weaknesses") or [],
+        })
+    return {
+        "student_id": student_id,
+        "subject_name": subject_name or None,
+        "chapter_name": chapter_name or None,
+        "evaluations": [
+            {
+                "date": evaluation.get("record_date"),
+                "chapter": evaluation.get("chapter_name"),
+                "understanding": (evaluation.get("summary") or {}).get("overall_understanding"),
+                "strengths": (evaluation.get("summary") or {}).get("conceptual_strengths") or [],
+                "weaknesses": (evaluation.get("summary") or {}).get("conceptual_weaknesses") or [],
+                "retest": (evaluation.get("summary") or {}).get("suggested_retest_areas") or [],
+            }
+            for evaluation in evaluations
+        ],
+        "reinforcements": [
+            {"date": item.get("record_date"), "chapter": item.get("chapter_name"), "weak_areas": item.get("weak_areas") or []}
+            for item in reinforcements
+        ],
+        "summary": summary,
+    }
+
+
+def get_student_history(student_id: str, tool_context: ToolContext, subject_name: str = "", chapter_name: str = "") -> dict:
+    """
+    Fetch a compact summary of a student's stored worksheet evaluations and
+    reinforcement sessions (dates, understanding, strengths, weaknesses and
+    reinforced areas). Use it instead of asking the teacher to paste history.
+
+    Args:
+        student_id (str): The student's id, e.g. "c1s1".
+        subject_name (str): Optional subject to narrow the history to.
+        chapter_name (str): Optional chapter to narrow the history to.
+
+    Returns:
+        dict: {"status": "success", "history": {...}} or {"status": "error", "message": ...}.
+    """
+    try:
+        found = student_history(student_id, subject_name, chapter_name, tool_context.state)
+    except Exception as e:
+        return {"status": "error", "message": f"Could not load history for {student_id}: {e}"}
+    if not found["evaluations"] and not found["reinforcements"]:
+        return {"status": "error", "message": f"No stored evaluations or reinforcement sessions for {student_id}."}
+    return {"status": "success", "history": found}
+
+
+def attach_student_history(callback_context: CallbackContext, llm_request):
+    """
+    before_model_callback: when a request names a student but does not include
+    their evaluation history, append the compact stored history to it.
+    """
+    index, text = latest_user_text(llm_request)
+    if text is None:
+        return None
+    payload = parse_json_object(text) or {}
+    if _HISTORY_KEYS & payload.keys():
+        return None
+    student_id, subject_name, chapter_name = request_target(text)
+    if not student_id:
+        return None
+    try:
+        found = student_history(student_id, subject_name, chapter_name, callback_context.state)
+    except Exception as e:
+        print(f"Error loading history for {student_id}: {e}")
+        return None
+    if not found["evaluations"] and not found["reinforcements"]:
+        return None
+    replace_user_text(llm_request, index, (
+        f"{text}\n\nStored history for this student (oldest first, summaries only):\n{codec.dumps(found)}"
+    ))
+    return None
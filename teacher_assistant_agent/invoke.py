@@ -0,0 +1,62 @@
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+APP_NAME = "shikshak_sahayak"
+
+_runners: dict[int, Runner] = {}
+_runners_lock = threading.Lock()
+
+
+@dataclass
+class AgentRun:
+    """Outcome of running one agent on one message outside the teacher's chat."""
+    text: str
+    state: dict
+    session_id: str
+
+
+def _runner_for(agent: BaseAgent) -> Runner:
+    with _runners_lock:
+        runner = _runners.get(id(agent))
+        if runner is None:
+            runner = Runner(app_name=APP_NAME, agent=agent, session_service=InMemorySessionService())
+            _runners[id(agent)] = runner
+        return runner
+
+
+async def run_agent(agent: BaseAgent, message: str, state: Optional[dict] = None, user_id: str = "system") -> AgentRun:
+    """
+    Run `agent` on `message` in a fresh in-memory session.
+
+    The agent's callbacks run as usual, so results are stored exactly as in a
+    chat turn. Used by the batch and pipeline entry points that call a
+    sub-agent directly instead of going through the root agent.
+
+    Returns:
+        AgentRun: The agent's final text response and the session state after the run.
+    """
+    runner = _runner_for(agent)
+    session = await runner.session_service.create_session(
+        app_name=APP_NAME, user_id=user_id, session_id=uuid.uuid4().hex, state=dict(state or {})
+    )
+    text = ""
+    async for event in runner.run_async(
+        user_id=user_id,
+        session_id=session.id,
+        new_message=types.Content(role="user", parts=[types.Part(text=message)]),
+    ):
+        if event.author == agent.name and event.is_final_response() and event.content and event.content.parts:
+            final_text = "".join(part.text or "" for part in event.content.parts if not part.thought)
+            if final_text.strip():
+                text = final_text
+    session = await runner.session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session.id)
+    # Sessions are throwaway; drop them so long batches don't accumulate state in memory.
+    await runner.session_service.delete_session(app_name=APP_NAME, user_id=user_id, session_id=session.id)
+    return AgentRun(text=text, state=dict(session.state), session_id=session.id)
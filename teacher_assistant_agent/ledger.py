@@ -0,0 +1,229 @@
+import re
+from datetime import datetime
+from typing import Optional
+
+from teacher_assistant_agent.storage import get_storage
+
+LEDGER_COLLECTION = "concept_ledgers"
+
+# How many recent observations of a concept decide its current status.
+RECENT_OBSERVATIONS = 3
+# Evaluation and reinforcement ids remembered per chapter, so a replayed one is not counted twice.
+RECORDED_IDS_LIMIT = 50
+
+_STATUS_SCORE = {"Weak": 0.0, "Moderate": 1.0, "Strong": 2.0}
+_UNDERSTANDING_SCORE = {"Good": 1.0, "Average": 0.5, "Needs Improvement": 0.0}
+
+
+def _concept_key(concept) -> str:
+    return re.sub(r"[^\w]+", " ", str(concept).lower()).strip()
+
+
+def _chapter_key(subject_name, chapter_name) -> str:
+    return f"{_concept_key(subject_name)}|{_concept_key(chapter_name)}"
+
+
+def _status(scores) -> str:
+    """Status from the mean of the most recent observation scores."""
+    recent = scores[-RECENT_OBSERVATIONS:]
+    mean = sum(recent) / len(recent)
+    if mean >= 1.5:
+        return "Strong"
+    if mean >= 0.75:
+        return "Moderate"
+    return "Weak"
+
+
+def _update(student_id, apply):
+    """Read-modify-write one student's ledger atomically (see `StorageBackend.update`)."""
+    def update(ledger):
+        ledger = ledger or {"student_id": student_id, "chapters": {}}
+        apply(ledger)
+        ledger["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return ledger
+
+    return get_storage().update(LEDGER_COLLECTION, student_id, update)
+
+
+def _first_time(chapter, field, document_id) -> bool:
+    """Remember `document_id` under `chapter[field]`; False if it was already recorded."""
+    if not document_id:
+        return True
+    recorded = chapter.setdefault(field, [])
+    if document_id in recorded:
+        return False
+    chapter[field] = (recorded + [document_id])[-RECORDED_IDS_LIMIT:]
+    return True
+
+
+def _chapter(ledger, data):
+    key = _chapter_key(data.get("subject_name", ""), data.get("chapter_name", ""))
+    chapter = ledger["chapters"].setdefault(key, {
+        "subject_name": data.get("subject_name"),
+        "chapter_name": data.get("chapter_name"),
+        "class_name": data.get("class_name"),
+        "evaluations": 0,
+        "reinforcements": 0,
+        "understanding": [],
+        "concepts": {},
+    })
+    if data.get("class_name"):
+        chapter["class_name"] = data["class_name"]
+    return chapter
+
+
+def _concept(chapter, concept):
+    return chapter["concepts"].setdefault(_concept_key(concept), {
+        "concept": concept,
+        "scores": [],
+        "initial_status": None,
+        "scores_since_reinforcement": None,
+        "times_reinforced": 0,
+    })
+
+
+def record_evaluation(evaluation: dict, document_id: str = ""):
+    """
+    Fold a `WorksheetEvaluation` into the student's concept ledger.
+
+    Args:
+        document_id (str): The evaluation's stored id; recording the same id again
+            leaves the ledger unchanged.
+    """
+    student_id = str(evaluation.get("student_id", ""))
+    if not student_id:
+        return None
+    summary = evaluation.get("summary") or {}
+
+    def apply(ledger):
+        chapter = _chapter(ledger, evaluation)
+        if not _first_time(chapter, "evaluation_ids", document_id):
+            return
+        chapter["evaluations"] += 1
+        chapter["last_evaluation_date"] = evaluation.get("evaluation_date")
+        if summary.get("overall_understanding") in _UNDERSTANDING_SCORE:
+            chapter["understanding"] = (chapter["understanding"] + [summary["overall_understanding"]])[-RECENT_OBSERVATIONS:]
+
+        weak = list(summary.get("conceptual_weaknesses") or []) + list(summary.get("suggested_retest_areas") or [])
+        observations = {_concept_key(concept): (concept, 2.0) for concept in summary.get("conceptual_strengths") or []}
+        observations.update({_concept_key(concept): (concept, 0.0) for concept in weak})
+        for key, (concept, score) in observations.items():
+            if not key:
+                continue
+            entry = _concept(chapter, concept)
+            entry["scores"] = (entry["scores"] + [score])[-RECENT_OBSERVATIONS * 2:]
+            if entry["initial_status"] is None:
+                entry["initial_status"] = _status([score])
+            if entry["scores_since_reinforcement"] is not None:
+                entry["scores_since_reinforcement"].append(score)
+
+    return _update(student_id, apply)
+
+
+def record_reinforcement(reinforcement: dict, document_id: str = ""):
+    """Mark the reinforced weak areas so later evaluations count as post-reinforcement (once per `document_id`)."""
+    student_id = str(reinforcement.get("student_id", ""))
+    if not student_id:
+        return None
+
+    def apply(ledger):
+        chapter = _chapter(ledger, reinforcement)
+        if not _first_time(chapter, "reinforcement_ids", document_id):
+            return
+        chapter["reinforcements"] += 1
+        chapter["last_reinforcement_date"] = reinforcement.get("reinforcement_date")
+        for concept in reinforcement.get("weak_areas") or []:
+            if not _concept_key(concept):
+                continue
+            entry = _concept(chapter, concept)
+            if entry["initial_status"] is None:
+                entry["initial_status"] = "Weak"
+            entry["times_reinforced"] += 1
+            entry["scores_since_reinforcement"] = []
+
+    return _update(student_id, apply)
+
+
+def load_ledger(student_id) -> Optional[dict]:
+    return get_storage().get(LEDGER_COLLECTION, str(student_id))
+
+
+def _concept_progress(entry) -> dict:
+    initial = entry["initial_status"] or "Weak"
+    after = entry["scores_since_reinforcement"]
+    if after:
+        post = _status(after)
+    elif entry["times_reinforced"]:
+        post = "Not yet re-evaluated"
+    else:
+        post = _status(entry["scores"]) if entry["scores"] else initial
+
+    current = _STATUS_SCORE.get(post, _STATUS_SCORE[initial])
+    if current > _STATUS_SCORE[initial]:
+        understanding = "Improved"
+    elif current == 0 and (entry["times_reinforced"] or len(entry["scores"]) > 1):
+        understanding = "Needs Attention"
+    else:
+        understanding = "Same"
+    return {
+        "concept": entry["concept"],
+        "initial_status": initial,
+        "post_reinforcement_status": post,
+        "current_understanding": understanding,
+    }
+
+
+def _overall_progress(concepts, understanding) -> str:
+    scores = [_STATUS_SCORE.get(item["post_reinforcement_status"], _STATUS_SCORE[item["initial_status"]]) / 2 for item in concepts]
+    parts = []
+    if scores:
+        parts.append(sum(scores) / len(scores))
+    if understanding:
+        parts.append(_UNDERSTANDING_SCORE[understanding[-1]])
+    score = sum(parts) / len(parts) if parts else 0.5
+    if score >= 0.85:
+        return "Excellent"
+    if score >= 0.65:
+        return "Good"
+    if score >= 0.4:
+        return "Moderate"
+    return "Needs Improvement"
+
+
+def progress_digest(ledger: dict, chapter_name: str = "", subject_name: str = "") -> Optional[dict]:
+    """
+    Deterministic `StudentProgressReport` fields for one chapter of a ledger.
+
+    Args:
+        chapter_name (str): Chapter to report on; defaults to the most recently
+            evaluated one (or the only one matching `subject_name`).
+
+    Returns:
+        dict: student_id, class_name, subject_name, chapter_name, report_date,
+        overall_progress, strengths, persistent_weaknesses and concept_progress,
+        plus `evaluations`/`reinforcements` counts. None if nothing matches.
+    """
+    chapters = list((ledger or {}).get("chapters", {}).values())
+    if subject_name:
+        chapters = [chapter for chapter in chapters if _concept_key(chapter["subject_name"]) == _concept_key(subject_name)] or chapters
+    if chapter_name:
+        chapters = [chapter for chapter in chapters if _concept_key(chapter["chapter_name"]) == _concept_key(chapter_name)]
+    chapters = [chapter for chapter in chapters if chapter["concepts"]]
+    if not chapters:
+        return None
+    chapter = max(chapters, key=lambda item: (item.get("last_evaluation_date") or "", item["evaluations"]))
+
+    concepts = [_concept_progress(entry) for entry in chapter["concepts"].values()]
+    return {
+        "student_id": ledger["student_id"],
+        "class_name": chapter.get("class_name") or "",
+        "subject_name": chapter.get("subject_name") or "",
+        "chapter_name": chapter.get("chapter_name") or "",
+        "report_date": datetime.now().strftime("%Y-%m-%d"),
+        "overall_progress": _overall_progress(concepts, chapter["understanding"]),
+        "strengths": [item["concept"] for item in concepts if item["post_reinforcement_status"] == "Strong"],
+        "persistent_weaknesses": [item["concept"] for item in concepts if item["current_understanding"] == "Needs Attention"],
+        "concept_progress": concepts,
+        "evaluations": chapter["evaluations"],
+        "reinforcements": chapter["reinforcements"],
+    }
@@ -0,0 +1,425 @@
+"""
+In-process metrics for the agent tree.
+
+`instrument(agent)` wraps an agent's callbacks to record model latency, input
+and output tokens, schema-validation failures, callback duration and whole-turn
+duration. Storage writes are timed by `state.record_artifact` and the Firestore
+batched writer. Metrics are exported as Prometheus text or JSON, over HTTP when
+METRICS_PORT is set, and summarized by the CLI.
+
+Usage:
+    METRICS_PORT=9464 adk web                                 # serve /metrics and /metrics.json
+    python -m teacher_assistant_agent.metrics --url http://localhost:9464
+"""
+import argparse
+import bisect
+import inspect
+import json
+import os
+import re
+import threading
+import time
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from teacher_assistant_agent import codec
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+# Recent observations kept per series for the percentiles in the summary.
+_RECENT = 1024
+
+
+def _label_key(labels):
+    return tuple(sorted((str(key), str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+def percentile(values, percent):
+    """Nearest-rank `percent` percentile of `values` (any order); None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def prometheus(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+    def snapshot(self):
+        with self._lock:
+            return [{"labels": dict(key), "value": value} for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # label key -> {"counts", "sum", "count", "recent"}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "counts": [0] * len(self.buckets), "sum": 0.0, "count": 0, "recent": deque(maxlen=_RECENT),
+                }
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+            series["recent"].append(value)
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def prometheus(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                {
+                    "labels": dict(key),
+                    "count": series["count"],
+                    "sum": series["sum"],
+                    "p50": percentile(series["recent"], 50),
+                    "p95": percentile(series["recent"], 95),
+                    "max": max(series["recent"]) if series["recent"] else None,
+                }
+                for key, series in sorted(self._series.items())
+            ]
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name, help_text=""):
+        return self._get(Counter, name, help_text)
+
+    def histogram(self, name, help_text="", buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def register_collector(self, name, collect):
+        """
+        Export the numeric values of `collect()` (a possibly nested dict, e.g. a
+        `stats()` method) as gauges named `<name>_<key>`.
+        """
+        with self._lock:
+            self._collectors[name] = collect
+
+    def _collected(self):
+        with self._lock:
+            collectors = dict(self._collectors)
+        values = {}
+        for name, collect in collectors.items():
+            try:
+                _flatten(name, collect(), values)
+            except Exception as e:
+                print(f"Error collecting {name} metrics: {e}")
+        return values
+
+    def prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.prometheus())
+        for name, value in sorted(self._collected().items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            "timestamp": time.time(),
+            "counters": {metric.name: metric.snapshot() for metric in metrics if isinstance(metric, Counter)},
+            "histograms": {metric.name: metric.snapshot() for metric in metrics if isinstance(metric, Histogram)},
+            "gauges": self._collected(),
+        }
+
+
+_GAUGE_KEY = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def _flatten(prefix, value, out):
+    if isinstance(value, bool):
+        out[prefix] = int(value)
+    elif isinstance(value, (int, float)):
+        out[prefix] = value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            # Keys may be model or collection names; keep gauge names valid for Prometheus.
+            _flatten(f"{prefix}_{_GAUGE_KEY.sub('_', str(key))}", item, out)
+
+
+registry = MetricsRegistry()
+register_collector = registry.register_collector
+
+model_latency = registry.histogram("agent_model_latency_seconds", "Time from the model request to its final response.")
+input_tokens = registry.histogram("agent_input_tokens", "Prompt tokens per model call.", TOKEN_BUCKETS)
+output_tokens = registry.histogram("agent_output_tokens", "Candidate tokens per model call.", TOKEN_BUCKETS)
+model_calls = registry.counter("agent_model_calls_total", "Model calls, by whether a callback answered locally.")
+model_errors = registry.counter("agent_model_errors_total", "Model calls that raised.")
+validation_failures = registry.counter("agent_schema_validation_failures_total", "Final responses that do not match output_schema.")
+callback_duration = registry.histogram("agent_callback_duration_seconds", "Time spent in agent and model callbacks.")
+agent_duration = registry.histogram("agent_turn_duration_seconds", "Time from an agent starting to its after_agent callbacks finishing.")
+storage_write_latency = registry.histogram("storage_write_latency_seconds", "Time to hand an artifact to the storage backend.")
+storage_commit_latency = registry.histogram("storage_commit_latency_seconds", "Firestore batch commit latency.")
+
+
+def _callbacks(value):
+    if value is None:
+        return []
+    return list(value) if isinstance(value, list) else [value]
+
+
+async def _call(callback, agent_name, hook, *args):
+    with callback_duration.time(agent=agent_name, callback=getattr(callback, "__name__", hook)):
+        result = callback(*args)
+        if inspect.isawaitable(result):
+            result = await result
+    return result
+
+
+def _validate(agent, llm_response):
+    schema = getattr(agent, "output_schema", None)
+    if schema is None or llm_response.partial or not llm_response.content or not llm_response.content.parts:
+        return
+    if any(part.function_call for part in llm_response.content.parts):
+        return
+    text = "".join(part.text or "" for part in llm_response.content.parts if not part.thought)
+    if not text.strip():
+        return
+    try:
+        codec.validate_json(schema, text)
+    except Exception:
+        validation_failures.inc(agent=agent.name)
+
+
+_instrumented = set()
+_starts = {}  # (invocation id, agent, hook) -> perf_counter
+
+
+def instrument(agent):
+    """
+    Wrap `agent`'s callbacks with timing and token accounting. Idempotent; the
+    agent's own callbacks run unchanged and in the same order.
+    """
+    if id(agent) in _instrumented or not hasattr(agent, "before_model_callback"):
+        return agent
+    _instrumented.add(id(agent))
+    name = agent.name
+    before_agent = _callbacks(agent.before_agent_callback)
+    after_agent = _callbacks(agent.after_agent_callback)
+    before_model = _callbacks(agent.before_model_callback)
+    after_model = _callbacks(agent.after_model_callback)
+    on_error = _callbacks(getattr(agent, "on_model_error_callback", None))
+
+    async def metrics_before_agent(callback_context):
+        _starts[(callback_context.invocation_id, name, "agent")] = time.perf_counter()
+        for callback in before_agent:
+            result = await _call(callback, name, "before_agent", callback_context)
+            if result is not None:
+                return result
+        return None
+
+    async def metrics_after_agent(callback_context):
+        result = None
+        for callback in after_agent:
+            result = await _call(callback, name, "after_agent", callback_context)
+            if result is not None:
+                break
+        start = _starts.pop((callback_context.invocation_id, name, "agent"), None)
+        if start is not None:
+            agent_duration.observe(time.perf_counter() - start, agent=name)
+        return result
+
+    async def metrics_before_model(callback_context, llm_request):
+        for callback in before_model:
+            result = await _call(callback, name, "before_model", callback_context, llm_request)
+            if result is not None:
+                model_calls.inc(agent=name, source="callback")
+                return result
+        model_calls.inc(agent=name, source="model")
+        _starts[(callback_context.invocation_id, name, "model")] = time.perf_counter()
+        return None
+
+    async def metrics_after_model(callback_context, llm_response):
+        if not llm_response.partial:
+            start = _starts.pop((callback_context.invocation_id, name, "model"), None)
+            if start is not None:
+                model_latency.observe(time.perf_counter() - start, agent=name)
+            usage = llm_response.usage_metadata
+            if usage is not None:
+                if usage.prompt_token_count:
+                    input_tokens.observe(usage.prompt_token_count, agent=name)
+                if usage.candidates_token_count:
+                    output_tokens.observe(usage.candidates_token_count, agent=name)
+        result = None
+        for callback in after_model:
+            result = await _call(callback, name, "after_model", callback_context, llm_response)
+            if result is not None:
+                break
+        _validate(agent, result or llm_response)
+        return result
+
+    async def metrics_on_model_error(callback_context, llm_request, error):
+        _starts.pop((callback_context.invocation_id, name, "model"), None)
+        model_errors.inc(agent=name, error=type(error).__name__)
+        for callback in on_error:
+            result = await _call(callback, name, "on_model_error", callback_context, llm_request, error)
+            if result is not None:
+                return result
+        return None
+
+    agent.before_agent_callback = metrics_before_agent
+    agent.after_agent_callback = metrics_after_agent
+    agent.before_model_callback = metrics_before_model
+    agent.after_model_callback = metrics_after_model
+    if hasattr(agent, "on_model_error_callback"):
+        agent.on_model_error_callback = metrics_on_model_error
+    return agent
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = json.dumps(registry.snapshot()), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = registry.prometheus(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+_server = None
+
+
+def serve(port, host="127.0.0.1"):
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread."""
+    global _server
+    if _server is None:
+        _server = ThreadingHTTPServer((host, port), _Handler)
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        print(f"Serving metrics on http://{host}:{port}/metrics")
+    return _server
+
+
+def serve_from_env():
+    port = os.environ.get("METRICS_PORT")
+    if port:
+        try:
+            serve(int(port), os.environ.get("METRICS_HOST", "127.0.0.1"))
+        except OSError as e:
+            print(f"Could not start metrics server on port {port}: {e}")
+
+
+def summary(snapshot=None) -> str:
+    """Human-readable table of the histogram and counter series."""
+    snapshot = snapshot or registry.snapshot()
+    lines = []
+    for name, series in snapshot["histograms"].items():
+        for item in series:
+            if not item["count"]:
+                continue
+            labels = ",".join(f"{key}={value}" for key, value in item["labels"].items())
+            mean = item["sum"] / item["count"]
+            lines.append(
+                f"{name:<34} {labels:<55} n={item['count']:<6} mean={mean:<10.4g} "
+                f"p50={item['p50']:<10.4g} p95={item['p95']:<10.4g} max={item['max']:.4g}"
+            )
+    for name, series in snapshot["counters"].items():
+        for item in series:
+            labels = ",".join(f"{key}={value}" for key, value in item["labels"].items())
+            lines.append(f"{name:<34} {labels:<55} {item['value']}")
+    for name, value in sorted(snapshot.get("gauges", {}).items()):
+        lines.append(f"{name:<90} {value}")
+    return "\n".join(lines) if lines else "No metrics recorded yet."
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize the metrics of a running agent process.")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{os.environ.get('METRICS_PORT', 9464)}",
+                        help="Base URL of the metrics endpoint.")
+    parser.add_argument("--file", help="Read a /metrics.json snapshot from a file instead.")
+    args = parser.parse_args()
+    if args.file:
+        with open(args.file) as f:
+            data = json.load(f)
+    else:
+        with urllib.request.urlopen(f"{args.url.rstrip('/')}/metrics.json", timeout=5) as response:
+            data = json.load(response)
+    print(summary(data))
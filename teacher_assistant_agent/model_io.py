@@ -0,0 +1,79 @@
+from typing import Callable, Optional
+
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from teacher_assistant_agent import codec
+
+
+def teacher_text(content: types.Content) -> Optional[str]:
+    """Text of a teacher message, or None for model turns, tool results and replayed context."""
+    if content.role != "user" or not content.parts:
+        return None
+    if any(part.function_response for part in content.parts):
+        return None
+    text = "".join(part.text or "" for part in content.parts)
+    # Other agents' turns are replayed to sub-agents as "For context: ..." user
+    # messages; they are not teacher input.
+    if not text or text.startswith("For context:"):
+        return None
+    return text
+
+
+def latest_user_text(llm_request: LlmRequest) -> tuple[Optional[int], Optional[str]]:
+    """Return `(index, text)` of the most recent teacher message in the request."""
+    for index in range(len(llm_request.contents) - 1, -1, -1):
+        text = teacher_text(llm_request.contents[index])
+        if text is not None:
+            return index, text
+    return None, None
+
+
+def parse_json_object(text: str) -> Optional[dict]:
+    """Parse the JSON object embedded in `text` (teachers often wrap it in prose or ``` fences)."""
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end <= start:
+        return None
+    try:
+        payload = codec.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+def text_outside_json(text: str) -> str:
+    """`text` without the JSON object `parse_json_object` would read from it (the teacher's own words)."""
+    start, end = text.find("{"), text.rfind("}")
+    if parse_json_object(text) is None:
+        return text
+    return (text[:start] + " " + text[end + 1:]).strip()
+
+
+def latest_json_payload(
+    llm_request: LlmRequest, predicate: Callable[[dict], bool]
+) -> tuple[Optional[int], Optional[dict]]:
+    """Return `(index, payload)` of the most recent teacher message whose JSON matches `predicate`."""
+    for index in range(len(llm_request.contents) - 1, -1, -1):
+        text = teacher_text(llm_request.contents[index])
+        if text is None:
+            continue
+        payload = parse_json_object(text)
+        if payload is not None and predicate(payload):
+            return index, payload
+    return None, None
+
+
+def replace_user_text(llm_request: LlmRequest, index: int, text: str):
+    """
+    Swap the text of one request message.
+
+    The Content is replaced rather than edited because request contents share
+    nested objects with the session's stored events.
+    """
+    llm_request.contents[index] = types.Content(role="user", parts=[types.Part(text=text)])
+
+
+def text_response(text: str) -> LlmResponse:
+    """A model response with `text`; returning it from before_model_callback skips the model call."""
+    return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]))
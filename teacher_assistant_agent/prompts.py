@@ -0,0 +1,180 @@
+"""
+Instruction building for the agents.
+
+The output-format section of each instruction is derived from the agent's
+Pydantic `output_schema` in a compact, JSON-like notation instead of a
+hand-written example payload, and every instruction is measured against a token
+budget when it is built.
+
+Usage:
+    python -m teacher_assistant_agent.prompts    # token count and budget per agent
+"""
+import argparse
+import json
+import math
+import os
+import re
+import textwrap
+import types
+import typing
+from typing import Literal, Optional, Union
+
+from pydantic import BaseModel
+
+# Instruction budgets in estimated tokens. Override one with
+# PROMPT_TOKEN_BUDGET_<AGENT_NAME>, e.g. PROMPT_TOKEN_BUDGET_LESSON_PLANNER_AGENT=600.
+DEFAULT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", 900))
+TOKEN_BUDGETS = {
+    "teacher_assistant_agent": 1200,
+}
+
+# Measured size of every instruction built so far: {agent name: tokens}.
+prompt_tokens = {}
+
+_TOKEN_PIECE = re.compile(r"\w+|[^\w\s]")
+
+
+class PromptBudgetError(ValueError):
+    """An instruction is larger than its token budget."""
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate the token count of `text` without calling the model's tokenizer.
+
+    Words cost one token per four characters (rounded up) and every punctuation
+    mark one token, which tracks Gemini's counts closely for English prompts
+    and JSON.
+    """
+    return sum(
+        math.ceil(len(piece) / 4) if piece[0].isalnum() or piece[0] == "_" else 1
+        for piece in _TOKEN_PIECE.findall(text)
+    )
+
+
+def token_budget(agent_name: str) -> int:
+    override = os.environ.get(f"PROMPT_TOKEN_BUDGET_{agent_name.upper()}")
+    if override:
+        return int(override)
+    return TOKEN_BUDGETS.get(agent_name, DEFAULT_TOKEN_BUDGET)
+
+
+def _type_name(annotation, nested: list) -> str:
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if annotation is type(None):
+        return "null"
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        if annotation not in nested:
+            nested.append(annotation)
+        return annotation.__name__
+    if origin is Literal:
+        return "|".join(json.dumps(arg) for arg in args)
+    if origin in (Union, types.UnionType):
+        return "|".join(_type_name(arg, nested) for arg in args)
+    if origin in (list, tuple, set):
+        return f"[{_type_name(args[0], nested) if args else 'any'}]"
+    if origin is dict:
+        return "object"
+    return {str: "string", int: "int", float: "number", bool: "bool"}.get(annotation, "any")
+
+
+def _describe(model: type[BaseModel], nested: list, descriptions: bool) -> str:
+    fields = []
+    for name, field in model.model_fields.items():
+        entry = f'"{name}": {_type_name(field.annotation, nested)}'
+        if descriptions and field.description:
+            entry += f" ({field.description})"
+        fields.append(entry)
+    return "{" + ", ".join(fields) + "}"
+
+
+def output_format(schema: type[BaseModel], descriptions: bool = False) -> str:
+    """
+    Compact description of the JSON `schema` produces, e.g.
+
+        LessonPlan = {"teacher": string, ..., "daily_plan": [DailyPlan]}
+        DailyPlan = {"day": int, "title": string, "topics": [Topic], ...}
+
+    Keys are quoted, which also keeps ADK from reading `{...}` as state placeholders.
+
+    Args:
+        descriptions (bool): Append each field's `description` in parentheses.
+    """
+    nested = [schema]
+    lines = []
+    index = 0
+    while index < len(nested):
+        model = nested[index]
+        lines.append(f"{model.__name__} = {_describe(model, nested, descriptions)}")
+        index += 1
+    return "\n".join(lines)
+
+
+def build_instruction(
+    agent_name: str,
+    *sections: str,
+    output_schema: Optional[type[BaseModel]] = None,
+    descriptions: bool = False,
+    budget: Optional[int] = None,
+) -> str:
+    """
+    Assemble an agent instruction and check it against the agent's token budget.
+
+    Args:
+        agent_name (str): Used for the budget lookup and `prompt_tokens`.
+        *sections (str): Instruction text; each section is dedented and stripped.
+        output_schema: When given, a "Return only JSON" section derived from it is appended.
+        descriptions (bool): Include field descriptions in the derived format.
+        budget (int): Overrides the configured budget.
+
+    Returns:
+        str: The instruction.
+
+    Raises:
+        PromptBudgetError: If the instruction exceeds its budget.
+    """
+    parts = [textwrap.dedent(section).strip() for section in sections if section and section.strip()]
+    if output_schema is not None:
+        parts.append(
+            f"**OUTPUT:** Return only a JSON object of type {output_schema.__name__}:\n"
+            f"{output_format(output_schema, descriptions)}"
+        )
+    instruction = "\n\n".join(parts)
+
+    tokens = estimate_tokens(instruction)
+    prompt_tokens[agent_name] = tokens
+    limit = budget if budget is not None else token_budget(agent_name)
+    if tokens > limit:
+        raise PromptBudgetError(
+            f"Instruction for {agent_name} is ~{tokens} tokens, over its budget of {limit}. "
+            f"Shorten it or raise PROMPT_TOKEN_BUDGET_{agent_name.upper()}."
+        )
+    return instruction
+
+
+def prompt_report() -> list[dict]:
+    """Token count and budget of every agent instruction, loading all sub-agents."""
+    from teacher_assistant_agent.agent import root_agent
+    from teacher_assistant_agent.registry import SUB_AGENTS, load_sub_agent
+
+    agents = [root_agent] + [load_sub_agent(spec.name) for spec in SUB_AGENTS]
+    report = []
+    for agent in agents:
+        instruction = agent.instruction if isinstance(agent.instruction, str) else ""
+        tokens = prompt_tokens.get(agent.name, estimate_tokens(instruction))
+        report.append({"agent": agent.name, "tokens": tokens, "budget": token_budget(agent.name)})
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the estimated instruction size of every agent.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args()
+    rows = prompt_report()
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        for row in rows:
+            print(f"{row['agent']:<35} {row['tokens']:>6} / {row['budget']:<6} tokens")
+        print(f"{'total':<35} {sum(row['tokens'] for row in rows):>6}")
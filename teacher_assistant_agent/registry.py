@@ -0,0 +1,158 @@
+import importlib
+import threading
+from dataclasses import dataclass
+from typing import AsyncGenerator, Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+
+from teacher_assistant_agent.metrics import instrument
+from teacher_assistant_agent.resilience import resilient
+
+
+@dataclass(frozen=True)
+class SubAgentSpec:
+    """Describes a sub-agent without importing it."""
+    name: str
+    description: str
+    module: str
+    attribute: str
+
+
+SUB_AGENTS = [
+    SubAgentSpec(
+        name="screener_questions_agent",
+        description="An AI agent that generates psychological screening questions for students based on class and age.",
+        module="teacher_assistant_agent.sub_agents.screener_questions_agent.agent",
+        attribute="screener_questions_agent",
+    ),
+    SubAgentSpec(
+        name="screener_evaluation_agent",
+        description="Evaluates student responses to psychological screenings and generates a psych profile.",
+        module="teacher_assistant_agent.sub_agents.screener_evaluation_agent.agent",
+        attribute="screener_evaluation_agent",
+    ),
+    SubAgentSpec(
+        name="lesson_planner_agent",
+        description="Generates a structured daily lesson plan based on chapter, subject, and total time per day.",
+        module="teacher_assistant_agent.sub_agents.lesson_planner_agent.agent",
+        attribute="lesson_planner_agent",
+    ),
+    SubAgentSpec(
+        name="differentiated_worksheet_agent",
+        description="Generates a personalized worksheet based on student screening results and academic context.",
+        module="teacher_assistant_agent.sub_agents.differentiated_worksheet_agent.agent",
+        attribute="differentiated_worksheet_agent",
+    ),
+    SubAgentSpec(
+        name="worksheet_evaluator_agent",
+        description="Evalates student answers to a worksheet and provides analysis on understanding and concept mastery.",
+        module="teacher_assistant_agent.sub_agents.worksheet_evaluator_agent.agent",
+        attribute="worksheet_evaluator_agent",
+    ),
+    SubAgentSpec(
+        name="reinforcement_agent",
+        description="Generates personalized and interactive re-learning sessions for students who need conceptual reinforcement based on their worksheet evaluations. It explains weak concepts using simple language and real-life analogies, then asks a follow-up question to check understanding. Helps identify and bridge learning gaps through engaging, tailored micro-lessons.",
+        module="teacher_assistant_agent.sub_agents.reinforcement_agent.agent",
+        attribute="reinforcement_agent",
+    ),
+    SubAgentSpec(
+        name="progress_tracker_agent",
+        description="Generates detailed progress reports based on student evaluations and reinforcement activities.",
+        module="teacher_assistant_agent.sub_agents.progress_tracker_agent.agent",
+        attribute="progress_tracker_agent",
+    ),
+    SubAgentSpec(
+        name="medical_flag_agent",
+        description="Analyzes student progress reports for indicators of potential learning or developmental conditions (e.g., ADHD, Autism).",
+        module="teacher_assistant_agent.sub_agents.medical_flag_agent.agent",
+        attribute="medical_flag_agent",
+    ),
+]
+
+_SPECS = {spec.name: spec for spec in SUB_AGENTS}
+_loaded: dict[str, BaseAgent] = {}
+_load_lock = threading.Lock()
+
+
+def get_spec(name: str) -> SubAgentSpec:
+    try:
+        return _SPECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown sub-agent: {name!r}") from None
+
+
+def load_sub_agent(name: str) -> BaseAgent:
+    """Import the sub-agent module (building its Agent) and return the agent."""
+    spec = get_spec(name)
+    with _load_lock:
+        if name not in _loaded:
+            module = importlib.import_module(spec.module)
+            _loaded[name] = instrument(resilient(getattr(module, spec.attribute)))
+    return _loaded[name]
+
+
+def loaded_sub_agents() -> list[str]:
+    """Names of the sub-agents that have been built so far."""
+    return [spec.name for spec in SUB_AGENTS if spec.name in _loaded]
+
+
+class LazySubAgent(BaseAgent):
+    """
+    Stand-in for a sub-agent in the root agent's `sub_agents`.
+
+    The root LLM only needs each sub-agent's name and description to route, so
+    the real agent module is imported and built the first time this agent runs.
+    After that, `find_agent` returns the real agent so follow-up turns go to it
+    directly, exactly as with an eagerly built tree.
+    """
+
+    module: str
+    attribute: str
+
+    @classmethod
+    def from_spec(cls, spec: SubAgentSpec) -> "LazySubAgent":
+        return cls(
+            name=spec.name,
+            description=spec.description,
+            module=spec.module,
+            attribute=spec.attribute,
+        )
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.name in _loaded
+
+    def load(self) -> BaseAgent:
+        agent = load_sub_agent(self.name)
+        if agent.parent_agent is None:
+            # The real agent was built without a parent; attach it to the root
+            # so it can transfer back exactly like an eagerly registered sub-agent.
+            agent.parent_agent = self.parent_agent
+        return agent
+
+    def find_agent(self, name: str) -> Optional[BaseAgent]:
+        agent = _loaded.get(self.name)
+        if self.name == name:
+            return agent or self
+        if agent is not None:
+            return agent.find_sub_agent(name)
+        return None
+
+    async def _run_async_impl(
+        self, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        async for event in self.load().run_async(ctx):
+            yield event
+
+    async def _run_live_impl(
+        self, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        async for event in self.load().run_live(ctx):
+            yield event
+
+
+def lazy_sub_agents() -> list[LazySubAgent]:
+    """One `LazySubAgent` per registered sub-agent, in registration order."""
+    return [LazySubAgent.from_spec(spec) for spec in SUB_AGENTS]
@@ -0,0 +1,255 @@
+"""
+Local repair of structured model output.
+
+`repair_text(schema, text)` fixes the usual ways a response misses its output
+schema, without another model call:
+
+- truncated: the JSON was cut off (e.g. at the token limit) right after a
+  complete value, so only closing brackets are missing; they are added. A
+  response cut inside a string, number or key, or while a list was still open
+  (answer feedback, questions, days, ...), may have lost content and is not
+  repaired, and neither is one whose missing fields would have to be defaulted.
+- literal: a `Literal` field such as `overall_understanding`,
+  `chapter_coverage` or `confidence_level` has the wrong case or a synonym
+  ("fair" -> "Average", "partially" -> "Partially covered", "medium" -> "Medium").
+- type: numbers and booleans written as strings ("40 minutes", "yes"), or a
+  number where a string is expected.
+- default: a missing `Optional` field is set to null.
+- minutes: a day's topic minutes do not add up to `time_allocated_minutes`;
+  they are scaled to match, keeping their proportions.
+
+Code fences and text around the JSON object are dropped as well. Responses that
+are still invalid are left for `resilience.ResilientLlm` to re-prompt.
+"""
+import re
+import typing
+from types import UnionType
+from typing import Literal, Optional, Union
+
+from pydantic import BaseModel
+
+from teacher_assistant_agent import codec
+from teacher_assistant_agent.metrics import registry
+
+repairs_total = registry.counter("agent_output_repairs_total", "Model responses fixed locally, by fix.")
+
+_CLOSERS = {"{": "}", "[": "]"}
+_COMPLETE_ENDINGS = ('"', "}", "]", "true", "false", "null")
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+_TRUE = {"true", "yes", "y", "correct", "1"}
+_FALSE = {"false", "no", "n", "incorrect", "wrong", "0"}
+
+# Normalized model wording -> allowed values it may stand for, in order of preference.
+SYNONYMS = {
+    "excellent": ["Excellent", "Good", "High"],
+    "very good": ["Good", "Excellent", "High"],
+    "strong": ["Good", "High"],
+    "satisfactory": ["Average", "Moderate", "Good"],
+    "fair": ["Average", "Moderate", "Medium"],
+    "ok": ["Average", "Moderate", "Medium"],
+    "okay": ["Average", "Moderate", "Medium"],
+    "average": ["Average", "Moderate", "Medium"],
+    "moderate": ["Moderate", "Average", "Medium"],
+    "medium": ["Medium", "Average", "Moderate"],
+    "mid": ["Medium", "Average", "Moderate"],
+    "partial": ["Partially covered", "Average", "Moderate"],
+    "partially": ["Partially covered"],
+    "partly covered": ["Partially covered"],
+    "mostly covered": ["Partially covered"],
+    "partially complete": ["Partially covered"],
+    "full": ["Fully covered"],
+    "fully": ["Fully covered"],
+    "complete": ["Fully covered"],
+    "completely covered": ["Fully covered"],
+    "covered": ["Fully covered"],
+    "not covered": ["Poor"],
+    "poor": ["Poor", "Needs Improvement", "Low"],
+    "weak": ["Needs Improvement", "Poor", "Low"],
+    "low": ["Low", "Needs Improvement", "Poor"],
+    "needs work": ["Needs Improvement", "Needs Attention"],
+    "needs improvement": ["Needs Improvement", "Needs Attention"],
+    "improvement needed": ["Needs Improvement", "Needs Attention"],
+    "needs attention": ["Needs Attention", "Needs Improvement"],
+    "high": ["High"],
+    "improved": ["Improved"],
+    "improving": ["Improved"],
+    "better": ["Improved"],
+    "same": ["Same"],
+    "unchanged": ["Same"],
+    "no change": ["Same"],
+    "stable": ["Same"],
+    "worse": ["Needs Attention", "Needs Improvement"],
+    "declined": ["Needs Attention", "Needs Improvement"],
+    "multiple choice": ["MCQ"],
+    "mcq": ["MCQ"],
+    "short answer": ["QA"],
+    "open ended": ["QA"],
+    "question answer": ["QA"],
+    "fill in the blank": ["FILL_BLANK"],
+    "fill in the blanks": ["FILL_BLANK"],
+    "fill blanks": ["FILL_BLANK"],
+}
+
+
+def _words(value) -> str:
+    return " ".join(re.sub(r"[_\-/]+", " ", str(value)).lower().split())
+
+
+def close_truncated(text: str):
+    """
+    The document in JSON that was cut off after a complete value, with its open
+    objects closed; None if anything may be missing (see the module docstring).
+    """
+    stack = []
+    in_string = escape = False
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(char)
+        elif char in "}]":
+            if not stack:
+                return None
+            stack.pop()
+    prefix = text.rstrip().rstrip(",").rstrip()
+    if in_string or "[" in stack or not prefix.endswith(_COMPLETE_ENDINGS):
+        return None
+    try:
+        return codec.loads(prefix + "".join(_CLOSERS[bracket] for bracket in reversed(stack)))
+    except ValueError:
+        return None
+
+
+def _literal(value, allowed, fixes):
+    if not isinstance(value, str) or value in allowed:
+        return value
+    words = _words(value)
+    for option in allowed:
+        if isinstance(option, str) and _words(option) == words:
+            fixes.add("literal")
+            return option
+    for option in SYNONYMS.get(words, []):
+        if option in allowed:
+            fixes.add("literal")
+            return option
+    return value
+
+
+def _coerce(annotation, value, fixes):
+    """`value` adjusted towards `annotation`; unknown shapes are returned unchanged."""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if value is None:
+        return value
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _coerce_model(annotation, value, fixes) if isinstance(value, dict) else value
+    if origin is Literal:
+        return _literal(value, args, fixes)
+    if origin in (Union, UnionType):
+        options = [arg for arg in args if arg is not type(None)]
+        return _coerce(options[0], value, fixes) if len(options) == 1 else value
+    if origin in (list, tuple, set):
+        if isinstance(value, list) and args:
+            return [_coerce(args[0], item, fixes) for item in value]
+        return value
+    if annotation is int and not isinstance(value, bool):
+        if isinstance(value, float):
+            fixes.add("type")
+            return int(round(value))
+        if isinstance(value, str) and _NUMBER.search(value):
+            fixes.add("type")
+            return int(round(float(_NUMBER.search(value).group(0))))
+    if annotation is float and isinstance(value, str) and _NUMBER.search(value):
+        fixes.add("type")
+        return float(_NUMBER.search(value).group(0))
+    if annotation is bool and isinstance(value, str) and _words(value) in _TRUE | _FALSE:
+        fixes.add("type")
+        return _words(value) in _TRUE
+    if annotation is str and isinstance(value, (int, float)) and not isinstance(value, bool):
+        fixes.add("type")
+        return str(value)
+    return value
+
+
+def _coerce_model(schema: type[BaseModel], data: dict, fixes) -> dict:
+    data = dict(data)
+    for name, field in schema.model_fields.items():
+        if name not in data:
+            if field.is_required() and type(None) in typing.get_args(field.annotation):
+                data[name] = None
+                fixes.add("default")
+            continue
+        data[name] = _coerce(field.annotation, data[name], fixes)
+    if "topics" in schema.model_fields and "time_allocated_minutes" in schema.model_fields:
+        _rebalance_minutes(data, fixes)
+    return data
+
+
+def _rebalance_minutes(day: dict, fixes):
+    topics = day.get("topics")
+    allocated = day.get("time_allocated_minutes")
+    if not isinstance(topics, list) or not topics or not isinstance(allocated, int) or allocated <= 0:
+        return
+    minutes = [topic.get("time_minutes") if isinstance(topic, dict) else None for topic in topics]
+    if not all(isinstance(value, int) and value >= 0 for value in minutes) or sum(minutes) == allocated:
+        return
+    total = sum(minutes)
+    weights = minutes if total else [1] * len(minutes)
+    total = total or len(minutes)
+    # Largest remainder, so the scaled minutes are whole and add up exactly.
+    shares = [weight * allocated / total for weight in weights]
+    scaled = [int(share) for share in shares]
+    for index in sorted(range(len(shares)), key=lambda i: shares[i] - scaled[i], reverse=True)[:allocated - sum(scaled)]:
+        scaled[index] += 1
+    day["topics"] = [dict(topic, time_minutes=value) for topic, value in zip(topics, scaled)]
+    fixes.add("minutes")
+
+
+def repair_text(schema: type[BaseModel], text: str) -> tuple[Optional[str], list[str]]:
+    """
+    Repair a response for `schema`.
+
+    Returns:
+        tuple: The repaired JSON text (None when the response is already valid
+        and consistent, or could not be repaired) and the fixes applied.
+    """
+    text = text.strip()
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0:
+        return None, []
+    if end > start:
+        try:
+            data = codec.loads(text[start:end + 1])
+        except ValueError:
+            pass
+        else:
+            return _repaired(schema, data, {"extract"} if start > 0 or end < len(text) - 1 else set())
+    data = close_truncated(text[start:])
+    return _repaired(schema, data, {"truncated"}) if data is not None else (None, [])
+
+
+def _repaired(schema, data, fixes):
+    if not isinstance(data, dict):
+        return None, []
+    data = _coerce_model(schema, data, fixes)
+    if "truncated" in fixes and "default" in fixes:
+        return None, []  # the defaulted fields were most likely cut off, not left out
+    if not fixes:
+        return None, []
+    try:
+        model = codec.validate(schema, data)
+    except ValueError:
+        return None, []
+    return model.model_dump_json(), sorted(fixes)
+
+
+def record(agent_name: str, fixes: list[str]):
+    for fix in fixes:
+        repairs_total.inc(agent=agent_name, fix=fix)
@@ -0,0 +1,458 @@
+"""
+Resilient model calls.
+
+`resilient(agent)` replaces an agent's model name with a `ResilientLlm` that
+calls the same model through the `LLMRegistry` and adds:
+
+- a timeout per attempt (MODEL_TIMEOUT_SECONDS); streamed responses time out
+  when no chunk arrives within it.
+- MODEL_RETRIES extra attempts on timeouts, connection errors, 429 and 5xx, with
+  jittered exponential backoff. Streams are only retried before their first chunk.
+- optional hedging: with MODEL_HEDGE_PERCENTILE=95, a non-streaming call that
+  has not answered after the agent's recent p95 latency gets one duplicate
+  request, and the first answer wins. Hedging starts once
+  MODEL_HEDGE_MIN_SAMPLES latencies have been seen.
+- a circuit breaker per model: after MODEL_BREAKER_FAILURES consecutive failed
+  attempts the model is skipped for MODEL_BREAKER_RESET_SECONDS, then a single
+  trial call decides whether it is closed again. While it is open, calls go to
+  MODEL_FALLBACK (e.g. `gemini-1.5-flash-8b`) or fail immediately.
+- local repair (see `repair`) of final responses that miss the output schema.
+  Responses still invalid after it escalate to the next tier or, on the last
+  one, are asked again up to MODEL_REPROMPTS times (default 1) with the
+  validation error.
+- model tiers: with MODEL_TIERS set, the cheapest model meeting the agent's
+  latency and schema-validity targets is called, escalating to stronger tiers
+  on invalid output. See `tiering`.
+
+MODEL_TIMEOUT_SECONDS, MODEL_RETRIES, MODEL_HEDGE_PERCENTILE, MODEL_REPROMPTS and MODEL_FALLBACK
+can be set per agent with a `_<AGENT_NAME>` suffix, e.g.
+MODEL_TIMEOUT_SECONDS_LESSON_PLANNER_AGENT=120. Invalid requests (other 4xx
+errors) are raised at once and do not count against the breaker.
+MODEL_RESILIENCE=off leaves agents unchanged.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import AsyncGenerator, Optional
+
+import httpx
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.models.registry import LLMRegistry
+from google.genai import types
+from pydantic import BaseModel, Field
+
+from teacher_assistant_agent import codec, repair, tiering
+from teacher_assistant_agent.metrics import percentile, register_collector, registry
+from teacher_assistant_agent.tiering import tier_selector
+
+MODEL_RESILIENCE = os.environ.get("MODEL_RESILIENCE", "on").lower() != "off"
+MODEL_TIMEOUT_SECONDS = float(os.environ.get("MODEL_TIMEOUT_SECONDS", 60))
+MODEL_RETRIES = int(os.environ.get("MODEL_RETRIES", 2))
+MODEL_HEDGE_PERCENTILE = float(os.environ.get("MODEL_HEDGE_PERCENTILE", 0))
+MODEL_FALLBACK = os.environ.get("MODEL_FALLBACK", "")
+MODEL_REPROMPTS = int(os.environ.get("MODEL_REPROMPTS", 1))
+MODEL_BACKOFF_BASE_SECONDS = float(os.environ.get("MODEL_BACKOFF_BASE_SECONDS", 0.5))
+MODEL_BACKOFF_MAX_SECONDS = float(os.environ.get("MODEL_BACKOFF_MAX_SECONDS", 8))
+MODEL_HEDGE_MIN_SAMPLES = int(os.environ.get("MODEL_HEDGE_MIN_SAMPLES", 20))
+MODEL_BREAKER_FAILURES = int(os.environ.get("MODEL_BREAKER_FAILURES", 5))
+MODEL_BREAKER_RESET_SECONDS = float(os.environ.get("MODEL_BREAKER_RESET_SECONDS", 30))
+
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+# Successful latencies kept per agent and model for the hedge delay.
+_LATENCY_WINDOW = 200
+
+retries_total = registry.counter("agent_model_retries_total", "Model attempts retried after a timeout or transient error.")
+timeouts_total = registry.counter("agent_model_timeouts_total", "Model attempts that hit the agent's timeout.")
+hedges_total = registry.counter("agent_model_hedges_total", "Duplicate requests sent after the hedge delay, by which request answered first.")
+fallbacks_total = registry.counter("agent_model_fallbacks_total", "Calls served by the fallback model.")
+reprompts_total = registry.counter(
+    "agent_output_reprompts_total",
+    "Model calls made again because a response still failed validation after local repair, by escalation or retry.",
+)
+
+
+def agent_setting(name: str, agent_name: str, default, cast=float):
+    """`<name>_<AGENT_NAME>` if set, else `default`."""
+    value = os.environ.get(f"{name}_{agent_name.upper()}")
+    return cast(value) if value else default
+
+
+class ModelUnavailableError(RuntimeError):
+    """Every model for a call has an open circuit breaker."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open trial call."""
+
+    def __init__(self, failures=MODEL_BREAKER_FAILURES, reset_seconds=MODEL_BREAKER_RESET_SECONDS):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+        self._counters = {"opened": 0, "rejected": 0}
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed" or self.failures <= 0:
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._trial = False
+            if self.state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            self._counters["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._consecutive = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self.failures > 0 and (self.state == "half_open" or self._consecutive >= self.failures):
+                if self.state != "open":
+                    self._counters["opened"] += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """End a half-open trial that recorded no outcome (cancelled, or a non-retryable error)."""
+        with self._lock:
+            if self.state == "half_open":
+                self._trial = False
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self._consecutive, **self._counters}
+
+
+_models: dict[str, BaseLlm] = {}
+_breakers: dict[str, CircuitBreaker] = {}
+_latencies: dict[tuple, deque] = {}
+_state_lock = threading.Lock()
+
+
+def _model(name) -> BaseLlm:
+    with _state_lock:
+        if name not in _models:
+            _models[name] = LLMRegistry.new_llm(name)
+        return _models[name]
+
+
+def breaker(name) -> CircuitBreaker:
+    with _state_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker()
+        return _breakers[name]
+
+
+def _observe(agent_name, model, seconds):
+    with _state_lock:
+        _latencies.setdefault((agent_name, model), deque(maxlen=_LATENCY_WINDOW)).append(seconds)
+
+
+def hedge_delay(agent_name, model, percent) -> Optional[float]:
+    """The `percent` percentile latency of recent successful calls, or None until there are enough."""
+    with _state_lock:
+        recent = list(_latencies.get((agent_name, model), ()))
+    if percent <= 0 or len(recent) < max(1, MODEL_HEDGE_MIN_SAMPLES):
+        return None
+    return percentile(recent, percent)
+
+
+def reset():
+    """Forget resolved models, breaker states, latencies and tier outcomes (e.g. after `stub_model.install()`)."""
+    with _state_lock:
+        _models.clear()
+        _breakers.clear()
+        _latencies.clear()
+    tier_selector.reset()
+
+
+def stats():
+    with _state_lock:
+        breakers = dict(_breakers)
+    return {name: item.stats() for name, item in breakers.items()}
+
+
+register_collector("model_breakers", stats)
+
+
+def retryable(error: BaseException) -> bool:
+    if isinstance(error, (TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    return getattr(error, "code", None) in RETRYABLE_CODES
+
+
+def _copy_request(llm_request: LlmRequest, model: str) -> LlmRequest:
+    """A copy safe to send concurrently; models may modify a request's config and contents."""
+    return llm_request.model_copy(update={
+        "model": model,
+        "config": llm_request.config.model_copy(deep=True) if llm_request.config else None,
+        "contents": [content.model_copy(deep=True) for content in llm_request.contents],
+    })
+
+
+def _response_schema(llm_request: LlmRequest):
+    schema = llm_request.config.response_schema if llm_request.config else None
+    return schema if isinstance(schema, type) and issubclass(schema, BaseModel) else None
+
+
+def _text(response: LlmResponse) -> Optional[str]:
+    """The response's text, or None for empty responses and function calls."""
+    if not response.content or not response.content.parts:
+        return None
+    if any(part.function_call for part in response.content.parts):
+        return None
+    return "".join(part.text or "" for part in response.content.parts if not part.thought)
+
+
+def _validation_error(schema, response: Optional[LlmResponse]) -> Optional[str]:
+    """Why `response` is not a usable final answer (valid JSON for `schema`, or a function call), or None."""
+    if response is None or not response.content or not response.content.parts:
+        return "The response was empty."
+    text = _text(response)
+    if schema is None or text is None:
+        return None
+    try:
+        codec.validate_json(schema, text)
+    except Exception as e:
+        return str(e)[:1000]
+    return None
+
+
+def _reprompt(llm_request: LlmRequest, model: str, response: LlmResponse, error: str) -> LlmRequest:
+    """`llm_request` followed by the invalid response and what was wrong with it."""
+    request = _copy_request(llm_request, model)
+    if response is not None and response.content:
+        request.contents.append(response.content.model_copy(deep=True))
+    request.contents.append(types.Content(role="user", parts=[types.Part(text=(
+        f"Your previous reply did not match the required JSON schema:\n{error}\n"
+        "Reply again with only the complete, corrected JSON object."
+    ))]))
+    return request
+
+
+class ResilientLlm(BaseLlm):
+    """
+    Calls `model`, or the selected tier and the stronger ones after it, then
+    `fallback`, through the `LLMRegistry` with timeouts, retries, hedging and
+    circuit breaking. See the module docstring and `tiering`.
+    """
+
+    agent_name: str = ""
+    fallback: Optional[str] = None
+    timeout_seconds: float = MODEL_TIMEOUT_SECONDS
+    retries: int = MODEL_RETRIES
+    hedge_percentile: float = MODEL_HEDGE_PERCENTILE
+    # Extra calls to the last model when its response is invalid even after `repair`.
+    reprompts: int = MODEL_REPROMPTS
+    # Cheapest first; empty calls `model` only. See `tiering`.
+    tiers: list[str] = Field(default_factory=list)
+    target_latency_seconds: float = tiering.MODEL_TIER_TARGET_LATENCY_SECONDS
+    target_success_rate: float = tiering.MODEL_TIER_TARGET_SUCCESS
+
+    @classmethod
+    def for_agent(cls, agent_name: str, model: str) -> "ResilientLlm":
+        """Settings from the environment, with per-agent overrides."""
+        return cls(
+            model=model,
+            agent_name=agent_name,
+            fallback=agent_setting("MODEL_FALLBACK", agent_name, MODEL_FALLBACK, str) or None,
+            timeout_seconds=agent_setting("MODEL_TIMEOUT_SECONDS", agent_name, MODEL_TIMEOUT_SECONDS),
+            retries=agent_setting("MODEL_RETRIES", agent_name, MODEL_RETRIES, int),
+            hedge_percentile=agent_setting("MODEL_HEDGE_PERCENTILE", agent_name, MODEL_HEDGE_PERCENTILE),
+            reprompts=agent_setting("MODEL_REPROMPTS", agent_name, MODEL_REPROMPTS, int),
+            tiers=tiering.parse_tiers(agent_setting("MODEL_TIERS", agent_name, tiering.MODEL_TIERS, str)),
+            target_latency_seconds=agent_setting(
+                "MODEL_TIER_TARGET_LATENCY_SECONDS", agent_name, tiering.MODEL_TIER_TARGET_LATENCY_SECONDS
+            ),
+            target_success_rate=agent_setting("MODEL_TIER_TARGET_SUCCESS", agent_name, tiering.MODEL_TIER_TARGET_SUCCESS),
+        )
+
+    @property
+    def capabilities(self):
+        return _model(self.model).capabilities
+
+    def connect(self, llm_request: LlmRequest):
+        return _model(self.model).connect(llm_request)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        tiers = self.tiers or [self.model]
+        start = 0
+        if len(tiers) > 1:
+            start = tier_selector.select(self.agent_name, tiers, self.target_latency_seconds, self.target_success_rate)
+        chain = list(dict.fromkeys(tiers[start:] + ([self.fallback] if self.fallback else [])))
+        schema = _response_schema(llm_request)
+        # (model, reprompt) pairs; a reprompt is (rejected response, validation error).
+        queue = [(model, None) for model in chain]
+        error, rejected, reprompts = None, None, 0
+        while queue:
+            model, feedback = queue.pop(0)
+            if feedback is not None:
+                request = _reprompt(llm_request, model, *feedback)
+            else:
+                request = llm_request if model == llm_request.model else _copy_request(llm_request, model)
+            started, yielded = time.perf_counter(), False
+            try:
+                if stream:
+                    responses = []
+                    async for response in self._call(model, request, stream=True):
+                        if not response.partial:
+                            responses = [response]  # yielded after repair
+                            continue
+                        yielded = True
+                        yield response
+                else:
+                    responses = [response async for response in self._call(model, request, stream=False)]
+            except Exception as e:
+                if yielded or not (retryable(e) or isinstance(e, ModelUnavailableError)):
+                    raise
+                error = e
+                continue
+            if responses:
+                responses[-1] = self._repair(schema, responses[-1])
+            final = responses[-1] if responses else None
+            problem = _validation_error(schema, final)
+            # Streamed chunks are already with the caller, so only whole responses are asked again.
+            again = problem is not None and not stream and (queue or reprompts < self.reprompts)
+            tier_selector.record(self.agent_name, model, time.perf_counter() - started, problem is None,
+                                 final.usage_metadata if final else None, again and bool(queue))
+            if model == self.fallback and model not in tiers:
+                fallbacks_total.inc(agent=self.agent_name, model=model)
+            if again:
+                if queue:
+                    print(f"{self.agent_name} response from {model} failed validation; escalating to {queue[0][0]}")
+                    reprompts_total.inc(agent=self.agent_name, model=queue[0][0], kind="escalation")
+                else:
+                    print(f"{self.agent_name} response from {model} failed validation; asking again")
+                    reprompts_total.inc(agent=self.agent_name, model=model, kind="retry")
+                    reprompts += 1
+                    queue.append((model, (final, problem)))
+                rejected = responses
+                continue
+            for response in responses:
+                yield response
+            return
+        if rejected:
+            # The calls after it failed outright; an invalid answer is still better than none.
+            for response in rejected:
+                yield response
+            return
+        raise error or ModelUnavailableError(f"Circuit open for {', '.join(chain)}")
+
+    def _repair(self, schema, response: LlmResponse) -> LlmResponse:
+        """`response` with its JSON fixed locally by `repair.repair_text`, when that changes anything."""
+        text = _text(response) if schema is not None else None
+        if not text:
+            return response
+        repaired, fixes = repair.repair_text(schema, text)
+        if repaired is None:
+            return response
+        repair.record(self.agent_name, fixes)
+        print(f"Repaired {self.agent_name} response locally ({', '.join(fixes)})")
+        return response.model_copy(update={"content": types.Content(role="model", parts=[types.Part(text=repaired)])})
+
+    async def _call(self, model, request, stream):
+        """One model with retries and its circuit breaker."""
+        model_breaker = breaker(model)
+        if not model_breaker.allow():
+            raise ModelUnavailableError(f"Circuit open for {model}")
+        try:
+            for attempt in range(self.retries + 1):
+                started = False
+                try:
+                    async for response in self._attempt(model, request, stream):
+                        started = True
+                        yield response
+                    model_breaker.record_success()
+                    return
+                except Exception as e:
+                    if started or not retryable(e):
+                        raise
+                    model_breaker.record_failure()
+                    if isinstance(e, TimeoutError):
+                        timeouts_total.inc(agent=self.agent_name, model=model)
+                    print(f"{self.agent_name} call to {model} failed (attempt {attempt + 1}): {type(e).__name__}: {e}")
+                    if attempt == self.retries or not model_breaker.allow():
+                        raise
+                retries_total.inc(agent=self.agent_name, model=model)
+                backoff = min(MODEL_BACKOFF_BASE_SECONDS * 2 ** attempt, MODEL_BACKOFF_MAX_SECONDS)
+                await asyncio.sleep(backoff * random.uniform(0.5, 1.5))
+        finally:
+            # Also runs on cancellation, so a half-open breaker never waits on a trial forever.
+            model_breaker.release()
+
+    async def _attempt(self, model, request, stream):
+        if stream:
+            responses = _model(model).generate_content_async(request, stream=True)
+            try:
+                while True:
+                    try:
+                        yield await asyncio.wait_for(anext(responses), self.timeout_seconds)
+                    except StopAsyncIteration:
+                        return
+            finally:
+                await responses.aclose()
+        else:
+            for response in await self._hedged(model, request):
+                yield response
+
+    async def _collect(self, model, request):
+        start = time.perf_counter()
+        responses = [
+            response async for response in _model(model).generate_content_async(request, stream=False)
+        ]
+        _observe(self.agent_name, model, time.perf_counter() - start)
+        return responses
+
+    async def _hedged(self, model, request):
+        first = asyncio.create_task(asyncio.wait_for(self._collect(model, request), self.timeout_seconds))
+        tasks = {first}
+        hedged = False
+        try:
+            delay = hedge_delay(self.agent_name, model, self.hedge_percentile)
+            if delay is not None and delay < self.timeout_seconds:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    hedged = True
+                    tasks.add(asyncio.create_task(asyncio.wait_for(
+                        self._collect(model, _copy_request(request, model)), self.timeout_seconds
+                    )))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if hedged:
+                            hedges_total.inc(agent=self.agent_name, model=model,
+                                             winner="primary" if task is first else "hedge")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def resilient(agent):
+    """
+    Give `agent` a `ResilientLlm` for its model. Idempotent; agents that
+    inherit their model or already use a model object are left unchanged.
+    """
+    if MODEL_RESILIENCE and isinstance(getattr(agent, "model", None), str) and agent.model:
+        agent.model = ResilientLlm.for_agent(agent.name, agent.model)
+    return agent
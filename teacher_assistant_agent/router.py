@@ -0,0 +1,298 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+from teacher_assistant_agent import codec
+from teacher_assistant_agent.registry import SUB_AGENTS
+
+# Requests classified below this confidence fall back to the root LLM.
+CONFIDENCE_THRESHOLD = float(os.environ.get("ROUTER_CONFIDENCE_THRESHOLD", 0.8))
+# Cosine similarity a TF-IDF match needs before its margin counts in full.
+MIN_SIMILARITY = 0.4
+
+# Phrases that identify a sub-agent on their own (matched case-insensitively,
+# with "." spanning newlines).
+RULES = {
+    "screener_questions_agent": [
+        r"\b(psych\w*|screening|well[- ]?being|mental health)\b.{0,40}\bquestions?\b",
+        r"\bquestions?\b.{0,40}\b(psych\w*|screening|well[- ]?being)\b",
+    ],
+    "screener_evaluation_agent": [
+        r"\b(evaluate|analy[sz]e|assess|profile)\b.{0,60}\b(screening|psych\w*)\b.{0,30}\b(responses?|answers?)\b",
+        r"\bpsych(ological)? profile\b",
+    ],
+    "lesson_planner_agent": [
+        r"\blesson[- ]?plans?\b",
+        r"\bplan\b.{0,30}\b\d+[- ]?days?\b",
+        r"\b(teaching|daily) plan\b",
+    ],
+    "differentiated_worksheet_agent": [
+        r"\b(differentiated|personali[sz]ed|tailored|custom)\b.{0,30}\b(worksheet|practice)\b",
+        r"\b(create|generate|make)\b.{0,30}\bworksheet\b.{0,40}\b(for|based on)\b.{0,30}\b(student|screening)\b",
+    ],
+    "worksheet_evaluator_agent": [
+        # Screening answers belong to screener_evaluation_agent, whatever the verb.
+        r"^(?!.*\b(screening|psych\w*)\b).*?\b(evaluate|grade|check|mark|correct|score)\b.{0,40}\b(worksheet|answers?|submissions?)\b",
+    ],
+    "reinforcement_agent": [
+        r"\breinforce(ment)?\b",
+        r"\b(re-?teach|re-?learn|remedia\w*|revision pack)\b",
+    ],
+    "progress_tracker_agent": [
+        r"\bprogress (report|tracker|tracking)\b",
+        r"\b(how|track)\b.{0,30}\bprogress(ed|ing)?\b",
+    ],
+    "medical_flag_agent": [
+        r"\b(medical|developmental) (flags?|indicators?|conditions?)\b",
+        r"\b(adhd|autism|dyslexia|dyscalculia|dysgraphia)\b",
+    ],
+}
+
+# Extra training sentences for the TF-IDF model, on top of the registry descriptions.
+EXAMPLES = {
+    "screener_questions_agent": [
+        "Generate psych questions for Grade 6",
+        "Create age appropriate screening questions for class 4 students",
+    ],
+    "screener_evaluation_agent": [
+        "Evaluate the screening responses of student S101",
+        "Analyze these psychological screening answers and build a profile",
+    ],
+    "lesson_planner_agent": [
+        "Create a lesson plan for Grade 7 science, the chapter on reproduction",
+        "Plan a 5-day history chapter for Class 9",
+    ],
+    "differentiated_worksheet_agent": [
+        "Make a worksheet for this student based on their screening results",
+        "Generate practice questions tailored to a student's confidence and anxiety",
+    ],
+    "worksheet_evaluator_agent": [
+        "Evaluate these worksheet answers",
+        "Grade the student's submitted answers against the expected answers",
+    ],
+    "reinforcement_agent": [
+        "Help this student relearn the topics they got wrong",
+        "Create reinforcement questions for the weak areas in this evaluation",
+    ],
+    "progress_tracker_agent": [
+        "Generate a progress report for the student",
+        "Compare the student's evaluation and reinforcement results",
+    ],
+    "medical_flag_agent": [
+        "Does this progress report show signs of ADHD or dyslexia",
+        "Check the report for potential developmental conditions",
+    ],
+}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "for", "of", "to", "in", "on", "is", "are", "be",
+    "this", "that", "these", "with", "based", "their", "them", "it", "as", "by", "at",
+    "me", "my", "i", "you", "your", "please", "can", "could", "would", "will", "from",
+}
+
+
+def _tokens(text):
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+@dataclass(frozen=True)
+class RouteDecision:
+    agent_name: Optional[str]
+    confidence: float
+    source: str  # "json", "rules", "tfidf" or "none"
+
+
+class IntentRouter:
+    """
+    Local classifier that picks a sub-agent for a teacher request.
+
+    Structured JSON payloads are routed by their keys unless the words around
+    them match a RULE for another sub-agent. Free text is routed by the regex
+    RULES, and anything the rules do not settle by cosine similarity against
+    TF-IDF centroids built from each sub-agent's description and EXAMPLES.
+    """
+
+    def __init__(self, documents: dict[str, list[str]], threshold: float = CONFIDENCE_THRESHOLD):
+        self.threshold = threshold
+        self._rules = {
+            name: [re.compile(pattern, re.IGNORECASE | re.DOTALL) for pattern in patterns]
+            for name, patterns in RULES.items()
+        }
+        doc_tokens = {name: Counter(_tokens(" ".join(texts))) for name, texts in documents.items()}
+        n_docs = len(doc_tokens)
+        document_frequency = Counter(token for counts in doc_tokens.values() for token in counts)
+        self._idf = {
+            token: math.log((1 + n_docs) / (1 + df)) + 1 for token, df in document_frequency.items()
+        }
+        self._centroids = {name: self._vector(counts) for name, counts in doc_tokens.items()}
+
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    @classmethod
+    def from_registry(cls, threshold: float = CONFIDENCE_THRESHOLD) -> "IntentRouter":
+        documents = {
+            spec.name: [spec.description, *EXAMPLES.get(spec.name, [])] for spec in SUB_AGENTS
+        }
+        return cls(documents, threshold)
+
+    def _vector(self, counts):
+        vector = {token: count * self._idf.get(token, 0.0) for token, count in counts.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+        return {token: value / norm for token, value in vector.items()}
+
+    def _similarities(self, text):
+        query = self._vector(Counter(_tokens(text)))
+        return {
+            name: sum(weight * centroid.get(token, 0.0) for token, weight in query.items())
+            for name, centroid in self._centroids.items()
+        }
+
+    def _rule_hits(self, text):
+        return [name for name, patterns in self._rules.items() if any(pattern.search(text) for pattern in patterns)]
+
+    def classify(self, text: str) -> RouteDecision:
+        text = (text or "").strip()
+        if not text:
+            return RouteDecision(None, 0.0, "none")
+
+        json_route, prose = _route_json(text)
+        if json_route:
+            prose_hits = self._rule_hits(prose)
+            if not prose_hits or json_route in prose_hits:
+                return RouteDecision(json_route, 1.0, "json")
+            # The request names another task than the payload suggests (e.g. a
+            # progress report from an evaluation); classify the words alone.
+            text = prose
+
+        similarities = self._similarities(text)
+        rule_hits = self._rule_hits(text)
+        if len(rule_hits) == 1:
+            name = rule_hits[0]
+            # A rule the TF-IDF model disagrees with stays below the default threshold.
+            best_similarity = max(similarities, key=similarities.get)
+            return RouteDecision(name, 0.95 if best_similarity == name else 0.75, "rules")
+
+        candidates = rule_hits or list(similarities)
+        ranked = sorted(candidates, key=lambda name: similarities[name], reverse=True)
+        best = similarities[ranked[0]]
+        second = similarities[ranked[1]] if len(ranked) > 1 else 0.0
+        if best <= 0:
+            return RouteDecision(None, 0.0, "none")
+        # Share of the similarity held by the winner against the runner-up,
+        # discounted when the request barely resembles any sub-agent.
+        margin = best / (best + second)
+        return RouteDecision(ranked[0], margin * min(1.0, best / MIN_SIMILARITY), "tfidf")
+
+    def route(self, text: str) -> Optional[RouteDecision]:
+        """Classify `text` and return the decision only if it clears the threshold."""
+        decision = self.classify(text)
+        routed = decision.agent_name is not None and decision.confidence >= self.threshold
+        with self._lock:
+            self._counters["requests"] += 1
+            if routed:
+                self._counters["fast_path"] += 1
+                self._counters[f"fast_path.{decision.agent_name}"] += 1
+            else:
+                self._counters["fallback"] += 1
+        return decision if routed else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+        requests = counters.get("requests", 0)
+        return {
+            "requests": requests,
+            "fast_path": counters.get("fast_path", 0),
+            "fallback": counters.get("fallback", 0),
+            "hit_rate": counters.get("fast_path", 0) / requests if requests else None,
+            "by_agent": {
+                key.split(".", 1)[1]: value for key, value in counters.items() if key.startswith("fast_path.")
+            },
+        }
+
+
+def _route_json(text):
+    """
+    Route the JSON payloads the sub-agent instructions document as their inputs.
+
+    Returns:
+        tuple: (agent name or None, the text around the payload).
+    """
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        return None, text
+    try:
+        payload = codec.loads(text[start:end + 1])
+    except ValueError:
+        return None, text
+    prose = (text[:start] + " " + text[end + 1:]).strip()
+    if not isinstance(payload, dict):
+        return None, prose
+    return _route_payload(payload), prose
+
+
+def _route_payload(payload):
+    keys = set(payload)
+    if "concept_progress" in keys or "overall_progress" in keys:
+        return "medical_flag_agent"
+    if "answer_feedback" in keys and "summary" in keys:
+        return "reinforcement_agent"
+    if "screening_results" in keys and "subject_name" in keys:
+        return "differentiated_worksheet_agent"
+    answers = payload.get("answers")
+    if isinstance(answers, list) and answers and isinstance(answers[0], dict):
+        if "expected_answer" in answers[0]:
+            return "worksheet_evaluator_agent"
+        return "screener_evaluation_agent"
+    return None
+
+
+_router = None
+
+
+def get_router() -> IntentRouter:
+    global _router
+    if _router is None:
+        _router = IntentRouter.from_registry()
+    return _router
+
+
+def route_before_model(callback_context, llm_request):
+    """
+    before_model_callback for the root agent.
+
+    When the latest turn is a fresh teacher message that the local router
+    recognizes confidently, answer with a `transfer_to_agent` call instead of
+    asking the model, which skips one full LLM round-trip. Anything else goes
+    to the model unchanged.
+    """
+    from google.adk.models.llm_response import LlmResponse
+    from google.genai import types
+
+    if "transfer_to_agent" not in llm_request.tools_dict or not llm_request.contents:
+        return None
+    latest = llm_request.contents[-1]
+    if latest.role != "user" or not latest.parts or any(part.function_response for part in latest.parts):
+        return None
+    text = "".join(part.text or "" for part in latest.parts)
+    if text.startswith("For context:"):
+        # Another agent's output replayed to the root, not a new teacher request.
+        return None
+
+    decision = get_router().route(text)
+    if decision is None:
+        return None
+    return LlmResponse(
+        content=types.Content(
+            role="model",
+            parts=[types.Part(function_call=types.FunctionCall(
+                name="transfer_to_agent", args={"agent_name": decision.agent_name}
+            ))],
+        )
+    )
@@ -0,0 +1,147 @@
+import os
+from datetime import datetime
+from typing import Optional
+
+from google.adk.tools.tool_context import ToolContext
+
+from teacher_assistant_agent import codec
+from teacher_assistant_agent.history import VERSIONED_COLLECTIONS, latest
+from teacher_assistant_agent.metrics import storage_write_latency
+from teacher_assistant_agent.storage import get_storage
+
+# Session state is re-serialized on every turn, so it only keeps the most recent
+# entries. Full payloads live in the storage backend and are fetched on demand.
+HISTORY_LIMIT = int(os.environ.get("STATE_HISTORY_LIMIT", 50))
+ARTIFACT_REFS_LIMIT = int(os.environ.get("STATE_ARTIFACT_REFS_LIMIT", 20))
+# Artifacts whose JSON is at least this many bytes store their nested lists in
+# the compact binary encoding (`codec.pack`). 0 stores plain documents.
+ARTIFACT_PACK_THRESHOLD = int(os.environ.get("ARTIFACT_PACK_THRESHOLD", 0))
+
+# State keys holding artifact references, and the collection each one spills to.
+ARTIFACT_KINDS = {
+    "questions_set": "questions_set",
+    "psych_profile": "screening_profile",
+    "lesson_plans": "lesson_plans",
+    "differentiated_worksheet": "differentiated_worksheets",
+    "worksheet_evaluation": "worksheet_evaluations",
+    "personalized_reinforcement": "personalized_reinforcement",
+    "student_progress_report": "student_progress_reports",
+    "medical_flag_report": "medical_flag_reports",
+}
+
+# Questions shared by every student with the same screening profile (class-wide
+# worksheets); their worksheet records point here through `question_set_id`.
+QUESTION_SETS_COLLECTION = "worksheet_question_sets"
+
+
+def _bounded(items, limit):
+    items = list(items or [])
+    return items[-limit:] if limit > 0 else items
+
+
+def append_history(state, action: str, **fields):
+    """Append an entry to `state['interaction_history']`, keeping the last HISTORY_LIMIT."""
+    history = state.get("interaction_history") or []
+    history = _bounded(history + [{
+        "action": action,
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        **fields,
+    }], HISTORY_LIMIT)
+    state["interaction_history"] = history
+    return history
+
+
+def record_artifact(state, key: str, document: str, data: dict, summary: Optional[dict] = None, schema=None):
+    """
+    Store `data` in the backend and keep only a small reference to it in state.
+
+    Args:
+        state: The session state (e.g. `callback_context.state`).
+        key (str): One of ARTIFACT_KINDS, e.g. "lesson_plans".
+        document (str): Document id in the artifact's collection.
+        data (dict): The full payload to store.
+        summary (dict): Fields worth keeping in state so the root agent can
+            refer to the artifact without loading it.
+        schema: The artifact's Pydantic model; lets large payloads be stored
+            packed (see ARTIFACT_PACK_THRESHOLD).
+
+    The stored document also gets an `updated_at` timestamp, which
+    `export.export_collections` uses for incremental exports.
+
+    Returns:
+        dict: The reference appended to `state[key]`.
+    """
+    collection = ARTIFACT_KINDS[key]
+    storage = get_storage()
+    data = dict(data, updated_at=datetime.now().isoformat(timespec="microseconds"))
+    with storage_write_latency.time(backend=storage.name, collection=collection):
+        storage.set(collection, document, codec.encode_document(schema, data, ARTIFACT_PACK_THRESHOLD))
+    return add_artifact_ref(state, key, {"id": str(document), "collection": collection, **(summary or {})})
+
+
+def add_artifact_ref(state, key: str, ref: dict) -> dict:
+    """Append a reference to an already stored artifact to `state[key]`, keeping the last ARTIFACT_REFS_LIMIT."""
+    # Older sessions stored full payloads here; only references are carried forward.
+    refs = [
+        item for item in (state.get(key) or [])
+        if isinstance(item, dict) and "collection" in item and item.get("id") != ref["id"]
+    ]
+    state[key] = _bounded(refs + [ref], ARTIFACT_REFS_LIMIT)
+    return ref
+
+
+def load_artifact(ref: dict) -> Optional[dict]:
+    """Fetch the full payload behind a reference created by `record_artifact`."""
+    artifact = codec.decode_document(get_storage().get(ref["collection"], ref["id"]))
+    if artifact and artifact.get("question_set_id") and "questions" not in artifact:
+        shared = get_storage().get(QUESTION_SETS_COLLECTION, artifact["question_set_id"]) or {}
+        artifact["questions"] = shared.get("questions", [])
+    return artifact
+
+
+def get_stored_artifact(kind: str, tool_context: ToolContext, document_id: str = "") -> dict:
+    """
+    Load the full content of an artifact created earlier in this session.
+
+    Session state only keeps short references (id plus a few summary fields) for
+    question sets, psych profiles, lesson plans, worksheets, evaluations,
+    reinforcement plans, progress reports and medical flag reports. Call this
+    when the full content of one of them is needed.
+
+    Args:
+        kind (str): The state key, one of: questions_set, psych_profile,
+            lesson_plans, differentiated_worksheet, worksheet_evaluation,
+            personalized_reinforcement, student_progress_report, medical_flag_report.
+        document_id (str): The `id` of the reference in state, or a student id
+            (chapter name for lesson plans) for its latest version. Defaults to
+            the most recent artifact of that kind.
+
+    Returns:
+        dict: {"status": "success", "artifact": {...}}, {"status": "pending", "message": ...}
+        for an artifact that is still being prepared in the background (e.g. a medical
+        flag report), or {"status": "error", "message": ...}.
+    """
+    if kind not in ARTIFACT_KINDS:
+        return {"status": "error", "message": f"Unknown artifact kind '{kind}'."}
+    refs = [item for item in (tool_context.state.get(kind) or []) if isinstance(item, dict) and "collection" in item]
+    if document_id:
+        ref = next((item for item in refs if item.get("id") == document_id), None)
+        # Artifacts from earlier sessions are not referenced in state but are still stored.
+        ref = ref or {"id": document_id, "collection": ARTIFACT_KINDS[kind]}
+    elif refs:
+        ref = refs[-1]
+    else:
+        return {"status": "error", "message": f"No {kind} stored in this session."}
+
+    artifact = load_artifact(ref)
+    if artifact is None and document_id and ref["collection"] in VERSIONED_COLLECTIONS:
+        # Versioned collections are keyed student/subject/chapter/date; treat a bare
+        # student id (or chapter name for lesson plans) as "the latest version".
+        found = latest(ref["collection"], document_id)
+        artifact = found[1] if found else None
+    queued_at = ref.get("queued_at")
+    if queued_at and str((artifact or {}).get("updated_at") or "") < queued_at:
+        return {"status": "pending", "message": f"{kind} '{ref['id']}' is still being prepared; check again shortly."}
+    if artifact is None:
+        return {"status": "error", "message": f"{kind} '{ref['id']}' was not found."}
+    return {"status": "success", "artifact": artifact}
@@ -0,0 +1,432 @@
+import atexit
+import copy
+import operator
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from teacher_assistant_agent import codec
+from teacher_assistant_agent.firestore import BatchedWriter, MAX_BATCH_SIZE
+
+QUERY_OPERATORS = {
+    "==": operator.eq,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+# Composite indexes for the history queries: (collection, equality fields..., range/order field).
+# Keep in sync with firestore.indexes.json; SQLite creates them as expression indexes.
+COMPOSITE_INDEXES = [
+    ("worksheet_evaluations", ("student_id", "record_date")),
+    ("worksheet_evaluations", ("student_id", "subject_key", "record_date")),
+    ("worksheet_evaluations", ("student_id", "subject_key", "chapter_key", "record_date")),
+    ("worksheet_evaluations", ("student_id", "chapter_key", "record_date")),
+    ("worksheet_evaluations", ("student_id", "updated_at")),
+    ("personalized_reinforcement", ("student_id", "record_date")),
+    ("personalized_reinforcement", ("student_id", "subject_key", "record_date")),
+    ("personalized_reinforcement", ("student_id", "subject_key", "chapter_key", "record_date")),
+    ("personalized_reinforcement", ("student_id", "chapter_key", "record_date")),
+    ("student_progress_reports", ("student_id", "record_date")),
+    ("student_progress_reports", ("student_id", "subject_key", "chapter_key", "record_date")),
+    ("lesson_plans", ("chapter_key", "record_date")),
+]
+
+_FIELD_PATH = re.compile(r"^[A-Za-z_]\w*(\.[A-Za-z_]\w*)*$")
+_MISSING = object()
+
+# Serializes `update` on the process-local backends.
+_update_lock = threading.Lock()
+
+
+def _field(data, path):
+    """Value at a dotted `path` in `data`, or _MISSING."""
+    for name in path.split("."):
+        if not isinstance(data, dict) or name not in data:
+            return _MISSING
+        data = data[name]
+    return data
+
+
+def project(data, fields):
+    """Copy of `data` with only the dotted field paths in `fields`."""
+    if not fields:
+        return data
+    result = {}
+    for path in fields:
+        value = _field(data, path)
+        if value is _MISSING:
+            continue
+        target = result
+        *parents, name = path.split(".")
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[name] = value
+    return result
+
+
+def _check_query(filters, order_by, fields):
+    for field, op, _ in filters:
+        if op not in QUERY_OPERATORS:
+            raise ValueError(f"Unsupported query operator: {op!r}")
+        if not _FIELD_PATH.match(field):
+            raise ValueError(f"Invalid field path: {field!r}")
+    for field in ([order_by] if order_by else []) + list(fields or []):
+        if not _FIELD_PATH.match(field):
+            raise ValueError(f"Invalid field path: {field!r}")
+
+
+class StorageBackend:
+    """
+    Interface every callback writes through.
+
+    Documents are plain JSON-compatible dicts addressed by collection and
+    document id, mirroring the Firestore layout the agents already use.
+    """
+
+    name = "base"
+
+    def set(self, collection, document, data):
+        raise NotImplementedError
+
+    def get(self, collection, document):
+        """Return the stored dict, or None if the document does not exist."""
+        raise NotImplementedError
+
+    def stream(self, collection):
+        """Yield `(document_id, data)` for every document in `collection`."""
+        raise NotImplementedError
+
+    def update(self, collection, document, apply):
+        """
+        Atomically replace a document with `apply(current)`.
+
+        Args:
+            apply: Called with the stored dict (None if missing); returns the new
+                one. It may run more than once, so it must have no other effects.
+
+        Returns:
+            dict: The stored document.
+        """
+        with _update_lock:
+            data = apply(self.get(collection, document))
+            self.set(collection, document, data)
+        return data
+
+    def query(self, collection, filters=(), order_by=None, descending=False, limit=None, fields=None):
+        """
+        Documents of `collection` matching every filter.
+
+        Args:
+            filters: `(field, op, value)` tuples; `op` is one of QUERY_OPERATORS and
+                `field` may be a dotted path. Documents without the field never match.
+            order_by (str): Field to sort on; documents without it are skipped.
+            descending (bool): Sort order for `order_by`.
+            limit (int): Maximum number of documents.
+            fields: Dotted field paths to return instead of whole documents.
+
+        Returns:
+            list: `(document_id, data)` tuples.
+        """
+        _check_query(filters, order_by, fields)
+        matches = []
+        for document, data in self.stream(collection):
+            values = [_field(data, field) for field, _, _ in filters]
+            if any(
+                value is _MISSING or not QUERY_OPERATORS[op](value, expected)
+                for value, (_, op, expected) in zip(values, filters)
+            ):
+                continue
+            if order_by and _field(data, order_by) is _MISSING:
+                continue
+            matches.append((document, data))
+        if order_by:
+            matches.sort(key=lambda match: _field(match[1], order_by), reverse=descending)
+        if limit is not None:
+            matches = matches[:limit]
+        return [(document, project(data, fields)) for document, data in matches]
+
+    def flush(self, timeout=None):
+        """Wait for pending writes. Returns False if `timeout` expired first."""
+        return True
+
+    def close(self, timeout=None):
+        return self.flush(timeout)
+
+    def stats(self):
+        return {"backend": self.name}
+
+
+class InMemoryStorage(StorageBackend):
+    """Process-local storage for local runs, load tests and benchmarks."""
+
+    name = "memory"
+
+    def __init__(self):
+        self.collections = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def set(self, collection, document, data):
+        with self._lock:
+            self.collections.setdefault(collection, {})[str(document)] = copy.deepcopy(data)
+            self._writes += 1
+
+    def get(self, collection, document):
+        with self._lock:
+            data = self.collections.get(collection, {}).get(str(document))
+        return copy.deepcopy(data)
+
+    def stream(self, collection):
+        with self._lock:
+            docs = list(self.collections.get(collection, {}).items())
+        for document, data in docs:
+            yield document, copy.deepcopy(data)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.name,
+                "writes": self._writes,
+                "documents": sum(len(docs) for docs in self.collections.values()),
+            }
+
+
+class SQLiteStorage(StorageBackend):
+    """Single-file storage backed by SQLite, one row per document."""
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS documents (
+                collection TEXT NOT NULL,
+                document TEXT NOT NULL,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (collection, document)
+            )"""
+        )
+        # All collections share one table, so each field combination needs one index.
+        for index_fields in dict.fromkeys(index_fields for _, index_fields in COMPOSITE_INDEXES):
+            expressions = ", ".join(f"json_extract(data, '$.{field}')" for field in index_fields)
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{'_'.join(index_fields)} ON documents (collection, {expressions})"
+            )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def set(self, collection, document, data):
+        payload = codec.dumps(data)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (collection, document, data, updated_at) VALUES (?, ?, ?, ?)",
+                (collection, str(document), payload, time.time()),
+            )
+            self._conn.commit()
+            self._writes += 1
+
+    def get(self, collection, document):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM documents WHERE collection = ? AND document = ?",
+                (collection, str(document)),
+            ).fetchone()
+        return codec.loads(row[0]) if row else None
+
+    def stream(self, collection):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT document, data FROM documents WHERE collection = ? ORDER BY document",
+                (collection,),
+            ).fetchall()
+        for document, data in rows:
+            yield document, codec.loads(data)
+
+    def query(self, collection, filters=(), order_by=None, descending=False, limit=None, fields=None):
+        _check_query(filters, order_by, fields)
+        sql = ["SELECT document, data FROM documents WHERE collection = ?"]
+        params = [collection]
+        for field, op, value in filters:
+            sql.append(f"AND json_extract(data, '$.{field}') {'=' if op == '==' else op} ?")
+            params.append(value)
+        if order_by:
+            sql.append(f"AND json_extract(data, '$.{order_by}') IS NOT NULL")
+            sql.append(f"ORDER BY json_extract(data, '$.{order_by}') {'DESC' if descending else 'ASC'}")
+        if limit is not None:
+            sql.append("LIMIT ?")
+            params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(" ".join(sql), params).fetchall()
+        return [(document, project(codec.loads(data), fields)) for document, data in rows]
+
+    def close(self, timeout=None):
+        with self._lock:
+            self._conn.close()
+        return True
+
+    def stats(self):
+        return {"backend": self.name, "path": self.path, "writes": self._writes}
+
+
+class FirestoreStorage(StorageBackend):
+    """
+    Firestore backend. Writes go through a `BatchedWriter`; the client is only
+    created on the first read or write.
+
+    Args:
+        client: Optional Firestore client (e.g. `FakeFirestoreClient`). Defaults to
+            `firestore.get_client()`.
+    """
+
+    name = "firestore"
+
+    def __init__(self, client=None, max_batch_size=MAX_BATCH_SIZE, linger_seconds=0.05):
+        self._client = client
+        self._max_batch_size = max_batch_size
+        self._linger_seconds = linger_seconds
+        self._writer = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            from teacher_assistant_agent.firestore import get_client
+            self._client = get_client()
+        return self._client
+
+    @property
+    def writer(self):
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = BatchedWriter(
+                        self.client,
+                        max_batch_size=self._max_batch_size,
+                        linger_seconds=self._linger_seconds,
+                    )
+        return self._writer
+
+    def set(self, collection, document, data):
+        self.writer.set(collection, document, data)
+
+    def get(self, collection, document):
+        if self._writer is not None:
+            pending = self._writer.pending(collection, document)
+            if pending is not None:
+                return copy.deepcopy(pending)
+        snapshot = self.client.collection(collection).document(str(document)).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def stream(self, collection):
+        for snapshot in self.client.collection(collection).stream():
+            yield snapshot.id, snapshot.to_dict()
+
+    def update(self, collection, document, apply):
+        """Runs `apply` in a Firestore transaction, so concurrent workers never lose an update."""
+        from google.cloud import firestore
+
+        if self._writer is not None and self._writer.pending(collection, document) is not None:
+            # A queued write would land after the transaction and overwrite it.
+            self.flush()
+        reference = self.client.collection(collection).document(str(document))
+
+        @firestore.transactional
+        def run(transaction):
+            snapshot = reference.get(transaction=transaction)
+            data = apply(snapshot.to_dict() if snapshot.exists else None)
+            transaction.set(reference, data)
+            return data
+
+        return run(self.client.transaction())
+
+    def query(self, collection, filters=(), order_by=None, descending=False, limit=None, fields=None):
+        """Runs as a Firestore query; see COMPOSITE_INDEXES for the indexes it relies on."""
+        from google.cloud.firestore_v1 import FieldFilter
+
+        _check_query(filters, order_by, fields)
+        # Queries read committed data only; commit queued writes first.
+        self.flush()
+        query = self.client.collection(collection)
+        for field, op, value in filters:
+            query = query.where(filter=FieldFilter(field, op, value))
+        if order_by:
+            query = query.order_by(order_by, direction="DESCENDING" if descending else "ASCENDING")
+        if fields:
+            query = query.select(list(fields))
+        if limit is not None:
+            query = query.limit(limit)
+        return [(snapshot.id, snapshot.to_dict()) for snapshot in query.stream()]
+
+    def flush(self, timeout=None):
+        if self._writer is None:
+            return True
+        return self._writer.flush(timeout)
+
+    def close(self, timeout=None):
+        if self._writer is None:
+            return True
+        return self._writer.close(timeout)
+
+    def stats(self):
+        stats = {"backend": self.name}
+        if self._writer is not None:
+            stats.update(self._writer.stats())
+        return stats
+
+
+def create_storage(backend=None):
+    """
+    Build a storage backend from configuration.
+
+    Args:
+        backend (str): "firestore", "memory" or "sqlite". Defaults to the
+            STORAGE_BACKEND environment variable, then "firestore".
+    """
+    backend = (backend or os.environ.get("STORAGE_BACKEND", "firestore")).lower()
+    if backend == "firestore":
+        return FirestoreStorage(
+            max_batch_size=int(os.environ.get("FIRESTORE_BATCH_SIZE", MAX_BATCH_SIZE)),
+            linger_seconds=float(os.environ.get("FIRESTORE_BATCH_LINGER_SECONDS", 0.05)),
+        )
+    if backend == "memory":
+        return InMemoryStorage()
+    if backend == "sqlite":
+        return SQLiteStorage(os.environ.get("SQLITE_STORAGE_PATH", "shikshak_sahayak.db"))
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend!r}")
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Return the configured storage backend, creating it on first use."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+    return _storage
+
+
+def set_storage(storage):
+    """Replace the active backend (e.g. with `InMemoryStorage()` for local runs)."""
+    global _storage
+    with _storage_lock:
+        _storage = storage
+    return storage
+
+
+def _close_storage():
+    if _storage is not None:
+        _storage.close(10)
+
+
+atexit.register(_close_storage)
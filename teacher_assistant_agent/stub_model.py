@@ -0,0 +1,193 @@
+"""
+Deterministic stand-in for Gemini, for benchmarks and offline runs.
+
+`install()` registers `StubLlm` for every `gemini-*` model name, so the real
+agent tree runs unchanged: the root agent's model turns transfer to the
+sub-agent the intent router picks, and sub-agent turns return a canned payload
+that validates against the request's response schema.
+"""
+import asyncio
+import json
+import random
+import re
+import threading
+import typing
+from types import UnionType
+from typing import AsyncGenerator, ClassVar, Literal, Optional, Union
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.models.registry import LLMRegistry
+from google.genai import types
+from pydantic import BaseModel
+
+from teacher_assistant_agent.model_io import latest_user_text
+from teacher_assistant_agent.prompts import estimate_tokens
+
+
+def example_payload(schema: type[BaseModel], seed: int = 0, items: int = 1) -> dict:
+    """
+    A payload that validates against `schema`.
+
+    Strings are "<field> <seed>" so successive payloads differ (e.g. the question
+    bank does not dedupe them away), lists hold `items` items, optional fields
+    are filled with their first non-null type and literals take their first value.
+    """
+    return {name: _example(field.annotation, name, seed, items) for name, field in schema.model_fields.items()}
+
+
+def _example(annotation, name, seed, items=1):
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return example_payload(annotation, seed, items)
+    if origin is Literal:
+        return args[0]
+    if origin in (Union, UnionType):
+        return _example(next(arg for arg in args if arg is not type(None)), name, seed, items)
+    if origin in (list, tuple, set):
+        return [_example(args[0], name, seed + i, items) for i in range(items)] if args else []
+    if origin is dict:
+        return {}
+    if annotation is int:
+        return 1
+    if annotation is float:
+        return 0.5
+    if annotation is bool:
+        return True
+    return f"{name.replace('_', ' ')} {seed}"
+
+
+class StubModelError(Exception):
+    """Injected model failure; `code` makes it look like a transient server error."""
+    code = 503
+
+
+class StubLlm(BaseLlm):
+    """
+    Model that answers without a network call.
+
+    Root turns (no response schema, `transfer_to_agent` available) become a
+    transfer to the router's best guess; every other turn returns
+    `example_payload` for the response schema. Streaming requests receive that
+    text as `stream_chunks` partial responses before the complete one. Token
+    usage is estimated from the request and response text so metrics look like
+    real traffic.
+
+    Faults for exercising `resilience.ResilientLlm`: a fraction `slow_rate` of
+    calls takes `slow_latency_seconds`, a fraction `error_rate` raises
+    `StubModelError` (HTTP 503), and models matching `unavailable_models` always
+    raise it. `model_profiles` maps a model-name regex to its own
+    `latency_seconds` and an `invalid_rate` of responses cut off somewhere in
+    the second half of their JSON, so tiers of different speed and quality can
+    be simulated. Whether a call is slow, fails or is cut off depends only on
+    its call number, so runs are repeatable.
+    """
+
+    # Shared by every instance the registry creates; set through `install()`.
+    latency_seconds: ClassVar[float] = 0.0
+    list_items: ClassVar[int] = 1
+    # Streaming requests get the response in this many partial chunks, spread over the latency.
+    stream_chunks: ClassVar[int] = 10
+    slow_rate: ClassVar[float] = 0.0
+    slow_latency_seconds: ClassVar[float] = 0.0
+    error_rate: ClassVar[float] = 0.0
+    unavailable_models: ClassVar[Optional[str]] = None  # regex
+    model_profiles: ClassVar[dict] = {}  # regex -> {"latency_seconds": ..., "invalid_rate": ...}
+    calls: ClassVar[int] = 0
+    _lock: ClassVar[threading.Lock] = threading.Lock()
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return [r"gemini-.*"]
+
+    def _next_seed(self):
+        with StubLlm._lock:
+            StubLlm.calls += 1
+            return StubLlm.calls
+
+    def _fault(self, llm_request: LlmRequest, seed: int) -> tuple[float, Optional[float]]:
+        """Raise the injected error for this call, or return its latency and the fraction of text to keep."""
+        model = llm_request.model or self.model
+        if self.unavailable_models and re.fullmatch(self.unavailable_models, model):
+            raise StubModelError(f"{model} is unavailable")
+        profile = next((item for pattern, item in self.model_profiles.items() if re.fullmatch(pattern, model)), {})
+        draw = random.Random(seed)
+        if draw.random() < self.error_rate:
+            raise StubModelError(f"Injected failure on call {seed}")
+        latency = profile.get("latency_seconds", self.latency_seconds)
+        if draw.random() < self.slow_rate:
+            latency = self.slow_latency_seconds
+        return latency, draw.uniform(0.5, 0.98) if draw.random() < profile.get("invalid_rate", 0.0) else None
+
+    def _respond(self, llm_request: LlmRequest, seed: int) -> types.Part:
+        schema = llm_request.config.response_schema if llm_request.config else None
+        if isinstance(schema, type) and issubclass(schema, BaseModel):
+            return types.Part(text=json.dumps(example_payload(schema, seed, self.list_items)))
+        if "transfer_to_agent" in llm_request.tools_dict:
+            from teacher_assistant_agent.router import get_router
+
+            _, text = latest_user_text(llm_request)
+            decision = get_router().classify(text or "")
+            if decision.agent_name:
+                return types.Part(function_call=types.FunctionCall(
+                    name="transfer_to_agent", args={"agent_name": decision.agent_name}
+                ))
+        return types.Part(text="Done.")
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        seed = self._next_seed()
+        latency, keep = self._fault(llm_request, seed)
+        part = self._respond(llm_request, seed)
+        if keep is not None and part.text:
+            part = types.Part(text=part.text[:int(len(part.text) * keep)])
+        if stream and part.text and self.stream_chunks > 1:
+            size = -(-len(part.text) // self.stream_chunks)
+            for start in range(0, len(part.text), size):
+                if latency:
+                    await asyncio.sleep(latency / self.stream_chunks)
+                yield LlmResponse(
+                    content=types.Content(role="model", parts=[types.Part(text=part.text[start:start + size])]),
+                    partial=True,
+                )
+        elif latency:
+            await asyncio.sleep(latency)
+        system = str(llm_request.config.system_instruction or "") if llm_request.config else ""
+        prompt = system + "".join(
+            piece.text or "" for content in llm_request.contents for piece in content.parts or []
+        )
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[part]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=estimate_tokens(prompt),
+                candidates_token_count=estimate_tokens(part.text or json.dumps(part.function_call.args)),
+            ),
+        )
+
+
+def install(latency_seconds: Optional[float] = None, list_items: Optional[int] = None, **faults) -> type[StubLlm]:
+    """
+    Route every `gemini-*` model to `StubLlm`.
+
+    Args:
+        latency_seconds (float): Simulated model latency per call.
+        list_items (int): Entries per list in canned payloads (e.g. days in a lesson plan).
+        **faults: `slow_rate`, `slow_latency_seconds`, `error_rate`, `unavailable_models` or `model_profiles`.
+    """
+    from teacher_assistant_agent import resilience
+
+    if latency_seconds is not None:
+        StubLlm.latency_seconds = latency_seconds
+    if list_items is not None:
+        StubLlm.list_items = list_items
+    for name, value in faults.items():
+        if name not in ("slow_rate", "slow_latency_seconds", "error_rate", "unavailable_models", "model_profiles"):
+            raise TypeError(f"Unknown fault: {name}")
+        setattr(StubLlm, name, value)
+    LLMRegistry.register(StubLlm)
+    # Models resolved before the stub was installed would otherwise keep being called.
+    resilience.reset()
+    return StubLlm
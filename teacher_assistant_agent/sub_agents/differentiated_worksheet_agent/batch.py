@@ -0,0 +1,199 @@
+"""
+Class-wide differentiated worksheets.
+
+Students of a class with the same screening levels (anxiety, confidence,
+emotional regulation, focus, resilience) for the same subject and chapter get
+the same questions, so the class is grouped by that profile and
+`differentiated_worksheet_agent` runs once per distinct profile instead of once
+per student.
+
+Each profile's questions are stored once per run in `worksheet_question_sets`,
+under the profile's id plus the run's timestamp, so a later run or section
+with the same profile never replaces questions earlier students received.
+Every student still gets a `differentiated_worksheets` record (written through
+`state.record_artifact`) with their own screening results and follow-ups,
+pointing at the shared questions through `question_set_id`.
+`state.load_artifact` resolves the reference.
+
+Usage:
+    python -m teacher_assistant_agent.sub_agents.differentiated_worksheet_agent.batch students.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional
+
+from teacher_assistant_agent import codec
+from teacher_assistant_agent.history import normalize
+from teacher_assistant_agent.invoke import run_agent
+from teacher_assistant_agent.metrics import instrument
+from teacher_assistant_agent.resilience import resilient
+from teacher_assistant_agent.state import QUESTION_SETS_COLLECTION, record_artifact
+from teacher_assistant_agent.storage import get_storage
+from .agent import DifferentiatedWorksheet, ScreeningMetrics, differentiated_worksheet_agent
+
+BATCH_CONCURRENCY = int(os.environ.get("WORKSHEET_BATCH_CONCURRENCY", 8))
+BATCH_RETRIES = int(os.environ.get("WORKSHEET_BATCH_RETRIES", 2))
+
+
+@dataclass
+class ProfileWorksheetResult:
+    question_set_id: str
+    student_ids: list = field(default_factory=list)
+    worksheet: Optional[DifferentiatedWorksheet] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    latency_seconds: float = 0.0
+
+
+def profile_key(student: dict) -> tuple:
+    """Class, subject, chapter and screening levels; students with equal keys share questions."""
+    screening = student.get("screening_results") or {}
+    return (
+        normalize(student.get("class_name")),
+        normalize(student.get("subject_name")),
+        normalize(student.get("chapter_name")),
+        *(normalize(screening.get(metric)) for metric in ScreeningMetrics.model_fields),
+    )
+
+
+def question_set_id(key: tuple) -> str:
+    """Id of a profile; the stored question set adds the run (see `generate_class_worksheets`)."""
+    digest = hashlib.sha1("|".join(key).encode("utf-8")).hexdigest()[:10]
+    return "__".join([*(part or "any" for part in key[:3]), digest])
+
+
+def group_by_profile(students: list[dict]) -> dict[str, list[dict]]:
+    """Students grouped by `question_set_id(profile_key(student))`, in input order."""
+    groups = {}
+    for student in students:
+        groups.setdefault(question_set_id(profile_key(student)), []).append(student)
+    return groups
+
+
+def _profile_request(set_id, students):
+    followups = list(dict.fromkeys(
+        followup for student in students for followup in student.get("suggested_followups") or []
+    ))
+    return dict(students[0], student_id=set_id, suggested_followups=followups)
+
+
+def _store(set_id, students, worksheet):
+    storage = get_storage()
+    shared = worksheet.model_dump(include={"class_name", "subject_name", "chapter_name", "screening_results", "questions"})
+    storage.set(QUESTION_SETS_COLLECTION, set_id, {
+        **shared,
+        "student_ids": [str(student.get("student_id")) for student in students],
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    })
+    refs = {}  # batch runs have no session; record_artifact keeps its references here
+    for student in students:
+        record = worksheet.model_dump(exclude={"questions"})
+        record.update({
+            key: student[key]
+            for key in ("student_id", "class_name", "subject_name", "chapter_name",
+                        "screening_results", "suggested_followups", "evaluation_date")
+            if student.get(key) is not None
+        })
+        record["student_id"] = str(record["student_id"])
+        record["question_set_id"] = set_id
+        # No schema: the record has no questions of its own, so it is never packed.
+        record_artifact(refs, "differentiated_worksheet", record["student_id"], record, summary={
+            "student_id": record["student_id"],
+            "subject_name": record.get("subject_name"),
+            "chapter_name": record.get("chapter_name"),
+            "question_set_id": set_id,
+        })
+
+
+async def _generate_one(set_id, students, semaphore, retries, agent):
+    result = ProfileWorksheetResult(set_id, [str(student.get("student_id")) for student in students])
+    start = time.perf_counter()
+    request = codec.dumps(_profile_request(set_id, students))
+    async with semaphore:
+        for attempt in range(1, retries + 2):
+            result.attempts = attempt
+            try:
+                # `worksheet_profile_id` tells the agent's callback that the batch stores the result.
+                run = await run_agent(agent, request, state={"worksheet_profile_id": set_id}, user_id=set_id)
+                result.worksheet = codec.validate_json(DifferentiatedWorksheet, run.text)
+                _store(set_id, students, result.worksheet)
+                result.error = None
+                break
+            except Exception as e:
+                result.error = f"{type(e).__name__}: {e}"
+                print(f"Worksheet for profile {set_id} failed (attempt {attempt}): {result.error}")
+                if attempt <= retries:
+                    await asyncio.sleep(min(0.5 * 2 ** (attempt - 1), 8.0) * random.uniform(0.5, 1.5))
+    result.latency_seconds = time.perf_counter() - start
+    return result
+
+
+async def generate_class_worksheets(
+    students: list[dict],
+    concurrency: int = BATCH_CONCURRENCY,
+    retries: int = BATCH_RETRIES,
+    agent=differentiated_worksheet_agent,
+) -> AsyncIterator[ProfileWorksheetResult]:
+    """
+    Generate differentiated worksheets for a class, one model call per distinct profile.
+
+    Args:
+        students (list[dict]): One entry per student in the input format of
+            `differentiated_worksheet_agent` (student_id, class_name, subject_name,
+            chapter_name, screening_results, suggested_followups, evaluation_date).
+        concurrency (int): Maximum number of profiles generated at once.
+        retries (int): Extra attempts per profile after a failure.
+
+    Yields:
+        ProfileWorksheetResult: One per profile, in completion order. Its
+        `question_set_id` is `<profile id>__<run timestamp in ms>`.
+    """
+    instrument(resilient(agent))
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    run_id = str(int(time.time() * 1000))
+    tasks = [
+        asyncio.create_task(_generate_one(f"{profile_id}__{run_id}", group, semaphore, retries, agent))
+        for profile_id, group in group_by_profile(students).items()
+    ]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.to_thread(get_storage().flush)
+
+
+async def _main(path, concurrency, retries):
+    with open(path) as f:
+        students = json.load(f)
+    if isinstance(students, dict):
+        students = students.get("students", [])
+
+    start = time.perf_counter()
+    profiles = failed = 0
+    async for result in generate_class_worksheets(students, concurrency, retries):
+        profiles += 1
+        if result.worksheet:
+            print(f"{result.question_set_id}: {len(result.worksheet.questions)} questions for "
+                  f"{', '.join(result.student_ids)} ({result.latency_seconds:.1f}s)")
+        else:
+            failed += len(result.student_ids)
+            print(f"{result.question_set_id}: FAILED after {result.attempts} attempts - {result.error}")
+    print(f"Generated worksheets for {len(students) - failed}/{len(students)} students "
+          f"from {profiles} profiles in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate differentiated worksheets for a class, one per screening profile.")
+    parser.add_argument("students", help="JSON file with a list of students (or {\"students\": [...]}).")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--retries", type=int, default=BATCH_RETRIES)
+    args = parser.parse_args()
+    asyncio.run(_main(args.students, args.concurrency, args.retries))
@@ -1,6 +1,10 @@
 from google.adk.agents import Agent
-from teacher_assistant_agent.firestore import db
-from datetime import datetime
+from teacher_assistant_agent.history import versioned
+from teacher_assistant_agent.prompts import build_instruction
+from teacher_assistant_agent.state import append_history, record_artifact
+from .cache import remember_lesson_plan, serve_cached_lesson_plan
+from .fanout import fan_out_lesson_plan
+from .streaming import persist_streamed_days, streamed_document
 from google.adk.agents.callback_context import CallbackContext
 from pydantic import BaseModel, Field
 from typing import List
@@ -29,34 +33,26 @@ class LessonPlan(BaseModel):
 
 
 def update_lesson_plan(callback_context: CallbackContext):
-    lesson_plans = callback_context.state.get("lesson_plans", [])
     lesson_plan_data = callback_context.state.get("new_lesson_plan")
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    # print(f"DEBUG - Storing lesson plan at {current_time}")
-    print(f"DEBUG - Lesson plan data: {lesson_plan_data}")
-    
     if not lesson_plan_data:
         print("No lesson plan data found in state.")
         return
 
-    print(f"Saving lesson plan: {lesson_plan_data}")
+    print(f"Saving lesson plan: {lesson_plan_data['chapter_name']}")
 
-    # doc_id = f"{lesson_plan_data['teacher']}_{lesson_plan_data['class_name']}_{lesson_plan_data['subject_name']}_{lesson_plan_data['chapter_name']}"
-    doc_ref = db.collection("lesson_plans").document(lesson_plan_data['chapter_name'])
-    if lesson_plan_data:
-        doc_ref.set(lesson_plan_data)
-        lesson_plans.append(lesson_plan_data)
+    doc_id, stored_plan = versioned("lesson_plans", lesson_plan_data)
+    # A streamed plan replaces the in-progress document stored while it was generated.
+    doc_id = streamed_document(callback_context) or doc_id
+    record_artifact(callback_context.state, "lesson_plans", doc_id, stored_plan, summary={
+        "class_name": lesson_plan_data.get("class_name"),
+        "subject_name": lesson_plan_data.get("subject_name"),
+        "chapter_name": lesson_plan_data.get("chapter_name"),
+        "number_of_days": lesson_plan_data.get("number_of_days"),
+    }, schema=LessonPlan)
 
-    callback_context.state["lesson_plans"] = lesson_plans
-    callback_context.state["new_psych_profile"] = None 
-
-    history = callback_context.state.get("interaction_history", [])
-    history.append({
-        "action": "store_lesson_plan",
-        "timestamp": current_time
-    })
-    callback_context.state["interaction_history"] = history
+    remember_lesson_plan(callback_context, lesson_plan_data)
+    append_history(callback_context.state, "store_lesson_plan")
     callback_context.state["new_lesson_plan"] = None
 
 
@@ -64,7 +60,9 @@ lesson_planner_agent = Agent(
     name="lesson_planner_agent",
     model="gemini-2.0-flash",
     description="Generates a structured daily lesson plan based on chapter, subject, and total time per day.",
-    instruction="""
+    instruction=build_instruction(
+        "lesson_planner_agent",
+        """
         You are a lesson planning assistant that helps teachers create structured lesson plans for a given subject, class, and chapter.
 
         **MANDATORY USER INPUT:**
@@ -72,49 +70,17 @@ lesson_planner_agent = Agent(
 
         **STRUCTURE RULES:**
         1. Plan must include number of days (`number_of_days`) needed to complete the chapter.
-        2. Each day will have:
-            - A `title` for the day.
-            - Topics list with:
-                - Title
-                - Estimated time in minutes
-                - Activity type
+        2. Each day has a `title` and a list of `topics`, each with a title, estimated time in minutes and activity type.
         3. Distribute the `time_per_day_minutes` across `topics` within each day.
         4. The total time in `topics` should equal `time_allocated_minutes` for that day.
-
-        **FINAL OUTPUT FORMAT (MUST be returned as JSON):**
-        {
-            "teacher": "Teacher Name",
-            "class_name": "Class",
-            "subject_name": "Subject",
-            "chapter_name": "Chapter",
-            "time_per_day_minutes": 45,
-            "number_of_days": 5,
-            "short_description": "Short summary of the chapter",
-            "learning_objective": "What students will learn",
-            "daily_plan": [
-                {
-                    "day": 1,
-                    "title": "Introduction to the Chapter",
-                    "topics": [
-                        {
-                            "title": "Introduction and key terms",
-                            "time_minutes": 20,
-                            "activity": "Discussion"
-                        },
-                        {
-                            "title": "Overview of chapter themes",
-                            "time_minutes": 25,
-                            "activity": "Interactive lecture"
-                        }
-                    ],
-                    "time_allocated_minutes": 45
-                }
-            ]
-        }
-    """,
+        """,
+        output_schema=LessonPlan,
+    ),
     output_schema=LessonPlan,
     output_key="new_lesson_plan",
     tools=[],
+    before_model_callback=[serve_cached_lesson_plan, fan_out_lesson_plan],
+    after_model_callback=persist_streamed_days,
     after_agent_callback=update_lesson_plan,
     disallow_transfer_to_peers=True,
 )
@@ -0,0 +1,239 @@
+import os
+import re
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+
+from teacher_assistant_agent import codec
+from teacher_assistant_agent.cache import ResponseCache
+from teacher_assistant_agent.metrics import register_collector
+from teacher_assistant_agent.model_io import parse_json_object, teacher_text, text_response
+
+LESSON_PLAN_CACHE_SIZE = int(os.environ.get("LESSON_PLAN_CACHE_SIZE", 256))
+LESSON_PLAN_CACHE_TTL_SECONDS = float(os.environ.get("LESSON_PLAN_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+
+lesson_plan_cache = ResponseCache("lesson_plan_cache", LESSON_PLAN_CACHE_SIZE, LESSON_PLAN_CACHE_TTL_SECONDS)
+register_collector("lesson_plan_cache", lesson_plan_cache.stats)
+
+# Phrases that ask for a new plan even when an identical one is cached. Only
+# the words outside the chapter and subject are checked ("Fresh water resources").
+_FORCE_REGENERATE = re.compile(
+    r"\b(regenerate|re-generate|fresh (plan|one|version|copy)|start (afresh|fresh|over)|new version|different plan"
+    r"|another plan|from scratch|don'?t use (the )?cache)\b",
+    re.IGNORECASE,
+)
+
+_ROMAN = {"i": 1, "ii": 2, "iii": 3, "iv": 4, "v": 5, "vi": 6, "vii": 7, "viii": 8, "ix": 9, "x": 10, "xi": 11, "xii": 12}
+_CLASS = re.compile(r"\b(?:class|grade|std\.?|standard)\s*[-:]?\s*(\d{1,2}|[ivx]{1,4})\b", re.IGNORECASE)
+_CLASS_ORDINAL = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)\s+(?:class|grade|standard|std)\b", re.IGNORECASE)
+_MINUTES = re.compile(r"\b(\d{1,3})\s*(?:-\s*)?(?:minutes?|mins?)\b", re.IGNORECASE)
+_DAYS = re.compile(r"\b(\d{1,2})\s*(?:-\s*)?days?\b", re.IGNORECASE)
+_CHAPTER = re.compile(
+    r"\b(?:chapter|lesson(?!\s*plans?\b)|topic)\s*(?:\d+\s*)?[-:]?\s*(?:on\s+|called\s+|named\s+)?[\"'“‘]?([^\"'”’,.;\n]+?)[\"'”’]?\s*(?=[,.;\n]|\bfor\b|\bwith\b|\bin\b|\bover\b|$)",
+    re.IGNORECASE,
+)
+
+# Subject aliases teachers use, mapped to one canonical name.
+_SUBJECTS = {
+    "math": "mathematics", "maths": "mathematics", "mathematics": "mathematics",
+    "science": "science", "evs": "evs", "environmental studies": "evs",
+    "english": "english", "hindi": "hindi", "kannada": "kannada", "sanskrit": "sanskrit",
+    "social studies": "social science", "social science": "social science", "sst": "social science",
+    "history": "history", "geography": "geography", "civics": "civics",
+    "physics": "physics", "chemistry": "chemistry", "biology": "biology",
+    "computer science": "computer science", "computers": "computer science",
+}
+_SUBJECT = re.compile(r"\b(" + "|".join(sorted(map(re.escape, _SUBJECTS), key=len, reverse=True)) + r")\b", re.IGNORECASE)
+
+# How many earlier teacher messages may fill in parameters missing from the latest one
+# (e.g. the minutes per day given in reply to the agent's question).
+_LOOKBACK_MESSAGES = 4
+
+# "teacher: Mrs. Rao", "teacher name - Anil Kumar"
+_TEACHER = re.compile(r"\bteacher(?:'s)?(?:\s+name)?\s*[:\-]\s*([^,;\n]+?)\s*(?=[,;\n]|$)", re.IGNORECASE)
+
+_FIELDS = ("class_name", "subject_name", "chapter_name", "time_per_day_minutes", "number_of_days")
+
+
+def _normalize_text(value) -> str:
+    text = re.sub(r"[^\w\s]", " ", str(value).lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _normalize_class(value) -> Optional[str]:
+    text = _normalize_text(value)
+    text = re.sub(r"^(class|grade|std|standard)\s*", "", text)
+    text = re.sub(r"(\d+)(st|nd|rd|th)$", r"\1", text)
+    if text in _ROMAN:
+        return str(_ROMAN[text])
+    return text or None
+
+
+def _normalize_subject(value) -> Optional[str]:
+    text = _normalize_text(value)
+    return _SUBJECTS.get(text, text) or None
+
+
+def _positive_int(value) -> Optional[int]:
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number > 0 else None
+
+
+def _params_from_text(text: str) -> dict:
+    params = {}
+    payload = parse_json_object(text)
+    if payload:
+        for field in _FIELDS:
+            if payload.get(field) not in (None, ""):
+                params[field] = payload[field]
+        if payload.get("class") and "class_name" not in params:
+            params["class_name"] = payload["class"]
+        if payload.get("subject") and "subject_name" not in params:
+            params["subject_name"] = payload["subject"]
+        if payload.get("chapter") and "chapter_name" not in params:
+            params["chapter_name"] = payload["chapter"]
+        return params
+
+    match = _CLASS.search(text) or _CLASS_ORDINAL.search(text)
+    if match:
+        params["class_name"] = match.group(1)
+    match = _SUBJECT.search(text)
+    if match:
+        params["subject_name"] = match.group(1)
+    match = _CHAPTER.search(text)
+    if match and match.group(1).strip():
+        params["chapter_name"] = match.group(1)
+    match = _MINUTES.search(text)
+    if match:
+        params["time_per_day_minutes"] = match.group(1)
+    match = _DAYS.search(text)
+    if match:
+        params["number_of_days"] = match.group(1)
+    return params
+
+
+def _normalize(params: dict) -> Optional[dict]:
+    key = {
+        "class_name": _normalize_class(params.get("class_name", "")),
+        "subject_name": _normalize_subject(params.get("subject_name", "")),
+        "chapter_name": _normalize_text(params.get("chapter_name", "")) or None,
+        "time_per_day_minutes": _positive_int(params.get("time_per_day_minutes")),
+        "number_of_days": _positive_int(params.get("number_of_days")),
+    }
+    # number_of_days may be left to the model; the other parameters are required.
+    required = [value for field, value in key.items() if field != "number_of_days"]
+    return key if all(required) else None
+
+
+def request_params(llm_request) -> tuple[Optional[dict], bool]:
+    """
+    Extract the normalized cache key from the teacher's recent messages.
+
+    Returns:
+        tuple: (`params` or None if a required parameter is missing, `force_regenerate`).
+    """
+    texts = []
+    for content in reversed(llm_request.contents):
+        if content.role == "model" and any("daily_plan" in (part.text or "") for part in content.parts or []):
+            # Messages before the last plan belong to an earlier request.
+            break
+        text = teacher_text(content)
+        if text is not None:
+            texts.append(text)
+            if len(texts) >= _LOOKBACK_MESSAGES:
+                break
+    if not texts:
+        return None, False
+
+    params = {}
+    for text in reversed(texts):  # later messages override earlier ones
+        params.update(_params_from_text(text))
+    latest = texts[0]
+    payload = parse_json_object(latest) or {}
+    force = bool(payload.get("force_regenerate")) or _asks_to_regenerate(latest)
+    return _normalize(params), force
+
+
+def _asks_to_regenerate(text: str) -> bool:
+    """Whether `text` asks for a new plan, ignoring words inside its chapter and subject names."""
+    named = _params_from_text(text)
+    for field in ("chapter_name", "subject_name"):
+        if named.get(field):
+            text = re.sub(re.escape(str(named[field])), " ", text, flags=re.IGNORECASE)
+    return bool(_FORCE_REGENERATE.search(text))
+
+
+def request_teacher(llm_request, state=None) -> str:
+    """
+    Teacher named in the recent messages (`teacher` / `teacher_name` in a JSON
+    payload, or "teacher: <name>"), else the session's `teacher_name`, else "".
+    """
+    checked = 0
+    for content in reversed(llm_request.contents):
+        text = teacher_text(content)
+        if text is None:
+            continue
+        payload = parse_json_object(text) or {}
+        name = payload.get("teacher") or payload.get("teacher_name")
+        if not name:
+            match = _TEACHER.search(text)
+            name = match.group(1) if match else None
+        if name and str(name).strip():
+            return str(name).strip()
+        checked += 1
+        if checked >= _LOOKBACK_MESSAGES:
+            break
+    return str((state or {}).get("teacher_name") or "")
+
+
+def serve_cached_lesson_plan(callback_context: CallbackContext, llm_request):
+    """
+    before_model_callback: answer from the lesson plan cache when the same class,
+    subject, chapter, minutes per day and number of days were planned before.
+
+    The cached plan is returned as the model's response, so `output_key` and
+    `update_lesson_plan` store it exactly like a generated one. Its `teacher` is
+    the current requester (see `request_teacher`), not the original author.
+    """
+    if not lesson_plan_cache.enabled:
+        return None
+    params, force = request_params(llm_request)
+    if params is None:
+        return None
+
+    callback_context.state["temp:lesson_plan_cache_params"] = params
+    if force:
+        print(f"Lesson plan cache bypassed for {params['chapter_name']} (regenerate requested)")
+        return None
+
+    plan = lesson_plan_cache.get(params)
+    if plan is None:
+        return None
+    print(f"Lesson plan cache hit for {params['chapter_name']}")
+    callback_context.state["temp:lesson_plan_cache_hit"] = True
+    # Plans are shared across teachers; the one asking now is the plan's teacher.
+    plan = dict(plan, teacher=request_teacher(llm_request, callback_context.state))
+    return text_response(codec.dumps(plan))
+
+
+def remember_lesson_plan(callback_context: CallbackContext, lesson_plan: dict):
+    """Store a freshly generated plan under the parameters of the request that produced it."""
+    params = callback_context.state.get("temp:lesson_plan_cache_params")
+    hit = callback_context.state.get("temp:lesson_plan_cache_hit")
+    callback_context.state["temp:lesson_plan_cache_params"] = None
+    callback_context.state["temp:lesson_plan_cache_hit"] = None
+    if not params or hit:
+        return
+    # When the teacher left the number of days to the model, also key the plan on the days it chose.
+    planned = dict(params, number_of_days=_positive_int(lesson_plan.get("number_of_days")))
+    # The author is not part of the key, so it is not cached either.
+    shared = {key: value for key, value in lesson_plan.items() if key != "teacher"}
+    try:
+        lesson_plan_cache.put(params, shared)
+        if planned and planned != params:
+            lesson_plan_cache.put(planned, shared)
+    except Exception as e:
+        print(f"Error caching lesson plan: {e}")
@@ -0,0 +1,183 @@
+"""
+Two-stage lesson planning.
+
+A single `lesson_planner_agent` call writes every `DailyPlan` one after the
+other, so a 10-day plan takes ten days' worth of generation. With
+LESSON_PLAN_PIPELINE=fanout the plan is built in two stages instead:
+
+1. `lesson_outline_agent` fixes `number_of_days` and each day's title and
+   objective (a short response).
+2. `lesson_day_agent` details every day concurrently, at most
+   LESSON_PLAN_FANOUT_CONCURRENCY at a time.
+
+The days are merged into one validated `LessonPlan` and returned as the model's
+response, so `output_key` and `update_lesson_plan` store it as usual. Any
+failure falls back to the single call.
+
+LESSON_PLAN_PIPELINE selects the planner:
+    single   one model call writes the whole plan (default)
+    fanout   outline first, then the days in parallel
+"""
+import asyncio
+import os
+from functools import lru_cache
+from typing import List
+
+from google.adk.agents.callback_context import CallbackContext
+from pydantic import BaseModel, Field
+
+from teacher_assistant_agent import codec
+from teacher_assistant_agent.invoke import run_agent
+from teacher_assistant_agent.metrics import instrument
+from teacher_assistant_agent.model_io import latest_user_text, text_response
+from teacher_assistant_agent.prompts import build_instruction
+from teacher_assistant_agent.resilience import resilient
+from .cache import request_params
+
+LESSON_PLAN_PIPELINE = os.environ.get("LESSON_PLAN_PIPELINE", "single").lower()
+LESSON_PLAN_FANOUT_CONCURRENCY = int(os.environ.get("LESSON_PLAN_FANOUT_CONCURRENCY", 4))
+
+
+class DayOutline(BaseModel):
+    day: int = Field(description="Day number")
+    title: str = Field(description="Title for the day")
+    objective: str = Field(description="What students should be able to do after this day")
+
+
+class LessonOutline(BaseModel):
+    teacher: str = Field(description="Name of the teacher")
+    class_name: str = Field(description="Class name or grade")
+    subject_name: str = Field(description="Subject name")
+    chapter_name: str = Field(description="Chapter name")
+    time_per_day_minutes: int = Field(description="Total time allocated per day in minutes")
+    number_of_days: int = Field(description="Number of days for the chapter")
+    short_description: str = Field(description="Short description of the chapter")
+    learning_objective: str = Field(description="Learning objective of the chapter")
+    days: List[DayOutline] = Field(description="One entry per day, in order")
+
+
+@lru_cache(maxsize=None)
+def _stage_agents():
+    """The outline and day agents, built on first use."""
+    from google.adk.agents import Agent
+
+    from .agent import DailyPlan
+
+    outline_agent = Agent(
+        name="lesson_outline_agent",
+        model="gemini-2.0-flash",
+        description="Outlines a chapter into days with a title and objective each.",
+        instruction=build_instruction(
+            "lesson_outline_agent",
+            """
+            You outline lesson plans. From the teacher's request, decide how many days the chapter needs
+            (use the number of days if the teacher gave one) and give each day a title and a one-sentence
+            objective. The days must cover the chapter in a sensible teaching order without repeating content.
+            Keep `time_per_day_minutes` exactly as requested.
+            """,
+            output_schema=LessonOutline,
+        ),
+        output_schema=LessonOutline,
+        disallow_transfer_to_parent=True,
+        disallow_transfer_to_peers=True,
+    )
+    day_agent = Agent(
+        name="lesson_day_agent",
+        model="gemini-2.0-flash",
+        description="Details one day of an outlined lesson plan.",
+        instruction=build_instruction(
+            "lesson_day_agent",
+            """
+            You detail ONE day of a lesson plan. The input JSON has the class, subject, chapter, the minutes
+            available, this day's number, title and objective, and the titles of the other days.
+            Split the day into `topics`, each with a title, estimated time in minutes and activity type.
+            Cover only this day's objective; the other days' titles are there so you do not repeat them.
+            The topic times must add up to `time_allocated_minutes`, which equals the minutes available.
+            """,
+            output_schema=DailyPlan,
+        ),
+        output_schema=DailyPlan,
+        disallow_transfer_to_parent=True,
+        disallow_transfer_to_peers=True,
+    )
+    return instrument(resilient(outline_agent)), instrument(resilient(day_agent))
+
+
+async def plan_in_parallel(request: str, user_id: str = "system", concurrency: int = None) -> dict:
+    """
+    Build a lesson plan with an outline call and concurrent per-day calls.
+
+    Args:
+        request (str): The teacher's request (class, subject, chapter, minutes per day).
+        concurrency (int): Days detailed at once; defaults to LESSON_PLAN_FANOUT_CONCURRENCY.
+
+    Returns:
+        dict: A validated `LessonPlan`.
+    """
+    from .agent import DailyPlan, LessonPlan
+
+    outline_agent, day_agent = _stage_agents()
+    run = await run_agent(outline_agent, request, user_id=user_id)
+    outline = codec.validate_json(LessonOutline, run.text)
+    if not outline.days:
+        raise ValueError("The outline has no days.")
+
+    titles = [day.title for day in outline.days]
+    semaphore = asyncio.Semaphore(max(1, concurrency or LESSON_PLAN_FANOUT_CONCURRENCY))
+
+    async def detail(number, day):
+        message = codec.dumps({
+            "class_name": outline.class_name,
+            "subject_name": outline.subject_name,
+            "chapter_name": outline.chapter_name,
+            "time_per_day_minutes": outline.time_per_day_minutes,
+            "day": number,
+            "title": day.title,
+            "objective": day.objective,
+            "other_days": [title for other, title in enumerate(titles, 1) if other != number],
+        })
+        async with semaphore:
+            day_run = await run_agent(day_agent, message, user_id=user_id)
+        # The outline owns the numbering and titles.
+        return codec.validate_json(DailyPlan, day_run.text).model_copy(update={"day": number, "title": day.title})
+
+    tasks = [asyncio.create_task(detail(number, day)) for number, day in enumerate(outline.days, 1)]
+    try:
+        daily_plan = await asyncio.gather(*tasks)
+    except BaseException:
+        # One failed day fails the plan; stop the other days' calls before the
+        # caller falls back to a single call.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    plan = codec.validate(LessonPlan, {
+        **outline.model_dump(exclude={"days"}),
+        "number_of_days": len(daily_plan),
+        "daily_plan": [day.model_dump() for day in daily_plan],
+    })
+    return plan.model_dump()
+
+
+async def fan_out_lesson_plan(callback_context: CallbackContext, llm_request):
+    """
+    before_model_callback: with LESSON_PLAN_PIPELINE=fanout, answer the request
+    with a plan built by `plan_in_parallel` instead of one long model call.
+
+    Requests still missing a required parameter (e.g. minutes per day) go to the
+    model, which asks the teacher for it.
+    """
+    if LESSON_PLAN_PIPELINE != "fanout":
+        return None
+    params, _ = request_params(llm_request)
+    _, text = latest_user_text(llm_request)
+    if params is None or text is None:
+        return None
+    request = f"{text}\n\nRequest parameters: {codec.dumps(params)}"
+    try:
+        plan = await plan_in_parallel(request, user_id=callback_context.user_id)
+    except Exception as e:
+        print(f"Parallel lesson planning failed, generating in one call: {e}")
+        return None
+    print(f"Planned {plan['number_of_days']} days for {plan['chapter_name']} in parallel")
+    return text_response(codec.dumps(plan))
@@ -0,0 +1,223 @@
+"""
+Streaming lesson plans.
+
+With streaming enabled (`RunConfig(streaming_mode=StreamingMode.SSE)`, e.g. the
+"streaming" toggle in `adk web`), the model's `LessonPlan` JSON arrives in
+chunks. `DailyPlanParser` picks each `daily_plan` entry out of the partial text
+as soon as its closing brace arrives, so:
+
+- `persist_streamed_days` (after_model_callback) stores the plan after every
+  completed day, marked `"status": "in_progress"`, and `update_lesson_plan`
+  replaces that document with the final plan.
+- `stream_lesson_plan(message)` yields each validated `DailyPlan` to callers
+  that want to show day 1 before the last day is written.
+"""
+import re
+import threading
+import uuid
+from typing import AsyncIterator, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+
+from teacher_assistant_agent import codec
+from teacher_assistant_agent.history import versioned
+from teacher_assistant_agent.storage import get_storage
+
+_DAILY_PLAN = re.compile(r'"daily_plan"\s*:\s*\[')
+
+# Plans being streamed, by invocation id. Partial responses are not saved as
+# session events, so their progress cannot live in session state.
+_MAX_STREAMS = 256
+_streams: dict[str, "_Stream"] = {}
+_streams_lock = threading.Lock()
+
+
+class DailyPlanParser:
+    """
+    Incremental parser for a `LessonPlan` JSON document.
+
+    Feed it text as it arrives; each call returns the `daily_plan` entries that
+    were completed by that text, validated against `day_schema`.
+    """
+
+    def __init__(self, day_schema):
+        self.day_schema = day_schema
+        self.text = ""
+        self.header: Optional[dict] = None  # fields written before `daily_plan`
+        self.days = []
+        self.done = False
+        self._pos = None  # next character to scan inside the daily_plan array
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._start = None
+
+    def feed(self, chunk: str) -> list:
+        """Append `chunk` and return the days it completed."""
+        self.text += chunk
+        if self._pos is None:
+            match = _DAILY_PLAN.search(self.text)
+            if match is None:
+                return []
+            self._pos = match.end()
+            self.header = self._parse_header(self.text[:match.start()])
+        return self._scan()
+
+    def update(self, text: str) -> list:
+        """Catch up with the full text so far (e.g. a final aggregated response)."""
+        if text.startswith(self.text):
+            return self.feed(text[len(self.text):])
+        return []
+
+    @staticmethod
+    def _parse_header(prefix: str) -> dict:
+        start = prefix.find("{")
+        if start < 0:
+            return {}
+        try:
+            header = codec.loads(prefix[start:].rstrip().rstrip(",") + "}")
+        except ValueError:
+            return {}
+        return header if isinstance(header, dict) else {}
+
+    def _scan(self) -> list:
+        completed = []
+        text = self.text
+        pos = self._pos
+        while pos < len(text) and not self.done:
+            char = text[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._start = pos
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    day = self._validate(text[self._start:pos + 1])
+                    if day is not None:
+                        self.days.append(day)
+                        completed.append(day)
+            elif char == "]" and self._depth == 0:
+                self.done = True
+            pos += 1
+        self._pos = pos
+        return completed
+
+    def _validate(self, text):
+        try:
+            return codec.validate_json(self.day_schema, text)
+        except ValueError as e:
+            print(f"Skipping malformed streamed day: {e}")
+            return None
+
+
+class _Stream:
+    def __init__(self, parser):
+        self.parser = parser
+        self.document = None
+        self.lock = threading.Lock()
+
+
+def _stream_for(invocation_id) -> _Stream:
+    from .agent import DailyPlan
+
+    with _streams_lock:
+        stream = _streams.get(invocation_id)
+        if stream is None:
+            if len(_streams) >= _MAX_STREAMS:
+                # Invocations that ended without after_agent_callback (e.g. an error).
+                _streams.pop(next(iter(_streams)))
+            stream = _streams[invocation_id] = _Stream(DailyPlanParser(DailyPlan))
+        return stream
+
+
+def streamed_document(callback_context: CallbackContext) -> Optional[str]:
+    """
+    Document id the plan of this invocation was progressively stored under, if
+    it was streamed. Forgets the stream, so call it once when storing the final plan.
+    """
+    with _streams_lock:
+        stream = _streams.pop(callback_context.invocation_id, None)
+    return stream.document if stream else None
+
+
+def persist_streamed_days(callback_context: CallbackContext, llm_response):
+    """
+    after_model_callback: parse partial responses and store the plan so far
+    whenever a day is completed. Non-streaming responses are left alone.
+    """
+    if not llm_response.partial or not llm_response.content or not llm_response.content.parts:
+        return None
+    chunk = "".join(part.text or "" for part in llm_response.content.parts if not part.thought)
+    if not chunk:
+        return None
+    stream = _stream_for(callback_context.invocation_id)
+    with stream.lock:
+        if not stream.parser.feed(chunk):
+            return None
+        document, data = versioned("lesson_plans", stream.parser.header or {})
+        if stream.document is None:
+            stream.document = document
+        data.update(
+            daily_plan=[day.model_dump() for day in stream.parser.days],
+            status="in_progress",
+        )
+        document = stream.document
+    try:
+        get_storage().set("lesson_plans", document, data)
+    except Exception as e:
+        print(f"Error storing streamed lesson plan: {e}")
+    return None
+
+
+async def stream_lesson_plan(message: str, user_id: str = "teacher", state: Optional[dict] = None) -> AsyncIterator:
+    """
+    Run `lesson_planner_agent` on `message` with streaming and yield each
+    `DailyPlan` as soon as it is complete. Cached plans yield all days at once.
+
+    The plan is stored by the agent's callbacks as in a chat turn.
+    """
+    from google.adk.agents.run_config import RunConfig, StreamingMode
+    from google.genai import types
+
+    from teacher_assistant_agent.invoke import APP_NAME, _runner_for
+    from teacher_assistant_agent.registry import load_sub_agent
+    from .agent import DailyPlan
+
+    # Built through the registry so it has the same model wrapper and metrics as in chat.
+    lesson_planner_agent = load_sub_agent("lesson_planner_agent")
+    runner = _runner_for(lesson_planner_agent)
+    session = await runner.session_service.create_session(
+        app_name=APP_NAME, user_id=user_id, session_id=uuid.uuid4().hex, state=dict(state or {})
+    )
+    parser = DailyPlanParser(DailyPlan)
+    try:
+        async for event in runner.run_async(
+            user_id=user_id,
+            session_id=session.id,
+            new_message=types.Content(role="user", parts=[types.Part(text=message)]),
+            run_config=RunConfig(streaming_mode=StreamingMode.SSE),
+        ):
+            if event.author != lesson_planner_agent.name or not event.content or not event.content.parts:
+                continue
+            text = "".join(part.text or "" for part in event.content.parts if not part.thought)
+            if event.partial:
+                days = parser.feed(text)
+            elif parser.days:
+                days = parser.update(text)
+            else:
+                # Not streamed (e.g. a cached plan): the final response has every day.
+                days = DailyPlanParser(DailyPlan).feed(text)
+            for day in days:
+                yield day
+    finally:
+        await runner.session_service.delete_session(app_name=APP_NAME, user_id=user_id, session_id=session.id)
@@ -1,9 +1,12 @@
 from google.adk.agents import Agent
-from datetime import datetime
 from google.adk.agents.callback_context import CallbackContext
 from pydantic import BaseModel
 from typing import List, Literal
-from teacher_assistant_agent.firestore import db
+from teacher_assistant_agent.history import versioned
+from teacher_assistant_agent.prompts import build_instruction
+from teacher_assistant_agent.state import append_history, record_artifact
+from .digest import apply_ledger_fields, use_concept_ledger
+from .pipeline import run_medical_flag_stage
 
 class ConceptProgress(BaseModel):
     concept: str
@@ -24,79 +27,57 @@ class StudentProgressReport(BaseModel):
     recommendations: List[str]
     parent_summary: str
 
-def store_progress_report(callback_context: CallbackContext):
-    reports = callback_context.state.get("student_progress_report", [])
+async def store_progress_report(callback_context: CallbackContext):
     report = callback_context.state.get("new_student_progress_report")
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
     if not report:
         print("No progress report found in state.")
         return
 
-    doc_ref = db.collection("student_progress_reports").document(report["student_id"])
-    if report:
-        doc_ref.set(report)
-        reports.append(report)
-    history = callback_context.state.get("interaction_history", [])
-    history.append({
-        "action": "store_student_progress_report",
-        "timestamp": current_time
-    })
+    doc_id, stored_report = versioned("student_progress_reports", report)
+    record_artifact(callback_context.state, "student_progress_report", doc_id, stored_report, summary={
+        "student_id": report["student_id"],
+        "subject_name": report.get("subject_name"),
+        "chapter_name": report.get("chapter_name"),
+        "overall_progress": report.get("overall_progress"),
+    }, schema=StudentProgressReport)
 
-    callback_context.state["interaction_history"] = history
-    callback_context.state["student_progress_report"] = reports
+    append_history(callback_context.state, "store_student_progress_report")
     callback_context.state["new_student_progress_report"] = None
 
+    # Hand the report straight to medical_flag_agent instead of a root-agent transfer.
+    await run_medical_flag_stage(callback_context, report)
+
 
 progress_tracker_agent = Agent(
     name="progress_tracker_agent",
     model="gemini-1.5-flash",
     description="Generates detailed progress reports based on student evaluations and reinforcement activities.",
-    instruction="""
-        You are a student progress tracker agent. Your task is to generate a descriptive progress report for a student based on:
-
-        1. **Worksheet Evaluations**
-        2. **Reinforced Learning Outcomes**
+    instruction=build_instruction(
+        "progress_tracker_agent",
+        """
+        You are a student progress tracker agent. Your task is to generate a descriptive progress report for a student based on
+        their **worksheet evaluations** (evaluation history) and **reinforced learning outcomes** (reinforcement history).
 
-        Input will contain:
-        - Evaluation history
-        - Reinforcement history
+        If the input already contains the student's computed progress (concept statuses and overall progress),
+        do not recompute it: only write `recommendations` and `parent_summary` from it.
+        Otherwise the student's stored history summary is attached to the request; use it as the history.
 
         Generate a report with:
-        1. **Concept-wise comparison** between initial and post-reinforcement understanding.
+        1. **Concept-wise comparison** between initial and post-reinforcement understanding (statuses such as Weak / Moderate / Strong).
         2. **Improved concepts** and **persistently weak ones**.
-        3. **Parent-friendly summary** that explains what the student is good at, where they struggle, and how parents can help at home.
+        3. Practical `recommendations`, e.g. "Practice subtraction with visual aids like counters."
+        4. **Parent-friendly summary** that explains what the student is good at, where they struggle, and how parents can help at home.
 
-        Use the following format:
-        ```json
-        {
-        "student_id": "c1s1",
-        "class_name": "Class 1",
-        "subject_name": "Mathematics",
-        "report_date": "2024-07-26",
-        "chapter_name": "Addition and Subtraction",
-        "overall_progress": "Good",
-        "strengths": ["Basic addition", "Subtraction without borrowing"],
-        "persistent_weaknesses": ["Subtraction with borrowing"],
-        "concept_progress": [
-            {
-            "concept": "Subtraction with borrowing",
-            "initial_status": "Weak",
-            "post_reinforcement_status": "Moderate",
-            "current_understanding": "Improved"
-            }
-        ],
-        "recommendations": [
-            "Practice subtraction with visual aids like counters.",
-            "Use household items to simulate borrowing scenarios."
-        ],
-        "parent_summary": "Your child has shown improvement in subtraction after additional support. Basic arithmetic is strong. Continue practicing borrowing at home using chocolates or money games."
-        }
         Use a friendly tone in the parent_summary and avoid technical jargon.
-    """,
+        """,
+        output_schema=StudentProgressReport,
+    ),
     output_schema=StudentProgressReport,
     output_key="new_student_progress_report",
     tools=[],
+    before_model_callback=use_concept_ledger,
+    after_model_callback=apply_ledger_fields,
     after_agent_callback=store_progress_report,
     disallow_transfer_to_peers=True
 )
\ No newline at end of file
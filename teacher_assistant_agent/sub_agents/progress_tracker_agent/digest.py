@@ -0,0 +1,80 @@
+from typing import List
+
+from google.adk.agents.callback_context import CallbackContext
+from pydantic import BaseModel
+
+from teacher_assistant_agent import codec
+from teacher_assistant_agent.history import attach_student_history, request_target
+from teacher_assistant_agent.ledger import load_ledger, progress_digest
+from teacher_assistant_agent.model_io import latest_user_text, parse_json_object, replace_user_text, text_response
+
+
+class ProgressNarrative(BaseModel):
+    """The only part of a progress report the model writes when the concept ledger has the rest."""
+    recommendations: List[str]
+    parent_summary: str
+
+
+def use_concept_ledger(callback_context: CallbackContext, llm_request):
+    """
+    before_model_callback: build the report's deterministic fields from the
+    student's concept ledger and ask the model only for `recommendations` and
+    `parent_summary`, from a compact digest instead of the full history.
+    Without a ledger entry, the stored history summary is attached instead.
+    """
+    index, text = latest_user_text(llm_request)
+    if text is None:
+        return None
+    student_id, subject_name, chapter_name = request_target(text)
+    if not student_id:
+        return None
+    digest = progress_digest(load_ledger(student_id), chapter_name, subject_name)
+    if digest is None:
+        # No ledger for this chapter yet (e.g. history stored before it existed).
+        return attach_student_history(callback_context, llm_request)
+
+    report = {key: value for key, value in digest.items() if key not in ("evaluations", "reinforcements")}
+    callback_context.state["temp:progress_digest"] = report
+    compact = {
+        "student_id": digest["student_id"],
+        "class_name": digest["class_name"],
+        "subject_name": digest["subject_name"],
+        "chapter_name": digest["chapter_name"],
+        "worksheets_evaluated": digest["evaluations"],
+        "reinforcement_sessions": digest["reinforcements"],
+        "overall_progress": digest["overall_progress"],
+        "concept_progress": [
+            f"{item['concept']}: {item['initial_status']} -> {item['post_reinforcement_status']} ({item['current_understanding']})"
+            for item in digest["concept_progress"]
+        ],
+    }
+    replace_user_text(llm_request, index, (
+        f"{text}\n\n"
+        f"The student's progress has already been computed from their evaluation and reinforcement history:\n"
+        f"{codec.dumps(compact)}\n"
+        f"Return ONLY a JSON object with `recommendations` (list of strings) and `parent_summary` (string) "
+        f"based on this progress."
+    ))
+    llm_request.set_output_schema(ProgressNarrative)
+    return None
+
+
+def apply_ledger_fields(callback_context: CallbackContext, llm_response):
+    """
+    after_model_callback: complete the model's narrative with the ledger fields,
+    so the response validates as a full `StudentProgressReport`.
+    """
+    report = callback_context.state.get("temp:progress_digest")
+    if not report or not llm_response.content or not llm_response.content.parts:
+        return None
+    text = "".join(part.text or "" for part in llm_response.content.parts if not part.thought)
+    narrative = parse_json_object(text)
+    if narrative is None:
+        return None
+    callback_context.state["temp:progress_digest"] = None
+    # The ledger is authoritative for everything except the narrative fields.
+    return text_response(codec.dumps({
+        **report,
+        "recommendations": narrative.get("recommendations") or [],
+        "parent_summary": narrative.get("parent_summary") or "",
+    }))
@@ -0,0 +1,96 @@
+"""
+Progress report → medical flag pipeline.
+
+Every stored `StudentProgressReport` is handed straight to `medical_flag_agent`
+instead of relying on the root agent to transfer it. That saves a root model
+turn and no longer depends on the model remembering to do it.
+
+MEDICAL_FLAG_PIPELINE selects how:
+    inline      run the analysis before the progress report turn finishes (default)
+    background  return the progress report immediately and analyze it afterwards;
+                the session gets a "queued" medical_flag_report reference right
+                away, and `get_stored_artifact` reports it as pending until the
+                analysis has stored its result
+    off         only analyze reports when the teacher asks for it
+"""
+import asyncio
+import os
+from datetime import datetime
+
+from google.adk.agents.callback_context import CallbackContext
+
+from teacher_assistant_agent import codec
+from teacher_assistant_agent.invoke import run_agent
+from teacher_assistant_agent.registry import load_sub_agent
+from teacher_assistant_agent.state import ARTIFACT_KINDS, add_artifact_ref, append_history
+
+PIPELINE_MODES = ("inline", "background", "off")
+MEDICAL_FLAG_PIPELINE = os.environ.get("MEDICAL_FLAG_PIPELINE", "inline").lower()
+
+_background_tasks = set()
+
+
+async def flag_report(report: dict, user_id: str = "system") -> list:
+    """
+    Run `medical_flag_agent` on a validated progress report.
+
+    Returns:
+        list: The medical flag references its callback recorded (usually one).
+    """
+    from .agent import StudentProgressReport
+
+    report = codec.validate(StudentProgressReport, report)
+    run = await run_agent(load_sub_agent("medical_flag_agent"), report.model_dump_json(), user_id=user_id)
+    return run.state.get("medical_flag_report") or []
+
+
+async def _flag_in_background(report, user_id):
+    try:
+        refs = await flag_report(report, user_id)
+        print(f"Medical flag analysis for student {report.get('student_id')} finished ({len(refs)} report(s) stored).")
+    except Exception as e:
+        print(f"Medical flag analysis for student {report.get('student_id')} failed: {e}")
+
+
+async def run_medical_flag_stage(callback_context: CallbackContext, report: dict, mode: str = None):
+    """Hand a stored progress report to `medical_flag_agent` according to MEDICAL_FLAG_PIPELINE."""
+    mode = (mode or MEDICAL_FLAG_PIPELINE).lower()
+    if mode not in PIPELINE_MODES:
+        print(f"Unknown MEDICAL_FLAG_PIPELINE {mode!r}; using 'inline'.")
+        mode = "inline"
+    if mode == "off":
+        return
+
+    user_id = callback_context.user_id
+    if mode == "background":
+        task = asyncio.create_task(_flag_in_background(report, user_id))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+        student_id = report.get("student_id")
+        if student_id:
+            # The report is stored under the student's id from a separate session,
+            # so reference it here for the root agent to find once it is ready.
+            add_artifact_ref(callback_context.state, "medical_flag_report", {
+                "id": str(student_id),
+                "collection": ARTIFACT_KINDS["medical_flag_report"],
+                "student_id": student_id,
+                "status": "queued",
+                "queued_at": datetime.now().isoformat(timespec="microseconds"),
+            })
+        append_history(callback_context.state, "queue_medical_flag_analysis", student_id=student_id)
+        return
+
+    try:
+        refs = await flag_report(report, user_id)
+    except Exception as e:
+        print(f"Medical flag analysis for student {report.get('student_id')} failed: {e}")
+        return
+    for ref in refs:
+        add_artifact_ref(callback_context.state, "medical_flag_report", ref)
+    append_history(callback_context.state, "store_medical_flag_report", student_id=report.get("student_id"))
+
+
+async def wait_for_background_flags(timeout=None):
+    """Wait for background medical flag analyses started so far (e.g. before shutdown)."""
+    if _background_tasks:
+        await asyncio.wait(list(_background_tasks), timeout=timeout)
@@ -0,0 +1,249 @@
+"""
+Shared reinforcement items.
+
+The explanation, analogy and check question for "Subtraction with borrowing" in
+Class 1 do not depend on which student got it wrong, so generated
+`ReinforcementQuestion` items are kept per (grade, language, topic) in the
+`reinforcement_concepts` collection and reused across students.
+
+Each topic keeps up to REINFORCEMENT_CONCEPT_VARIANTS items. Until it has that
+many, requests for it still go to the model (and add a variant); after that,
+students are served the variants in rotation, so a class does not all get the
+identical question. A session whose weak areas are all cached costs no model
+call; otherwise the model only writes the topics that are missing.
+"""
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+
+from teacher_assistant_agent import codec
+from teacher_assistant_agent.cache import LRUCache
+from teacher_assistant_agent.history import normalize
+from teacher_assistant_agent.metrics import register_collector
+from teacher_assistant_agent.model_io import (
+    latest_user_text, parse_json_object, replace_user_text, text_outside_json, text_response,
+)
+from teacher_assistant_agent.storage import get_storage
+
+CONCEPT_COLLECTION = "reinforcement_concepts"
+REINFORCEMENT_CONCEPT_VARIANTS = int(os.environ.get("REINFORCEMENT_CONCEPT_VARIANTS", 3))
+REINFORCEMENT_CONCEPT_CACHE_SIZE = int(os.environ.get("REINFORCEMENT_CONCEPT_CACHE_SIZE", 2048))
+# Language of the explanations when the request does not name one.
+REINFORCEMENT_LANGUAGE = os.environ.get("REINFORCEMENT_LANGUAGE", "english")
+
+_GRADE = re.compile(r"\d{1,2}")
+# Explicit requests for newly written items. Only the teacher's words around the
+# evaluation JSON are checked, since its feedback often says "try a different method".
+_FRESH = re.compile(
+    r"\b(re-?generate|(new|fresh|different) (set|questions?|explanations?|analog(y|ies)|examples?|items?)"
+    r"|(don'?t|do not) reuse)\b",
+    re.IGNORECASE,
+)
+
+
+def concept_key(topic, grade, language) -> Optional[str]:
+    """Document id for a topic, e.g. "1__english__subtraction-with-borrowing"."""
+    topic = normalize(topic)
+    if not topic:
+        return None
+    return "__".join([normalize(grade) or "any", normalize(language) or "any", topic])
+
+
+def request_grade(class_name) -> str:
+    match = _GRADE.search(str(class_name or ""))
+    return match.group(0) if match else normalize(class_name)
+
+
+def weak_areas(evaluation: dict) -> list[str]:
+    """Weaknesses and retest areas of an evaluation, without duplicates."""
+    summary = evaluation.get("summary") or {}
+    areas = (summary.get("conceptual_weaknesses") or []) + (summary.get("suggested_retest_areas") or [])
+    seen, result = set(), []
+    for area in areas:
+        key = normalize(area)
+        if key and key not in seen:
+            seen.add(key)
+            result.append(str(area))
+    return result
+
+
+class ConceptCache:
+    """Reinforcement items per topic key, in an `LRUCache` in front of storage."""
+
+    def __init__(self, collection=CONCEPT_COLLECTION, variants=REINFORCEMENT_CONCEPT_VARIANTS,
+                 maxsize=REINFORCEMENT_CONCEPT_CACHE_SIZE):
+        self.collection = collection
+        self.variants = variants
+        self.memory = LRUCache(maxsize)
+        self._lock = threading.Lock()
+        self._served = {}  # key -> times served, for rotation
+        self._counters = {"sessions_served": 0, "sessions_topped_up": 0, "sessions_generated": 0,
+                          "items_reused": 0, "items_added": 0}
+
+    @property
+    def enabled(self):
+        return self.variants > 0 and self.memory.maxsize > 0
+
+    def _items(self, key) -> list:
+        items = self.memory.get(key)
+        if items is None:
+            try:
+                document = get_storage().get(self.collection, key) or {}
+            except Exception as e:
+                print(f"Error loading reinforcement concept {key}: {e}")
+                document = {}
+            items = document.get("items") or []
+            self.memory.put(key, items)
+        return items
+
+    def pick(self, key) -> Optional[dict]:
+        """
+        The next cached item for `key` in rotation, or None while the topic has
+        fewer than `variants` items (so the model adds another one).
+        """
+        with self._lock:
+            items = self._items(key)
+            if len(items) < self.variants:
+                return None
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+        return dict(items[served % len(items)])
+
+    def add(self, key, item: dict) -> bool:
+        """Store a generated item for `key`. Returns False if it was a duplicate or the topic is full."""
+        with self._lock:
+            items = list(self._items(key))
+            question = normalize(item.get("question"))
+            if len(items) >= self.variants or any(normalize(known.get("question")) == question for known in items):
+                return False
+            items.append(item)
+            self.memory.put(key, items)
+            get_storage().set(self.collection, key, {"key": key, "items": items, "updated_at": datetime.now().isoformat()})
+            self._counters["items_added"] += 1
+            return True
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "topics": len(self.memory), "variants": self.variants}
+
+
+concept_cache = ConceptCache()
+register_collector("reinforcement_concepts", concept_cache.stats)
+
+
+def serve_cached_concepts(callback_context: CallbackContext, llm_request):
+    """
+    before_model_callback: build the reinforcement session from cached items.
+
+    When every weak area of the evaluation in the request has a cached item, the
+    session is returned as the model's response. Otherwise the request is
+    narrowed to the missing topics; `merge_cached_concepts` merges the cached
+    items back in and caches the new ones.
+    """
+    if not concept_cache.enabled:
+        return None
+    index, text = latest_user_text(llm_request)
+    if text is None or _FRESH.search(text_outside_json(text)):
+        return None
+    evaluation = parse_json_object(text) or {}
+    areas = weak_areas(evaluation)
+    if not areas or not evaluation.get("student_id"):
+        return None
+
+    grade = request_grade(evaluation.get("class_name"))
+    language = evaluation.get("language") or REINFORCEMENT_LANGUAGE
+    keys = {area: concept_key(area, grade, language) for area in areas}
+    cached = {}
+    for area, key in keys.items():
+        item = concept_cache.pick(key) if key else None
+        if item is not None:
+            cached[area] = dict(item, topic=area)
+    missing = [area for area in areas if area not in cached]
+    callback_context.state["temp:reinforcement_concepts"] = {"areas": areas, "keys": keys, "cached": cached}
+
+    if not missing:
+        print(f"Serving reinforcement for {evaluation['student_id']} from {len(cached)} cached concept(s)")
+        concept_cache.count("sessions_served")
+        concept_cache.count("items_reused", len(cached))
+        return text_response(codec.dumps({
+            "student_id": str(evaluation["student_id"]),
+            "subject_name": evaluation.get("subject_name") or "",
+            "chapter_name": evaluation.get("chapter_name") or "",
+            "weak_areas": areas,
+            "reinforcement_date": datetime.now().strftime("%Y-%m-%d"),
+            "reinforcement_questions": [cached[area] for area in areas],
+        }))
+
+    if cached:
+        print(f"Reusing {len(cached)} cached concept(s); generating {len(missing)} for {evaluation['student_id']}")
+        replace_user_text(llm_request, index, (
+            f"{text}\n\n"
+            f"Explanations for {', '.join(cached)} are already prepared. "
+            f"Write `reinforcement_questions` ONLY for these weak areas, one each, with `topic` set to the area: "
+            f"{codec.dumps(missing)}. List all weak areas in `weak_areas`."
+        ))
+    return None
+
+
+def merge_cached_concepts(callback_context: CallbackContext, llm_response):
+    """
+    after_model_callback: cache the items the model generated and, when part of
+    the session came from the cache, return the merged session as the response.
+    Only items that validate as `ReinforcementQuestion` are cached.
+    """
+    from .agent import ReinforcementQuestion
+
+    selection = callback_context.state.get("temp:reinforcement_concepts")
+    if not selection or llm_response.partial or not llm_response.content or not llm_response.content.parts:
+        return None
+    areas, keys, cached = selection["areas"], selection["keys"], selection["cached"]
+    missing = [area for area in areas if area not in cached]
+    if not missing:
+        return None  # served from the cache
+    text = "".join(part.text or "" for part in llm_response.content.parts if not part.thought)
+    reinforcement = parse_json_object(text)
+    if reinforcement is None:
+        return None
+    callback_context.state["temp:reinforcement_concepts"] = None
+
+    generated = list(reinforcement.get("reinforcement_questions") or [])
+    wanted = {normalize(area) for area in missing}
+    by_topic = {normalize(item.get("topic")): item for item in generated}
+    unmatched = [item for item in generated if normalize(item.get("topic")) not in wanted]
+    items = {}
+    for area in missing:
+        item = by_topic.get(normalize(area)) or (unmatched.pop(0) if unmatched else None)
+        if item is None:
+            continue
+        items[area] = dict(item, topic=area)
+        try:
+            items[area] = codec.validate(ReinforcementQuestion, items[area]).model_dump()
+        except ValueError as e:
+            # Left in this session for the output schema to reject, but never cached.
+            print(f"Not caching invalid reinforcement item for {area}: {e}")
+            continue
+        if keys.get(area):
+            try:
+                concept_cache.add(keys[area], items[area])
+            except Exception as e:
+                print(f"Error caching reinforcement concept {area}: {e}")
+
+    if not cached:
+        concept_cache.count("sessions_generated")
+        return None
+    concept_cache.count("sessions_topped_up")
+    concept_cache.count("items_reused", len(cached))
+    merged = {**cached, **items}
+    return text_response(codec.dumps(dict(
+        reinforcement,
+        weak_areas=areas,
+        reinforcement_questions=[merged[area] for area in areas if area in merged],
+    )))
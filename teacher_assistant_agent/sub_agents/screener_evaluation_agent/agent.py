@@ -3,8 +3,8 @@ from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
 from google.adk.tools.tool_context import ToolContext
 from google.adk.agents.callback_context import CallbackContext
-from datetime import datetime
-from teacher_assistant_agent.firestore import db
+from teacher_assistant_agent.prompts import build_instruction
+from teacher_assistant_agent.state import append_history, record_artifact
 
 class ScreeningResults(BaseModel):
     confidence: str = Field(description="Confidence level (e.g., 'low', 'medium', 'high').")
@@ -28,61 +28,39 @@ class PsychProfileResult(BaseModel):
 
 def store_psych_profile(callback_context: CallbackContext) -> dict:
     """
-    Store the psych profile of a student in the teacher's shared state.
-    Matches student by ID and updates their psych_profile field.
+    Store the psych profile of a student and keep a reference to it in the teacher's shared state.
     """
     # Get the profile data from the agent's output
-    profile_data = callback_context.state.get("new_psych_profile")
-    student_id = profile_data.get("student_id")
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    print(f"DEBUG - Storing profile for student {student_id} at {current_time}")
-    print(f"DEBUG - Profile data: {profile_data}")
-
-    # Get the current state
-    psych_profile = callback_context.state.get("psych_profile", []) # Initialize as empty list if not present
     new_psyc_profile = callback_context.state.get("new_psych_profile")
+    if not new_psyc_profile:
+        print("No psych profile found in state.")
+        return
 
-    doc_ref = db.collection("screening_profile").document(f"{new_psyc_profile["student_id"]}")
-    if new_psyc_profile:
-        doc_ref.set(new_psyc_profile)
-        psych_profile.append(new_psyc_profile)
+    student_id = new_psyc_profile.get("student_id")
+    print(f"DEBUG - Storing profile for student {student_id}")
 
-    callback_context.state["psych_profile"] = psych_profile
+    record_artifact(callback_context.state, "psych_profile", student_id, new_psyc_profile, summary={
+        "student_id": student_id,
+        "class_name": new_psyc_profile.get("class_name"),
+        "evaluation_date": new_psyc_profile.get("evaluation_date"),
+    }, schema=PsychProfileResult)
     callback_context.state["new_psych_profile"] = None  # Clear after updating
 
-    history = callback_context.state.get("interaction_history", [])
-    history.append({
-        "action": "store_profile_evaluation",
-        "timestamp": current_time
-    })
-    callback_context.state["interaction_history"] = history
+    append_history(callback_context.state, "store_profile_evaluation")
 
 
 screener_evaluation_agent = LlmAgent(
     name="screener_evaluation_agent",
     model="gemini-2.0-flash", # You can keep flash here if it's just for text generation
     description="Evaluates student responses to psychological screenings and generates a psych profile.",
-    instruction="""
-        You are a profiling expert that:
-            1. Analyzes student responses to psychological screenings
-            2. Generates a psych profile with 5 key metrics
-            3. Provides actionable follow-up recommendations
-            4. Formats output for automatic state updates
+    instruction=build_instruction(
+        "screener_evaluation_agent",
+        """
+        You are a profiling expert that analyzes student responses to psychological screenings,
+        generates a psych profile with 5 key metrics and provides actionable follow-up recommendations.
 
-        **TASK: EVALUATING STUDENT RESPONSES**
-
-        Your task is to analyze student responses to psychological screening questions.
         Expect the input in the format:
-        {
-          "student_id": "S101",
-          "class_name": "Class 6",
-          "answers": [
-            {"question": "How often do you feel nervous in a classroom?", "answer": "Sometimes"},
-            {"question": "What do you do when you feel stressed before exams?", "answer": "I take deep breaths and listen to music."},
-            {"question": "When I feel sad, I usually ________.", "answer": "talk to my parents."}
-          ]
-        }
+        {"student_id": "S101", "class_name": "Class 6", "answers": [{"question": "How often do you feel nervous in a classroom?", "answer": "Sometimes"}]}
 
         **GUIDELINES FOR EVALUATION:**
         1. Evaluate the answers for psychological markers such as:
@@ -91,21 +69,13 @@ screener_evaluation_agent = LlmAgent(
             - **Focus:** Ability to concentrate and stay on task.
             - **Emotional Regulation:** How well they manage their feelings.
             - **Resilience:** Their ability to bounce back from difficulties.
-        2. Assign a qualitative level (e.g., "low", "medium", "high") for each marker.
-        3. Suggest actionable follow-up recommendations that are supportive and constructive.
+        2. Assign a qualitative level ("low", "medium", "high") for each marker.
+        3. Suggest specific, actionable follow-up recommendations that are supportive and constructive.
         4. Your evaluation should be age-appropriate, insightful, and supportive — never judgmental.
-
-        OUTPUT REQUIREMENTS:
-            - Must be valid JSON matching PsychProfileResult schema
-            - Include current date in evaluation_date
-            - Follow-up suggestions should be specific and actionable
-            - Never include explanatory text outside the JSON
-                
-        **IMPORTANT: Your final response MUST be a valid JSON object matching the `PsychProfileResult` schema.**
-        DO NOT include any explanations or additional text outside the JSON response.
-        You are not to call any tools directly. Your only job is to produce the JSON output.
-        The parent agent (`teacher_assistant_agent`) will handle storing the output.
-    """,
+        5. Use the current date (YYYY-MM-DD) as `evaluation_date`.
+        """,
+        output_schema=PsychProfileResult,
+    ),
     output_schema=PsychProfileResult,
     output_key="new_psych_profile",
     tools=[], # FIX: This MUST be empty
@@ -4,8 +4,9 @@ from typing import List, Optional
 from pydantic import BaseModel, Field
 from google.adk.tools.tool_context import ToolContext
 from google.adk.agents.callback_context import CallbackContext
-from datetime import datetime
-from teacher_assistant_agent.firestore import db
+from teacher_assistant_agent.prompts import build_instruction
+from teacher_assistant_agent.state import append_history, record_artifact
+from .bank import complete_question_set, serve_from_bank
 
 
 class Question(BaseModel):
@@ -23,84 +24,56 @@ class QuestionSet(BaseModel):
 
 def update_questions_set(callback_context: CallbackContext): # Removed the return type hint as it's not expected to return a structured dict
     """
-    Update the existing questions set with new questions.
+    Store newly generated questions and add a reference to them to `state['questions_set']`.
     
     Args:
         callback_context (CallbackContext): The context object containing agent state.
     """
-
-    # doc_ref = db.collection("users").document("alovelace")
-    # doc_ref.set({"first": "Ada", "last": "Lovelace", "born": 1815})
-    # print(f"{callback_context.state} Calling update_questions_set")
-    questions_set = callback_context.state.get("questions_set", []) # Initialize as empty list if not present
     new_questions_set_data = callback_context.state.get("new_questions_set")
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    print(f"Current questions set: {questions_set}")
-    print(f"New questions to add: {new_questions_set_data}")
 
-    doc_ref = db.collection("questions_set").document(f"{new_questions_set_data["question_set_title"]}")
     if new_questions_set_data:
-        # Ensure new_questions_set_data is a QuestionSet object or convert it
-        # Since output_key="new_questions_set" stores the Pydantic object, we can append directly
-        doc_ref.set(new_questions_set_data)
-        questions_set.append(new_questions_set_data)
+        # Add questions reused from the question bank and bank the new ones.
+        new_questions_set_data = complete_question_set(callback_context, new_questions_set_data)
+        title = new_questions_set_data["question_set_title"]
+        print(f"Storing question set: {title}")
+        # The full set goes to storage; state only keeps the title and size.
+        record_artifact(callback_context.state, "questions_set", title, new_questions_set_data, summary={
+            "question_set_title": title,
+            "question_count": len(new_questions_set_data.get("questions", [])),
+        }, schema=QuestionSet)
     
-    callback_context.state["questions_set"] = questions_set
     callback_context.state["new_questions_set"] = None  # Clear after updating
-    print(f"Updated questions set: {questions_set}")
-    
-    history = callback_context.state.get("interaction_history", [])
-    history.append({
-        "action": "store_question_set",
-        "timestamp": current_time
-    })
-    callback_context.state["interaction_history"] = history
+    append_history(callback_context.state, "store_question_set")
     # The after_agent_callback should not return values that the framework
     # tries to validate as events or agent output. Its purpose is to
     # perform side effects, like updating the state.
-    # Therefore, remove the return statement.
-    # return {
-    #     "status": "success",
-    #     "message": f"Question set stored successfully.",
-    #     "timestamp": current_time
-    # }
+
 
 screener_questions_agent = Agent(
     name="screener_questions_agent",
     model="gemini-2.0-flash",
     description="An AI agent that generates psychological screening questions for students based on class and age.",
-    instruction="""You are a specialized agent that generates psychological screening questions for students based on their class and age
-    
-        You will help user in generating psychological screening questions for students in a specific class and age group.
-        
-        Use `research_agent` tool to find relevant information about psychological screening questions.
+    instruction=build_instruction(
+        "screener_questions_agent",
+        """
+        You are a specialized agent that generates psychological screening questions for students in a specific class and age group.
 
         **GUIDELINES FOR GENERATING QUESTIONS:**
-        1. Generate questions based on the class level provided (e.g., Grade 6, Grade 9)..
+        1. Generate questions based on the class level provided (e.g., Grade 6, Grade 9).
         2. Mix the following question formats:
             - **MCQ** (Multiple Choice Questions): Provide a list of options.
             - **QA** (Short Descriptive Answers): Open-ended questions.
             - **FILL_BLANK** (Fill-in-the-blank): A sentence with a blank.
         3. Focus on general mental well-being, social-emotional learning, and common developmental aspects, NOT subject-specific content.
         4. Ensure questions are insightful, supportive, and non-judgmental.
-
-         IMPORTANT: Always return your response as a JSON object with the following structure:
-        {
-            "question_set_title": "Descriptive title for the question set",
-            "questions": [
-                {
-                "type": "Question format (MCQ/QA/FILL_BLANK)",
-                "question": "The question text",
-                "options": ["Only for MCQ", "List of choices"] 
-                }
-            ]
-        }
-        **After generating the question set, acknowledge that the questions have been generated and inform the user they have been saved.
-    """,
+        5. `options` is only set for MCQ questions.
+        """,
+        output_schema=QuestionSet,
+    ),
     output_schema=QuestionSet,
     output_key="new_questions_set",
     tools=[],
+    before_model_callback=serve_from_bank,
     after_agent_callback=update_questions_set,
     disallow_transfer_to_peers=True,
 )
\ No newline at end of file
@@ -0,0 +1,287 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+
+from teacher_assistant_agent import codec
+from teacher_assistant_agent.metrics import register_collector
+from teacher_assistant_agent.model_io import latest_user_text, replace_user_text, text_response
+from teacher_assistant_agent.storage import get_storage
+
+BANK_COLLECTION = "screening_question_bank"
+SEED_PATH = os.path.join(os.path.dirname(__file__), "questions_set.json")
+QUESTION_TYPES = ("MCQ", "QA", "FILL_BLANK")
+# How long a process serves a band's pool before reloading it, to pick up
+# questions other instances added.
+QUESTION_BANK_REFRESH_SECONDS = float(os.environ.get("QUESTION_BANK_REFRESH_SECONDS", 300))
+
+# Question mix used when the teacher does not ask for specific numbers.
+DEFAULT_MIX = {"MCQ": 4, "QA": 3, "FILL_BLANK": 3}
+
+# Screening questions are written for a developmental stage rather than a single
+# grade, so sets are pooled per band.
+GRADE_BANDS = [(1, 2), (3, 5), (6, 8), (9, 10), (11, 12)]
+
+_GRADE = re.compile(r"\b(?:class|grade|std\.?|standard)\s*[-:]?\s*(\d{1,2})\b|\b(\d{1,2})(?:st|nd|rd|th)\s+(?:class|grade|standard|std)\b", re.IGNORECASE)
+_AGE = re.compile(r"\b(?:age[ds]?\s*(\d{1,2})|(\d{1,2})\s*(?:-\s*)?(?:years?|yrs?)(?:\s*-?\s*old)?)\b", re.IGNORECASE)
+_TOTAL = re.compile(r"\b(\d{1,2})\s+(?:screening\s+|psychological\s+)?questions\b", re.IGNORECASE)
+_TYPE_COUNTS = {
+    "MCQ": re.compile(r"\b(\d{1,2})\s+(?:mcqs?|multiple[- ]choice)", re.IGNORECASE),
+    "QA": re.compile(r"\b(\d{1,2})\s+(?:qa|open[- ]ended|descriptive|short answer)", re.IGNORECASE),
+    "FILL_BLANK": re.compile(r"\b(\d{1,2})\s+(?:fill[- ]in[- ]the[- ]blanks?|fill[_ ]blanks?|blanks)", re.IGNORECASE),
+}
+# Explicit requests to skip the bank; a plain "generate new screening questions"
+# is still served from it.
+_FRESH = re.compile(
+    r"\b(re-?generate|fresh (set|batch|questions)|new set of (\w+ )?questions|different (set|questions)"
+    r"|(don'?t|do not) reuse|without (using )?the (question )?bank)\b",
+    re.IGNORECASE,
+)
+
+
+def grade_band(grade: int) -> Optional[str]:
+    for low, high in GRADE_BANDS:
+        if low <= grade <= high:
+            return f"{low}-{high}"
+    return None
+
+
+def parse_grade(text: str) -> Optional[int]:
+    """Grade from "class 6" / "7th grade", or estimated from the students' age."""
+    match = _GRADE.search(text)
+    if match:
+        return int(match.group(1) or match.group(2))
+    match = _AGE.search(text)
+    if match:
+        age = int(match.group(1) or match.group(2))
+        return min(max(age - 5, 1), 12)
+    return None
+
+
+def requested_mix(text: str) -> dict:
+    """How many questions of each type the teacher asked for."""
+    mix = {
+        question_type: int(match.group(1))
+        for question_type, pattern in _TYPE_COUNTS.items()
+        if (match := pattern.search(text))
+    }
+    if mix:
+        return mix
+    match = _TOTAL.search(text)
+    if not match:
+        return dict(DEFAULT_MIX)
+    total = int(match.group(1))
+    base = sum(DEFAULT_MIX.values())
+    mix = {question_type: total * count // base for question_type, count in DEFAULT_MIX.items()}
+    for question_type in QUESTION_TYPES[:total - sum(mix.values())]:
+        mix[question_type] += 1
+    return mix
+
+
+def _question_key(question: dict) -> str:
+    return re.sub(r"[^\w]+", " ", str(question.get("question", "")).lower()).strip()
+
+
+class QuestionBank:
+    """
+    Screening questions indexed by grade band and question type.
+
+    Every generated question is stored as its own document, keyed by band and
+    question text, so instances adding to the same band never overwrite each
+    other. Requests for a band are answered from its pool when it has enough
+    questions of each requested type. Pools are cached per process and
+    reloaded after a write or QUESTION_BANK_REFRESH_SECONDS.
+    """
+
+    def __init__(self, collection=BANK_COLLECTION, seed_path=SEED_PATH, refresh_seconds=QUESTION_BANK_REFRESH_SECONDS):
+        self.collection = collection
+        self.seed_path = seed_path
+        self.refresh_seconds = refresh_seconds
+        self._bands = {}  # band -> (pool, loaded at, whether it came from storage)
+        self._lock = threading.Lock()
+        self._counters = {"served": 0, "topped_up": 0, "generated": 0, "questions_reused": 0}
+
+    def _seed(self, band):
+        """Questions from the bundled sample sets whose title names a grade in `band`."""
+        try:
+            with open(self.seed_path) as f:
+                sets = json.load(f)
+        except (OSError, ValueError):
+            return []
+        questions = []
+        for question_set in sets if isinstance(sets, list) else [sets]:
+            grade = parse_grade(question_set.get("question_set_title", ""))
+            if grade is not None and grade_band(grade) == band:
+                questions.extend(question_set.get("questions", []))
+        return questions
+
+    def _stored(self, band) -> list:
+        """The band's questions in storage, oldest first."""
+        documents = [data for _, data in get_storage().query(self.collection, filters=[("band", "==", band)])]
+        questions = []
+        for data in sorted(documents, key=lambda data: data.get("updated_at") or 0):
+            if isinstance(data.get("questions"), list):
+                questions.extend(data["questions"])  # one document per band, as written before
+            elif isinstance(data.get("question"), dict):
+                questions.append(data["question"])
+        return questions
+
+    def _pool(self, band) -> dict:
+        """{question type: [questions]} for `band`, reloaded when stale."""
+        cached = self._bands.get(band)
+        if cached is not None and time.monotonic() - cached[1] < self.refresh_seconds:
+            return cached[0]
+        try:
+            stored = self._stored(band)
+        except Exception as e:
+            print(f"Error loading question bank for grades {band}: {e}")
+            stored = []
+        pool = {question_type: [] for question_type in QUESTION_TYPES}
+        seen = set()
+        for question in stored or self._seed(band):
+            key = _question_key(question)
+            if key and key not in seen:
+                seen.add(key)
+                pool.setdefault(str(question.get("type", "")).upper(), []).append(question)
+        self._bands[band] = (pool, time.monotonic(), bool(stored))
+        return pool
+
+    def _document_id(self, band, question) -> str:
+        return f"{band}__{hashlib.sha1(_question_key(question).encode('utf-8')).hexdigest()[:16]}"
+
+    def select(self, band: str, mix: dict) -> tuple[list, dict]:
+        """
+        Pick questions for `mix` from the band's pool.
+
+        Returns:
+            tuple: (`questions` found in the bank, `missing` {type: count} still to generate).
+        """
+        with self._lock:
+            pool = self._pool(band)
+            questions, missing = [], {}
+            for question_type, count in mix.items():
+                available = pool.get(question_type, [])[:count]
+                questions.extend(available)
+                if count > len(available):
+                    missing[question_type] = count - len(available)
+            return questions, missing
+
+    def add(self, band: str, questions: list) -> int:
+        """Store questions the band does not have yet. Returns how many were new."""
+        with self._lock:
+            pool = self._pool(band)
+            from_storage = self._bands[band][2]
+            known = {_question_key(question) for entries in pool.values() for question in entries}
+            new = []
+            for question in questions:
+                key = _question_key(question)
+                if key and key not in known:
+                    known.add(key)
+                    new.append(question)
+            if new:
+                # The seed questions are served too; store them with the band's first additions.
+                to_store = new if from_storage else [q for entries in pool.values() for q in entries] + new
+                storage = get_storage()
+                now = time.time()
+                for index, question in enumerate(to_store):
+                    storage.set(self.collection, self._document_id(band, question), {
+                        "band": band,
+                        "type": str(question.get("type", "")).upper(),
+                        "question": question,
+                        "updated_at": now + index * 1e-6,  # keeps the pool's order on reload
+                    })
+                # Reload on the next use, which also picks up other instances' additions.
+                self._bands.pop(band, None)
+            return len(new)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._counters,
+                "bands": {
+                    band: {question_type: len(entries) for question_type, entries in pool.items()}
+                    for band, (pool, _, _) in self._bands.items()
+                },
+            }
+
+
+question_bank = QuestionBank()
+register_collector("question_bank", question_bank.stats)
+
+
+def _title(grade):
+    return f"Grade {grade} Student Well-being Check"
+
+
+def serve_from_bank(callback_context: CallbackContext, llm_request):
+    """
+    before_model_callback: answer screening requests from the question bank.
+
+    A full match is returned as the model's response. A partial match rewrites
+    the request so the model only writes the missing questions; the bank's
+    questions are merged back in `update_questions_set`.
+    """
+    index, text = latest_user_text(llm_request)
+    if text is None:
+        return None
+    grade = parse_grade(text)
+    band = grade_band(grade) if grade is not None else None
+    if band is None:
+        return None
+
+    callback_context.state["temp:question_bank"] = {"band": band, "grade": grade, "questions": []}
+    if _FRESH.search(text):
+        return None
+
+    mix = requested_mix(text)
+    questions, missing = question_bank.select(band, mix)
+    if not questions:
+        return None
+
+    if not missing:
+        print(f"Serving {len(questions)} screening questions for grades {band} from the question bank")
+        question_bank.count("served")
+        question_bank.count("questions_reused", len(questions))
+        callback_context.state["temp:question_bank"] = {"band": band, "grade": grade, "questions": [], "served": True}
+        return text_response(codec.dumps({"question_set_title": _title(grade), "questions": questions}))
+
+    print(f"Reusing {len(questions)} banked questions for grades {band}; generating {sum(missing.values())} more")
+    callback_context.state["temp:question_bank"] = {"band": band, "grade": grade, "questions": questions}
+    wanted = ", ".join(f"{count} {question_type}" for question_type, count in missing.items())
+    replace_user_text(llm_request, index, (
+        f"{text}\n\n"
+        f"The question bank already has these questions for this grade:\n{codec.dumps(questions)}\n"
+        f"Generate ONLY {wanted} additional question(s) that do not repeat them. "
+        f"Return just the new questions in `questions`."
+    ))
+    return None
+
+
+def complete_question_set(callback_context: CallbackContext, question_set: dict) -> dict:
+    """Merge banked questions into a generated set and add the new questions to the bank."""
+    selection = callback_context.state.get("temp:question_bank")
+    callback_context.state["temp:question_bank"] = None
+    if not selection or selection.get("served"):
+        return question_set
+
+    generated = question_set.get("questions") or []
+    question_bank.add(selection["band"], generated)
+    if selection["questions"]:
+        question_bank.count("topped_up")
+        question_bank.count("questions_reused", len(selection["questions"]))
+        known = {_question_key(question) for question in selection["questions"]}
+        question_set = dict(question_set, questions=selection["questions"] + [
+            question for question in generated if _question_key(question) not in known
+        ])
+    else:
+        question_bank.count("generated")
+    return question_set
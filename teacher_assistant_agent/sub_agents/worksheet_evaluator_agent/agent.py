@@ -1,7 +1,12 @@
 from google.adk.agents import Agent
-from datetime import datetime
 from google.adk.agents.callback_context import CallbackContext
-from teacher_assistant_agent.firestore import db
+from teacher_assistant_agent import codec
+from teacher_assistant_agent.history import versioned
+from teacher_assistant_agent.ledger import record_evaluation
+from teacher_assistant_agent.model_io import latest_json_payload, replace_user_text
+from teacher_assistant_agent.prompts import build_instruction
+from teacher_assistant_agent.state import append_history, record_artifact
+from .grader import merge_feedback, split_submission
 from pydantic import BaseModel, Field
 from typing import List, Optional, Literal
 
@@ -29,114 +34,91 @@ class WorksheetEvaluation(BaseModel):
     answer_feedback: List[AnswerFeedback]
 
 
+def grade_objective_answers(callback_context: CallbackContext, llm_request):
+    """
+    Grade MCQ and FILL_BLANK answers locally before the model is called.
+
+    The submission in the request is replaced by one that only contains the
+    subjective (QA) answers plus an `objective_results` digest, so the model only
+    writes feedback for QA items and the summary.
+    """
+    index, submission = latest_json_payload(
+        llm_request, lambda payload: isinstance(payload.get("answers"), list)
+    )
+    if submission is None or "objective_results" in submission:
+        return None
+
+    model_submission, objective_feedback = split_submission(submission)
+    if not any(objective_feedback):
+        return None
+
+    callback_context.state["temp:objective_grading"] = {
+        "answers": submission["answers"],
+        "feedback": objective_feedback,
+    }
+    replace_user_text(llm_request, index, codec.dumps(model_submission))
+    return None
+
+
 def update_evaluation_result(callback_context: CallbackContext):
-    worksheet_evaluation = callback_context.state.get("worksheet_evaluation", [])
     evaluation = callback_context.state.get("new_worksheet_evaluation")
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     if not evaluation:
         print("No evaluation data found in state.")
         return
 
-    # doc_id = f"{evaluation['student_id']}_{evaluation['subject_name']}_{evaluation['chapter_name']}_eval"
-    doc_ref = db.collection("worksheet_evaluations").document(evaluation['student_id'])
-    if evaluation:
-        doc_ref.set(evaluation)
-        worksheet_evaluation.append(evaluation)
-
-    history = callback_context.state.get("interaction_history", [])
-    history.append({
-        "action": "store_worksheet_evaluation",
-        "timestamp": current_time
-    })
-
-    callback_context.state["interaction_history"] = history
-    callback_context.state["worksheet_evaluation"] = worksheet_evaluation
+    grading = callback_context.state.get("temp:objective_grading")
+    if grading:
+        # Put the locally graded MCQ/FILL_BLANK feedback back alongside the model's QA feedback.
+        evaluation["answer_feedback"] = merge_feedback(
+            grading["answers"], grading["feedback"], evaluation.get("answer_feedback")
+        )
+        callback_context.state["temp:objective_grading"] = None
+
+    doc_id, evaluation = versioned("worksheet_evaluations", evaluation)
+    record_artifact(callback_context.state, "worksheet_evaluation", doc_id, evaluation, summary={
+        "student_id": evaluation['student_id'],
+        "subject_name": evaluation.get("subject_name"),
+        "chapter_name": evaluation.get("chapter_name"),
+        "overall_understanding": evaluation.get("summary", {}).get("overall_understanding"),
+    }, schema=WorksheetEvaluation)
+
+    try:
+        record_evaluation(evaluation, doc_id)
+    except Exception as e:
+        print(f"Error updating concept ledger: {e}")
+
+    append_history(callback_context.state, "store_worksheet_evaluation")
     callback_context.state["new_worksheet_evaluation"] = None
 
+
 worksheet_evaluator_agent = Agent(
     name="worksheet_evaluator_agent",
     model="gemini-2.0-flash",
     description="Evalates student answers to a worksheet and provides analysis on understanding and concept mastery.",
-    instruction="""
+    instruction=build_instruction(
+        "worksheet_evaluator_agent",
+        """
         You are an evaluator assistant that analyzes student-submitted worksheet answers.
 
-        Given:
-        - A list of questions
-        - Student answers
-        - Expected answers
+        Expect the input in the format:
+        {"student_id": "c1s1", "class_name": "Class 1", "subject_name": "Mathematics", "chapter_name": "Addition and Subtraction", "evaluation_date": "2024-07-26",
+         "answers": [{"question": "What is 5 + 3?", "question_type": "MCQ", "student_answer": "8", "expected_answer": "8"}]}
 
         Your job:
-        1. Compare student answer with the expected answer:
-            Expect the input in the format:
-            {
-                "student_id": "c1s1",
-                "class_name": "Class 1",
-                "subject_name": "Mathematics",
-                "chapter_name": "Addition and Subtraction",
-                "evaluation_date": "2024-07-26",
-                "answers": [
-                    {
-                    "question": "What is 5 + 3?",
-                    "question_type": "MCQ",
-                    "student_answer": "8",
-                    "expected_answer": "8"
-                    },
-                    {
-                    "question": "7 - __ = 4",
-                    "question_type": "FILL_BLANK",
-                    "student_answer": "3",
-                    "expected_answer": "3"
-                    },
-                    {
-                    "question": "Explain a time when you solved a difficult math problem. What helped you stay confident?",
-                    "question_type": "QA",
-                    "student_answer": "I asked my teacher and practiced more.",
-                    "expected_answer": "Explanation showing help-seeking and persistence"
-                    }
-                ]
-            }
-
+        1. Compare each student answer with the expected answer:
             - For **MCQ** and **FILL_BLANK**, mark it correct or incorrect.
             - For **QA** (subjective), assess the **depth and relevance**. If the answer shows effort or aligns with expected reasoning, mark it with `is_correct: null` and give a thoughtful feedback.
-
+            - If the input contains `objective_results`, its MCQ and FILL_BLANK answers were already graded and removed from `answers`. Return `answer_feedback` only for the answers that remain, and use `objective_results` (number correct and the incorrect items) when writing the `summary`.
         2. Provide detailed feedback for each question under `answer_feedback`.
-
-        3. Create an overall evaluation `summary`:
-            - `overall_understanding`: Good / Average / Needs Improvement
-            - `conceptual_strengths`: List based on observed patterns
-            - `conceptual_weaknesses`: Same as above
-            - `chapter_coverage`: Fully covered / Partially covered / Poor
-            - `suggested_retest_areas`: List concepts or topics where the student needs a retest (only if any conceptual weakness is detected)
-        
-        **Return JSON in the following format:**
-        ```json
-        {
-        "student_id": "c1s1",
-        "class_name": "Class 1",
-        "subject_name": "Mathematics",
-        "chapter_name": "Addition and Subtraction",
-        "evaluation_date": "2024-07-26",
-        "summary": {
-            "overall_understanding": "Average",
-            "conceptual_strengths": ["Basic addition"],
-            "conceptual_weaknesses": ["Borrowing in subtraction"],
-            "chapter_coverage": "Partially covered",
-            "suggested_retest_areas": ["Subtraction with borrowing"]
-        },
-        "answer_feedback": [
-            {
-            "question": "What is 5 + 3?",
-            "question_type": "MCQ",
-            "is_correct": true,
-            "feedback": "Correct answer."
-            }
-        ]
-        }
-    """,
+        3. Create an overall evaluation `summary`: `overall_understanding`, `conceptual_strengths` and `conceptual_weaknesses` based on observed patterns, `chapter_coverage`, and `suggested_retest_areas` (only if any conceptual weakness is detected).
+        """,
+        output_schema=WorksheetEvaluation,
+    ),
     output_schema=WorksheetEvaluation,
     output_key="new_worksheet_evaluation",
     tools=[],
+    before_model_callback=grade_objective_answers,
     after_agent_callback=update_evaluation_result,
     disallow_transfer_to_peers=True,
 )
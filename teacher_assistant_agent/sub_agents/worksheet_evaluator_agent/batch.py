@@ -0,0 +1,154 @@
+"""
+Class-wide worksheet evaluation.
+
+Evaluates every student's submission concurrently instead of one chat turn per
+student, so grading a class takes about as long as the slowest evaluation.
+
+Usage:
+    python -m teacher_assistant_agent.sub_agents.worksheet_evaluator_agent.batch submissions.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from teacher_assistant_agent import codec
+from teacher_assistant_agent.invoke import run_agent
+from teacher_assistant_agent.metrics import instrument
+from teacher_assistant_agent.resilience import resilient
+from teacher_assistant_agent.state import load_artifact
+from teacher_assistant_agent.storage import get_storage
+from .agent import AnswerFeedback, WorksheetEvaluation, worksheet_evaluator_agent
+
+BATCH_CONCURRENCY = int(os.environ.get("WORKSHEET_BATCH_CONCURRENCY", 8))
+BATCH_RETRIES = int(os.environ.get("WORKSHEET_BATCH_RETRIES", 2))
+
+
+@dataclass
+class BatchEvaluationResult:
+    student_id: str
+    evaluation: Optional[WorksheetEvaluation]
+    error: Optional[str]
+    attempts: int
+    latency_seconds: float
+
+
+def _stored_since(student_id, since) -> bool:
+    """Whether an evaluation for `student_id` was stored at or after the ISO timestamp `since`."""
+    return bool(get_storage().query(
+        "worksheet_evaluations",
+        filters=[("student_id", "==", student_id), ("updated_at", ">=", since)],
+        limit=1, fields=["updated_at"],
+    ))
+
+
+def _result(run, student_id, attempt, start):
+    evaluation = codec.validate_json(WorksheetEvaluation, run.text)
+    # The model only returns feedback for QA answers; the stored evaluation
+    # also has the locally graded MCQ/FILL_BLANK feedback.
+    refs = run.state.get("worksheet_evaluation") or []
+    stored = load_artifact(refs[-1]) if refs else None
+    if stored and stored.get("answer_feedback"):
+        evaluation.answer_feedback = [
+            codec.validate(AnswerFeedback, {"is_correct": None, **feedback})
+            for feedback in stored["answer_feedback"]
+        ]
+    return BatchEvaluationResult(student_id, evaluation, None, attempt, time.perf_counter() - start)
+
+
+async def _evaluate_one(submission, semaphore, retries, agent):
+    """
+    Evaluate one submission, retrying failures up to `retries` times.
+
+    Only failures before the evaluation was stored are retried: a retry after
+    `update_evaluation_result` ran would store a second version and count the
+    evaluation in the concept ledger twice.
+    """
+    student_id = str(submission.get("student_id"))
+    start = time.perf_counter()
+    error = None
+    attempt = 0
+    async with semaphore:
+        for attempt in range(1, retries + 2):
+            attempt_start = datetime.now().isoformat(timespec="microseconds")
+            run = None
+            try:
+                run = await run_agent(agent, codec.dumps(submission), user_id=student_id)
+                return _result(run, student_id, attempt, start)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                print(f"Evaluation for {student_id} failed (attempt {attempt}): {error}")
+                stored = (run.state.get("worksheet_evaluation") if run is not None
+                          else await asyncio.to_thread(_stored_since, student_id, attempt_start))
+                if stored:
+                    break
+                if attempt <= retries:
+                    await asyncio.sleep(min(0.5 * 2 ** (attempt - 1), 8.0) * random.uniform(0.5, 1.5))
+    return BatchEvaluationResult(student_id, None, error, attempt, time.perf_counter() - start)
+
+
+async def evaluate_class(
+    submissions: list[dict],
+    concurrency: int = BATCH_CONCURRENCY,
+    retries: int = BATCH_RETRIES,
+    agent=worksheet_evaluator_agent,
+) -> AsyncIterator[BatchEvaluationResult]:
+    """
+    Evaluate a whole class's worksheet submissions concurrently.
+
+    Args:
+        submissions (list[dict]): One entry per student, each in the input format
+            documented in `worksheet_evaluator_agent`'s instruction.
+        concurrency (int): Maximum number of evaluations in flight.
+        retries (int): Extra attempts per submission after a failure.
+
+    Yields:
+        BatchEvaluationResult: One per submission, in completion order.
+    """
+    instrument(resilient(agent))
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    tasks = [
+        asyncio.create_task(_evaluate_one(submission, semaphore, retries, agent))
+        for submission in submissions
+    ]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Evaluations are stored by `update_evaluation_result` through the batched
+        # writer; make sure the class's writes are committed before returning.
+        await asyncio.to_thread(get_storage().flush)
+
+
+async def _main(path, concurrency, retries):
+    with open(path) as f:
+        submissions = json.load(f)
+    if isinstance(submissions, dict):
+        submissions = submissions.get("submissions", [])
+
+    start = time.perf_counter()
+    failed = 0
+    async for result in evaluate_class(submissions, concurrency, retries):
+        if result.evaluation:
+            summary = result.evaluation.summary
+            print(f"{result.student_id}: {summary.overall_understanding} ({result.latency_seconds:.1f}s)")
+        else:
+            failed += 1
+            print(f"{result.student_id}: FAILED after {result.attempts} attempts - {result.error}")
+    print(f"Evaluated {len(submissions) - failed}/{len(submissions)} submissions in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate a class's worksheet submissions concurrently.")
+    parser.add_argument("submissions", help="JSON file with a list of submissions (or {\"submissions\": [...]}).")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--retries", type=int, default=BATCH_RETRIES)
+    args = parser.parse_args()
+    asyncio.run(_main(args.submissions, args.concurrency, args.retries))
@@ -0,0 +1,188 @@
+import re
+from typing import Optional
+
+# Question types whose answers can be compared with `expected_answer` directly.
+OBJECTIVE_TYPES = {"MCQ", "FILL_BLANK"}
+
+_NUMBER_WORDS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+    "thirteen": 13, "fourteen": 14, "fifteen": 15, "sixteen": 16, "seventeen": 17,
+    "eighteen": 18, "nineteen": 19, "twenty": 20, "thirty": 30, "forty": 40,
+    "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+_UNITS = {word for word, value in _NUMBER_WORDS.items() if 1 <= value <= 9}
+_TENS = {word for word, value in _NUMBER_WORDS.items() if value >= 20}
+_HUNDRED = "hundred"
+
+# "b", "(b)", "b)", "b.", "option b", "option (b)"
+_OPTION_LETTER = re.compile(r"^(?:option\s*)?\(?([a-h])[\).:]?$")
+_NUMBER = re.compile(r"^-?\d+(?:\.\d+)?$")
+_QUESTION_NUMBER = re.compile(r"^\s*(?:q(?:uestion)?\s*)?\d+\s*[\).:\-]\s*", re.IGNORECASE)
+
+
+def _below_hundred(words):
+    """'seven' -> 7, 'twenty one' -> 21; None if not a number below 100."""
+    if len(words) == 1:
+        return _NUMBER_WORDS.get(words[0])
+    if len(words) == 2 and words[0] in _TENS and words[1] in _UNITS:
+        return _NUMBER_WORDS[words[0]] + _NUMBER_WORDS[words[1]]
+    return None
+
+
+def _words_to_number(words):
+    """'twenty one' -> 21, 'one hundred and five' -> 105; None if not a number phrase."""
+    if _HUNDRED not in words:
+        return _below_hundred(words)
+    if words.index(_HUNDRED) != 1 or words[0] not in _UNITS:
+        return None
+    hundreds, rest = _NUMBER_WORDS[words[0]] * 100, words[2:]
+    if rest[:1] == ["and"]:
+        rest = rest[1:]
+        if not rest:
+            return None
+    if not rest:
+        return hundreds
+    tail = _below_hundred(rest)
+    return hundreds + tail if tail else None
+
+
+def normalize_answer(answer) -> str:
+    """Lower-case, collapse whitespace and punctuation, and write numbers as digits."""
+    text = str(answer if answer is not None else "").strip().lower()
+    text = re.sub(r"\s+", " ", text)
+    text = text.strip(" .,!?;:'\"")
+
+    number = _words_to_number(text.replace("-", " ").split()) if text else None
+    if number is not None:
+        return str(number)
+    if _NUMBER.match(text.replace(",", "")):
+        value = float(text.replace(",", ""))
+        return str(int(value)) if value.is_integer() else str(value)
+    return text
+
+
+def _option_letter(text: str) -> Optional[str]:
+    match = _OPTION_LETTER.match(text)
+    return match.group(1) if match else None
+
+
+def _resolve_option(normalized: str, options: Optional[list]) -> str:
+    """Map an option letter ('b', '(b)', 'option b') to the option's normalized text."""
+    letter = _option_letter(normalized)
+    if not letter:
+        return normalized
+    index = ord(letter) - ord("a")
+    if options and index < len(options):
+        return normalize_answer(options[index])
+    return letter
+
+
+def is_objective(answer: dict) -> bool:
+    return str(answer.get("question_type", "")).upper() in OBJECTIVE_TYPES and answer.get("expected_answer") is not None
+
+
+def grade_answer(answer: dict) -> dict:
+    """
+    Grade one MCQ or FILL_BLANK answer locally.
+
+    Returns:
+        dict: An `AnswerFeedback`-shaped dict with `is_correct` and template feedback.
+    """
+    options = answer.get("options")
+    expected = _resolve_option(normalize_answer(answer.get("expected_answer")), options)
+    given = _resolve_option(normalize_answer(answer.get("student_answer")), options)
+
+    if not given:
+        is_correct = False
+        feedback = f"No answer given. The expected answer is '{answer.get('expected_answer')}'."
+    elif given == expected:
+        is_correct = True
+        feedback = "Correct answer."
+    else:
+        is_correct = False
+        feedback = f"Incorrect. The expected answer is '{answer.get('expected_answer')}'."
+
+    return {
+        "question": answer.get("question", ""),
+        "question_type": str(answer.get("question_type", "")).upper(),
+        "is_correct": is_correct,
+        "feedback": feedback,
+    }
+
+
+def split_submission(submission: dict) -> tuple[dict, list[dict]]:
+    """
+    Grade the objective answers of a submission and strip them from it.
+
+    Returns:
+        tuple: (`model_submission`, `objective_feedback`). `model_submission` is the
+        submission with only the subjective answers left, plus an `objective_results`
+        digest the model can use for the summary. `objective_feedback` has one entry
+        per original answer: the local feedback, or None for answers left to the model.
+    """
+    answers = submission.get("answers") or []
+    objective_feedback = [grade_answer(answer) if is_objective(answer) else None for answer in answers]
+
+    graded = [(answer, feedback) for answer, feedback in zip(answers, objective_feedback) if feedback]
+    model_submission = {key: value for key, value in submission.items() if key != "answers"}
+    model_submission["answers"] = [
+        answer for answer, feedback in zip(answers, objective_feedback) if feedback is None
+    ]
+    model_submission["objective_results"] = {
+        "correct": sum(1 for _, feedback in graded if feedback["is_correct"]),
+        "total": len(graded),
+        "incorrect": [
+            {
+                "question": answer.get("question"),
+                "student_answer": answer.get("student_answer"),
+                "expected_answer": answer.get("expected_answer"),
+            }
+            for answer, feedback in graded if not feedback["is_correct"]
+        ],
+    }
+    return model_submission, objective_feedback
+
+
+def _question_key(question) -> str:
+    """Normalized question text without a leading number ("Q2.", "2)", "Question 2:")."""
+    return normalize_answer(_QUESTION_NUMBER.sub("", str(question or "")))
+
+
+def merge_feedback(answers: list, objective_feedback: list, model_feedback: list) -> list:
+    """
+    Put locally graded and model-written feedback back in the submission's order.
+
+    Model feedback is matched to the subjective answers by question text. If the
+    model wrote exactly one item per subjective answer, items whose text matches
+    no question are matched by position instead. A subjective answer left without
+    a match gets empty feedback rather than another question's. Feedback the model
+    wrote for objective items is dropped in favour of the local result.
+    """
+    model_feedback = [item for item in model_feedback or [] if isinstance(item, dict)]
+    subjective = [index for index, feedback in enumerate(objective_feedback) if feedback is None]
+    unused = set(range(len(model_feedback)))
+    matches = {}
+    for index in subjective:
+        question = _question_key(answers[index].get("question"))
+        match = next((i for i in sorted(unused) if _question_key(model_feedback[i].get("question")) == question), None)
+        if match is not None:
+            matches[index] = match
+            unused.discard(match)
+    if len(model_feedback) == len(subjective):
+        for position, index in enumerate(subjective):
+            if index not in matches and position in unused:
+                matches[index] = position
+                unused.discard(position)
+
+    merged = []
+    for index, (answer, feedback) in enumerate(zip(answers, objective_feedback)):
+        if feedback is None:
+            feedback = model_feedback[matches[index]] if index in matches else {
+                "question": answer.get("question", ""),
+                "question_type": str(answer.get("question_type", "")).upper(),
+                "is_correct": None,
+                "feedback": "",
+            }
+        merged.append(feedback)
+    return merged
@@ -0,0 +1,185 @@
+"""
+Per-agent model tiers.
+
+With MODEL_TIERS set to a comma-separated list of models, cheapest first (e.g.
+`gemini-1.5-flash-8b,gemini-1.5-flash,gemini-2.0-flash`), each agent's
+`resilience.ResilientLlm` stops using its hard-coded model and calls the
+cheapest tier that meets the agent's targets over its last MODEL_TIER_WINDOW
+calls:
+
+- p95 latency at most MODEL_TIER_TARGET_LATENCY_SECONDS (default 15), and
+- at least MODEL_TIER_TARGET_SUCCESS (default 0.95) of responses valid against
+  the agent's output schema.
+
+A tier with fewer than MODEL_TIER_MIN_SAMPLES calls is assumed to meet them,
+so new tiers are tried. A tier that misses its targets is retried with a
+single call every MODEL_TIER_PROBE_SECONDS so it can recover. A response that
+fails schema validation is not returned when a stronger tier remains: the call
+escalates to the next tier.
+
+MODEL_TIERS and both targets can be set per agent with a `_<AGENT_NAME>`
+suffix. Estimated cost uses MODEL_PRICES ("model=input/output;..." in USD per
+million tokens) on top of `DEFAULT_PRICES`. `report()` and
+`python -m benchmarks.tiering` show calls, validity, latency and cost per agent
+and tier.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from teacher_assistant_agent.metrics import percentile, register_collector
+
+MODEL_TIERS = os.environ.get("MODEL_TIERS", "")
+MODEL_TIER_TARGET_LATENCY_SECONDS = float(os.environ.get("MODEL_TIER_TARGET_LATENCY_SECONDS", 15))
+MODEL_TIER_TARGET_SUCCESS = float(os.environ.get("MODEL_TIER_TARGET_SUCCESS", 0.95))
+MODEL_TIER_MIN_SAMPLES = int(os.environ.get("MODEL_TIER_MIN_SAMPLES", 20))
+MODEL_TIER_WINDOW = int(os.environ.get("MODEL_TIER_WINDOW", 50))
+MODEL_TIER_PROBE_SECONDS = float(os.environ.get("MODEL_TIER_PROBE_SECONDS", 300))
+
+# USD per million (input, output) tokens; published list prices for short prompts.
+DEFAULT_PRICES = {
+    "gemini-1.5-flash-8b": (0.0375, 0.15),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+
+
+def parse_tiers(value) -> list[str]:
+    return [model.strip() for model in str(value or "").split(",") if model.strip()]
+
+
+def _parse_prices(value) -> dict:
+    prices = {}
+    for entry in str(value or "").split(";"):
+        model, _, price = entry.partition("=")
+        if model.strip() and "/" in price:
+            input_price, output_price = price.split("/", 1)
+            prices[model.strip()] = (float(input_price), float(output_price))
+    return prices
+
+
+PRICES = {**DEFAULT_PRICES, **_parse_prices(os.environ.get("MODEL_PRICES"))}
+
+
+def cost(model, input_tokens, output_tokens) -> float:
+    input_price, output_price = PRICES.get(model, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1e6
+
+
+class TierStats:
+    """Recent outcomes and running totals of one agent's calls to one model."""
+
+    def __init__(self, window=MODEL_TIER_WINDOW):
+        self.recent = deque(maxlen=window)  # (latency seconds, valid)
+        self.calls = 0
+        self.invalid = 0
+        self.escalations = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost_usd = 0.0
+        self.last_probe = 0.0
+
+    def meets(self, target_latency, target_success, min_samples=MODEL_TIER_MIN_SAMPLES) -> bool:
+        if len(self.recent) < max(1, min_samples):
+            return True
+        valid = sum(1 for _, ok in self.recent if ok) / len(self.recent)
+        return valid >= target_success and percentile([latency for latency, _ in self.recent], 95) <= target_latency
+
+    def summary(self, target_latency, target_success) -> dict:
+        latencies = [latency for latency, _ in self.recent]
+        return {
+            "calls": self.calls,
+            "valid_rate": round(1 - self.invalid / self.calls, 3) if self.calls else None,
+            "recent_valid_rate": round(sum(1 for _, ok in self.recent if ok) / len(self.recent), 3) if self.recent else None,
+            "p50_seconds": round(percentile(latencies, 50), 3) if latencies else None,
+            "p95_seconds": round(percentile(latencies, 95), 3) if latencies else None,
+            "escalations": self.escalations,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "cost_per_call_usd": round(self.cost_usd / self.calls, 8) if self.calls else None,
+            "meets_target": self.meets(target_latency, target_success),
+        }
+
+
+class TierSelector:
+    """Chooses a tier per call and keeps the per-agent, per-model outcomes it chooses from."""
+
+    def __init__(self):
+        self._stats = {}  # (agent, model) -> TierStats
+        self._targets = {}  # agent -> (latency, success)
+        self._lock = threading.Lock()
+
+    def _get(self, agent_name, model) -> TierStats:
+        key = (agent_name, model)
+        if key not in self._stats:
+            self._stats[key] = TierStats()
+        return self._stats[key]
+
+    def select(self, agent_name, tiers, target_latency=MODEL_TIER_TARGET_LATENCY_SECONDS,
+               target_success=MODEL_TIER_TARGET_SUCCESS) -> int:
+        """Index in `tiers` of the cheapest tier to call now."""
+        now = time.monotonic()
+        with self._lock:
+            self._targets[agent_name] = (target_latency, target_success)
+            for index, model in enumerate(tiers[:-1]):
+                stats = self._get(agent_name, model)
+                if stats.meets(target_latency, target_success):
+                    return index
+                if now - stats.last_probe >= MODEL_TIER_PROBE_SECONDS:
+                    stats.last_probe = now
+                    return index
+        return len(tiers) - 1
+
+    def record(self, agent_name, model, latency, valid, usage=None, escalated=False):
+        """Record one call; `usage` is the response's `usage_metadata`."""
+        input_tokens = (getattr(usage, "prompt_token_count", None) or 0) if usage else 0
+        output_tokens = (getattr(usage, "candidates_token_count", None) or 0) if usage else 0
+        with self._lock:
+            stats = self._get(agent_name, model)
+            stats.recent.append((latency, valid))
+            stats.calls += 1
+            stats.invalid += not valid
+            stats.escalations += escalated
+            stats.input_tokens += input_tokens
+            stats.output_tokens += output_tokens
+            stats.cost_usd += cost(model, input_tokens, output_tokens)
+
+    def report(self) -> dict:
+        """{agent: {model: summary}} for every agent and model called so far."""
+        with self._lock:
+            report = {}
+            for (agent_name, model), stats in self._stats.items():
+                targets = self._targets.get(agent_name, (MODEL_TIER_TARGET_LATENCY_SECONDS, MODEL_TIER_TARGET_SUCCESS))
+                report.setdefault(agent_name, {})[model] = stats.summary(*targets)
+            return report
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._targets.clear()
+
+
+tier_selector = TierSelector()
+register_collector("model_tiers", tier_selector.report)
+
+
+def report() -> dict:
+    return tier_selector.report()
+
+
+def format_report(data=None) -> str:
+    """Table of calls, validity, latency and cost per agent and tier."""
+    data = report() if data is None else data
+    columns = ("calls", "valid_rate", "p50_seconds", "p95_seconds", "escalations", "cost_usd", "cost_per_call_usd")
+    lines = [f"{'agent':<32}{'model':<24}" + "".join(f"{column:>19}" for column in columns)]
+    for agent_name, models in sorted(data.items()):
+        for model, row in models.items():
+            cells = "".join(f"{'-' if row[column] is None else row[column]:>19}" for column in columns)
+            lines.append(f"{agent_name:<32}{model:<24}{cells}")
+    return "\n".join(lines) if len(lines) > 1 else "No model calls recorded yet."
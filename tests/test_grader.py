@@ -0,0 +1,93 @@
+import pytest
+
+from teacher_assistant_agent.sub_agents.worksheet_evaluator_agent.grader import (
+    _resolve_option,
+    grade_answer,
+    normalize_answer,
+)
+
+
+@pytest.mark.parametrize("answer, expected", [
+    ("Photosynthesis.", "photosynthesis"),
+    ("  Carbon   Dioxide ", "carbon dioxide"),
+    (None, ""),
+    ("7", "7"),
+    ("7.0", "7"),
+    ("1,000", "1000"),
+    ("2.5", "2.5"),
+    ("zero", "0"),
+    ("seven", "7"),
+    ("Fifteen", "15"),
+    ("twenty", "20"),
+    ("twenty one", "21"),
+    ("twenty-one", "21"),
+    ("one hundred", "100"),
+    ("one hundred five", "105"),
+    ("one hundred and five", "105"),
+    ("two hundred twenty-one", "221"),
+])
+def test_normalize_answer(answer, expected):
+    assert normalize_answer(answer) == expected
+
+
+@pytest.mark.parametrize("answer", [
+    "and",
+    "one two",
+    "five five",
+    "one twenty",
+    "twenty twenty",
+    "twenty eleven",
+    "hundred",
+    "one hundred and",
+    "one and hundred",
+    "and five",
+    "five and",
+    "twelve hundred",
+    "one hundred zero",
+    "one hundred one hundred",
+    "one apple",
+])
+def test_normalize_answer_keeps_non_numbers_as_text(answer):
+    assert normalize_answer(answer) == answer
+
+
+@pytest.mark.parametrize("given, expected", [
+    ("b", "mitochondria"),
+    ("(b)", "mitochondria"),
+    ("b)", "mitochondria"),
+    ("b.", "mitochondria"),
+    ("option b", "mitochondria"),
+    ("option (b)", "mitochondria"),
+    ("a", "nucleus"),
+    ("mitochondria", "mitochondria"),
+    ("e", "e"),
+])
+def test_resolve_option(given, expected):
+    options = ["Nucleus", "Mitochondria", "Ribosome", "Golgi body"]
+    assert _resolve_option(normalize_answer(given), options) == expected
+
+
+def test_resolve_option_without_options_keeps_letter():
+    assert _resolve_option("(c)", None) == "c"
+    assert _resolve_option("c", []) == "c"
+
+
+@pytest.mark.parametrize("student_answer, is_correct", [
+    ("ten", True),
+    ("10", True),
+    ("one two", False),
+    ("five five", False),
+    ("and", False),
+    ("", False),
+])
+def test_grade_fill_blank_numbers(student_answer, is_correct):
+    answer = {"question": "5 + 5 = ?", "question_type": "FILL_BLANK", "expected_answer": "10",
+              "student_answer": student_answer}
+    assert grade_answer(answer)["is_correct"] is is_correct
+
+
+def test_grade_mcq_letter_against_option_text():
+    answer = {"question": "Powerhouse of the cell?", "question_type": "mcq", "options": ["Nucleus", "Mitochondria"],
+              "expected_answer": "Mitochondria", "student_answer": "(b)"}
+    assert grade_answer(answer)["is_correct"] is True
+    assert grade_answer(dict(answer, student_answer="a"))["is_correct"] is False
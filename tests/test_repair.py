@@ -0,0 +1,93 @@
+import json
+
+from teacher_assistant_agent.repair import close_truncated, repair_text
+from teacher_assistant_agent.sub_agents.lesson_planner_agent.agent import LessonPlan
+from teacher_assistant_agent.sub_agents.worksheet_evaluator_agent.agent import WorksheetEvaluation
+
+EVALUATION = {
+    "student_id": "S1", "class_name": "Class 6", "subject_name": "Science", "chapter_name": "Light",
+    "evaluation_date": "2026-10-01",
+    "answer_feedback": [
+        {"question": "Q1", "question_type": "QA", "is_correct": True, "feedback": "Clear explanation of reflection."},
+        {"question": "Q2", "question_type": "QA", "is_correct": False, "feedback": "Mixes up the two kinds of lenses."},
+    ],
+    "summary": {
+        "overall_understanding": "Average", "conceptual_strengths": ["Reflection"],
+        "conceptual_weaknesses": ["Lenses"], "chapter_coverage": "Partially covered",
+        "suggested_retest_areas": ["Lenses"],
+    },
+}
+
+PLAN = {
+    "teacher": "T", "class_name": "6", "subject_name": "Science", "chapter_name": "Light",
+    "time_per_day_minutes": 40, "number_of_days": 2, "short_description": "Light and shadows.",
+    "learning_objective": "Explain reflection.",
+    "daily_plan": [
+        {"day": day, "title": f"Day {day}", "time_allocated_minutes": 40,
+         "topics": [{"title": "Reflection", "time_minutes": 40, "activity": "Mirror demo"}]}
+        for day in (1, 2)
+    ],
+}
+
+
+def test_valid_response_needs_no_repair():
+    assert repair_text(WorksheetEvaluation, json.dumps(EVALUATION)) == (None, [])
+
+
+def test_missing_closing_brackets_are_added():
+    text = json.dumps(EVALUATION)
+    repaired, fixes = repair_text(WorksheetEvaluation, text[:-2])  # ends with ["Lenses"]
+    assert fixes == ["truncated"]
+    assert json.loads(repaired) == EVALUATION
+
+
+def test_cut_inside_string_is_not_repaired():
+    text = json.dumps(EVALUATION)
+    cut = text[:text.index("Mixes up") + len("Mixes up")]
+    assert close_truncated(cut) is None
+    assert repair_text(WorksheetEvaluation, cut) == (None, [])
+
+
+def test_cut_inside_trailing_string_field_is_not_repaired():
+    text = json.dumps(EVALUATION)
+    cut = text[:text.index("Partially covered") + len("Partially")]
+    assert close_truncated(cut) is None
+    assert repair_text(WorksheetEvaluation, cut) == (None, [])
+
+
+def test_cut_number_is_not_repaired():
+    text = json.dumps({"number_of_days": 12})
+    assert close_truncated(text[:-2]) is None  # '{"number_of_days": 1'
+
+
+def test_cut_inside_answer_feedback_is_not_repaired():
+    text = json.dumps(EVALUATION)
+    cut = text[:text.index('{"question": "Q2"')]  # first item complete, list still open
+    assert close_truncated(cut) is None
+    assert repair_text(WorksheetEvaluation, cut) == (None, [])
+
+
+def test_lesson_plan_cut_between_days_is_not_repaired():
+    text = json.dumps(PLAN)
+    cut = text[:text.index('{"day": 2')].rstrip().rstrip(",")
+    assert repair_text(LessonPlan, cut) == (None, [])
+
+
+def test_defaulted_field_after_truncation_is_not_repaired():
+    summary = dict(EVALUATION["summary"])
+    del summary["suggested_retest_areas"]
+    text = json.dumps(dict(EVALUATION, summary=summary))
+    # Only the closing brackets are missing, but `suggested_retest_areas` would be defaulted to null.
+    assert repair_text(WorksheetEvaluation, text[:-2]) == (None, [])
+    repaired, fixes = repair_text(WorksheetEvaluation, text)
+    assert fixes == ["default"]
+    assert json.loads(repaired)["summary"]["suggested_retest_areas"] is None
+
+
+def test_literal_synonyms_and_extraction():
+    summary = dict(EVALUATION["summary"], overall_understanding="fair", chapter_coverage="partially")
+    text = "Here you go:\n```json\n" + json.dumps(dict(EVALUATION, summary=summary)) + "\n```"
+    repaired, fixes = repair_text(WorksheetEvaluation, text)
+    assert fixes == ["extract", "literal"]
+    assert json.loads(repaired)["summary"]["overall_understanding"] == "Average"
+    assert json.loads(repaired)["summary"]["chapter_coverage"] == "Partially covered"